@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adaptive Timeout Controller
+تعیین deadline هر تست اتصال بر اساس توزیع تأخیر مشاهده شده (p95 به تفکیک کشور/پروتکل)
+"""
+
+import math
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# کلید گروه سراسری (fallback وقتی گروه دقیق‌تر نمونه کافی ندارد)
+GLOBAL_GROUP = '*'
+
+
+class LatencyHistogram:
+    """
+    هیستوگرام لگاریتمی تأخیر برای محاسبه جریانی percentile ها
+
+    هر bucket حدود 5% عرض دارد، پس خطای percentile محدود است و حافظه
+    مستقل از تعداد نمونه‌هاست. شمارنده‌ها float هستند تا decay بین سیکل‌ها
+    ممکن باشد.
+    """
+
+    GROWTH = 1.05
+    MIN_LATENCY = 1.0  # میلی‌ثانیه
+    BUCKETS = 240  # تا حدود 120 ثانیه
+
+    def __init__(self):
+        self.counts: List[float] = [0.0] * self.BUCKETS
+        self.total = 0.0
+
+    def _bucket(self, latency: float) -> int:
+        if latency <= self.MIN_LATENCY:
+            return 0
+        index = int(math.log(latency / self.MIN_LATENCY, self.GROWTH)) + 1
+        return min(index, self.BUCKETS - 1)
+
+    def add(self, latency: float):
+        self.counts[self._bucket(latency)] += 1.0
+        self.total += 1.0
+
+    def quantile(self, q: float) -> float:
+        """حد بالای bucket شامل percentile خواسته شده (میلی‌ثانیه)"""
+        if self.total <= 0:
+            return 0.0
+        target = q * self.total
+        cumulative = 0.0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return self.MIN_LATENCY * (self.GROWTH ** index)
+        return self.MIN_LATENCY * (self.GROWTH ** (self.BUCKETS - 1))
+
+    def decay(self, factor: float):
+        """کاهش وزن نمونه‌های قدیمی"""
+        self.counts = [count * factor for count in self.counts]
+        self.total *= factor
+
+
+class AdaptiveTimeoutController:
+    """
+    کنترلر deadline تطبیقی برای تست‌های اتصال
+
+    deadline هر تست برابر p95 تأخیر موفق گروه (country/protocol، سپس protocol و
+    در نهایت سراسری) ضرب در یک ضریب است. ضریب با افزایش تعداد نمونه‌های سیکل
+    جاری از initial_multiplier تا final_multiplier کاهش می‌یابد، یعنی deadline با
+    پیشرفت سیکل و اطمینان بیشتر به توزیع سفت‌تر می‌شود. تا وقتی نمونه کافی
+    نیست timeout ثابت موتور تست استفاده می‌شود.
+
+    تست‌کننده‌ها پس از اتمام deadline تطبیقی کوتاه‌تر از timeout ثابت، یک بار با
+    timeout ثابت دوباره تست می‌کنند (needs_static_retry)؛ پس endpoint کند ولی
+    سالم به خاطر deadline تطبیقی شکست یا backoff نمی‌گیرد.
+    """
+
+    def __init__(self, percentile: float = 0.95, initial_multiplier: float = 4.0,
+                 final_multiplier: float = 2.0, min_samples: int = 20,
+                 tighten_samples: int = 500, min_timeout: float = 0.5,
+                 max_timeout: float = 10.0, decay: float = 0.5):
+        self.percentile = percentile
+        self.initial_multiplier = initial_multiplier
+        self.final_multiplier = max(1.0, final_multiplier)
+        self.min_samples = max(1, min_samples)
+        self.tighten_samples = max(1, tighten_samples)
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.decay = decay
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._cycle_samples = 0
+        self._deadlines: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _groups(country: str, protocol: str) -> Tuple[str, str, str]:
+        country = (country or 'Unknown').upper()
+        protocol = (protocol or 'unknown').lower()
+        return f"{country}/{protocol}", f"*/{protocol}", GLOBAL_GROUP
+
+    def start_cycle(self):
+        """شروع سیکل جدید: کاهش وزن توزیع قبلی و پاک کردن گزارش deadline ها"""
+        for histogram in self._histograms.values():
+            histogram.decay(self.decay)
+        self._cycle_samples = 0
+        self._deadlines = {}
+
+    def multiplier(self) -> float:
+        """ضریب فعلی (با پیشرفت سیکل به final_multiplier نزدیک می‌شود)"""
+        progress = min(1.0, self._cycle_samples / self.tighten_samples)
+        return self.initial_multiplier - \
+            (self.initial_multiplier - self.final_multiplier) * progress
+
+    def observe(self, country: str, protocol: str, success: bool, latency: float):
+        """ثبت نتیجه یک تست (فقط تأخیر تست‌های موفق وارد توزیع می‌شود)"""
+        group_keys = self._groups(country, protocol)
+        if not success:
+            # شکست به گروهی نسبت داده می‌شود که deadline آن را تعیین کرده است
+            stats = self._deadlines.get(self._deadline_group(group_keys))
+            if stats is not None:
+                stats['failures'] += 1
+            return
+
+        if latency <= 0:
+            return
+        for key in group_keys:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.add(latency)
+        self._cycle_samples += 1
+
+    def _deadline_group(self, group_keys: Tuple[str, str, str]) -> str:
+        """دقیق‌ترین گروهی که نمونه کافی دارد ('default' اگر هیچ‌کدام)"""
+        for key in group_keys:
+            histogram = self._histograms.get(key)
+            if histogram is not None and histogram.total >= self.min_samples:
+                return key
+        return 'default'
+
+    @staticmethod
+    def needs_static_retry(timeout: Optional[float], default: float) -> bool:
+        """آیا شکست با این deadline باید یک بار با timeout ثابت تکرار شود؟"""
+        return timeout is not None and timeout < default
+
+    def record_static_retry(self, country: str, protocol: str, success: bool):
+        """ثبت تکرار تست با timeout ثابت (rescued: موفق پس از اتمام deadline تطبیقی)"""
+        stats = self._deadlines.get(self._deadline_group(self._groups(country, protocol)))
+        if stats is None:
+            return
+        stats['static_retries'] += 1
+        if success:
+            stats['rescued'] += 1
+
+    def timeout_for(self, country: str, protocol: str, default: float) -> float:
+        """deadline تست بعدی یک کانفیگ (ثانیه)"""
+        key = self._deadline_group(self._groups(country, protocol))
+        if key == 'default':
+            # نمونه کافی وجود ندارد - timeout ثابت موتور تست
+            self._track(key, default, 0.0, 0.0)
+            return default
+
+        histogram = self._histograms[key]
+        p95 = histogram.quantile(self.percentile)
+        timeout = p95 / 1000 * self.multiplier()
+        timeout = max(self.min_timeout, min(self.max_timeout, timeout))
+        self._track(key, timeout, p95, histogram.total)
+        return timeout
+
+    def _track(self, key: str, timeout: float, p95: float, samples: float):
+        stats = self._deadlines.get(key)
+        if stats is None:
+            stats = self._deadlines[key] = {
+                'probes': 0, 'failures': 0, 'static_retries': 0, 'rescued': 0,
+                'min_deadline': timeout,
+                'max_deadline': timeout, 'deadline_sum': 0.0,
+                'p95_ms': 0.0, 'samples': 0}
+        stats['probes'] += 1
+        stats['deadline_sum'] += timeout
+        stats['min_deadline'] = min(stats['min_deadline'], timeout)
+        stats['max_deadline'] = max(stats['max_deadline'], timeout)
+        stats['p95_ms'] = p95
+        stats['samples'] = samples
+
+    def get_cycle_report(self) -> Dict[str, Any]:
+        """deadline های انتخاب شده در سیکل جاری به تفکیک گروه"""
+        groups = {}
+        for key, stats in sorted(self._deadlines.items(),
+                                 key=lambda item: -item[1]['probes']):
+            groups[key] = {
+                'probes': stats['probes'],
+                'failures': stats['failures'],
+                'static_retries': stats['static_retries'],
+                'rescued': stats['rescued'],
+                'p95_ms': round(stats['p95_ms'], 1),
+                'samples': int(stats['samples']),
+                'min_deadline': round(stats['min_deadline'], 3),
+                'avg_deadline': round(stats['deadline_sum'] / stats['probes'], 3),
+                'max_deadline': round(stats['max_deadline'], 3),
+            }
+        return {
+            'percentile': self.percentile,
+            'multiplier': round(self.multiplier(), 2),
+            'cycle_samples': self._cycle_samples,
+            'groups': groups,
+        }
+
+    def log_cycle_report(self, limit: int = 10):
+        """ثبت deadline های سیکل در لاگ"""
+        report = self.get_cycle_report()
+        logger.info(
+            f"⏱️ timeout تطبیقی: {report['cycle_samples']} نمونه، ضریب نهایی {report['multiplier']}")
+        for key, stats in list(report['groups'].items())[:limit]:
+            logger.info(
+                f"   {key}: {stats['probes']} تست، p95 {stats['p95_ms']}ms، "
+                f"deadline {stats['min_deadline']}-{stats['max_deadline']}s "
+                f"(میانگین {stats['avg_deadline']}s)، {stats['failures']} ناموفق، "
+                f"{stats['rescued']}/{stats['static_retries']} موفق با timeout ثابت")
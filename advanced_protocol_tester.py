@@ -6,23 +6,211 @@ Advanced Protocol Tester for V2Ray Configs
 
 import asyncio
 import aiohttp
+import hashlib
+import ipaddress
+import os
 import ssl
-import socket
 import struct
 import time
 import json
-import base64
-from typing import Dict, List, Optional, Tuple
+import tempfile
+import uuid as uuid_module
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
 import logging
 
+from dns_resolver import normalize_host
+from tls_probe import server_name, shared_tls_context
+
+try:
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+    SHADOWSOCKS_AEAD_AVAILABLE = True
+except ImportError:
+    SHADOWSOCKS_AEAD_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# روش‌های AEAD شدوساکس و طول کلید (salt هم‌اندازه کلید است)
+SS_AEAD_METHODS = {
+    'aes-128-gcm': 16,
+    'aes-192-gcm': 24,
+    'aes-256-gcm': 32,
+    'chacha20-ietf-poly1305': 32,
+    'chacha20-poly1305': 32,
+}
+SS_TAG_SIZE = 16
+SS_MAX_CHUNK = 0x3FFF
+
+_MAX_STATUS_LINE = 4096
+
+
+@dataclass
+class HandshakeResult:
+    """
+    نتیجه تأیید handshake پروتکل
+
+    supported=False یعنی فریم‌بندی این کانفیگ پشتیبانی نمی‌شود (مثلاً
+    VMess، ws/grpc یا REALITY) و نتیجه تست TCP نباید تغییر کند.
+    """
+    success: bool
+    supported: bool = True
+    latency: float = 0.0
+    status: int = 0
+    error: str = ""
+
+
+def _link_params(config) -> Dict[str, str]:
+    """پارامترهای query لینک خام کانفیگ"""
+    raw = getattr(config, 'raw_config', '') or ''
+    query = raw.split('#', 1)[0].partition('?')[2]
+    return {name: values[0] for name, values in parse_qs(query).items()}
+
+
+def _vless_uuid_bytes(value: str) -> bytes:
+    """UUID کاربر VLESS (رشته‌های غیر UUID مانند Xray به UUIDv5 نگاشت می‌شوند)"""
+    try:
+        return uuid_module.UUID(value).bytes
+    except ValueError:
+        return uuid_module.uuid5(uuid_module.UUID(int=0), value).bytes
+
+
+def _socks_address(host: str, port: int) -> bytes:
+    """آدرس مقصد با قالب SOCKS5 (Trojan و Shadowsocks)"""
+    try:
+        ip = ipaddress.ip_address(host)
+        return (b'\x01' if ip.version == 4 else b'\x04') + ip.packed + struct.pack('!H', port)
+    except ValueError:
+        encoded = host.encode('idna')
+        return b'\x03' + bytes([len(encoded)]) + encoded + struct.pack('!H', port)
+
+
+def create_vless_request(user_id: str, host: str, port: int, payload: bytes = b'') -> bytes:
+    """درخواست VLESS نسخه 0: version، UUID، addons خالی، فرمان TCP و مقصد"""
+    try:
+        ip = ipaddress.ip_address(host)
+        address = (b'\x01' if ip.version == 4 else b'\x03') + ip.packed
+    except ValueError:
+        encoded = host.encode('idna')
+        address = b'\x02' + bytes([len(encoded)]) + encoded
+    return b'\x00' + _vless_uuid_bytes(user_id) + b'\x00' + b'\x01' + \
+        struct.pack('!H', port) + address + payload
+
+
+def create_trojan_request(password: str, host: str, port: int, payload: bytes = b'') -> bytes:
+    """درخواست Trojan: hex(SHA224(password))، CRLF، CONNECT، مقصد SOCKS5، CRLF"""
+    password_hash = hashlib.sha224(password.encode()).hexdigest().encode()
+    return password_hash + b'\r\n' + b'\x01' + _socks_address(host, port) + b'\r\n' + payload
+
+
+def ss_master_key(password: str, key_size: int) -> bytes:
+    """کلید اصلی شدوساکس از رمز (EVP_BytesToKey با MD5)"""
+    key = b''
+    previous = b''
+    while len(key) < key_size:
+        previous = hashlib.md5(previous + password.encode()).digest()
+        key += previous
+    return key[:key_size]
+
+
+class ShadowsocksAEADCipher:
+    """
+    رمزنگاری یک جهت جریان AEAD شدوساکس (SIP004)
+
+    subkey با HKDF-SHA1 از کلید اصلی و salt ساخته می‌شود و nonce شمارنده
+    little-endian است که پس از هر عمل رمزنگاری یک واحد افزایش می‌یابد.
+    """
+
+    def __init__(self, method: str, master_key: bytes, salt: bytes):
+        subkey = HKDF(algorithm=hashes.SHA1(), length=len(master_key), salt=salt,
+                      info=b'ss-subkey').derive(master_key)
+        self.aead = ChaCha20Poly1305(subkey) if method.startswith('chacha20') else AESGCM(subkey)
+        self.counter = 0
+
+    def _nonce(self) -> bytes:
+        nonce = self.counter.to_bytes(12, 'little')
+        self.counter += 1
+        return nonce
+
+    def encrypt(self, data: bytes) -> bytes:
+        return self.aead.encrypt(self._nonce(), data, None)
+
+    def decrypt(self, data: bytes) -> bytes:
+        return self.aead.decrypt(self._nonce(), data, None)
+
+    def encrypt_chunks(self, data: bytes) -> bytes:
+        """تقسیم داده به chunk های [طول رمز شده][داده رمز شده]"""
+        output = b''
+        for offset in range(0, len(data), SS_MAX_CHUNK):
+            chunk = data[offset:offset + SS_MAX_CHUNK]
+            output += self.encrypt(struct.pack('!H', len(chunk))) + self.encrypt(chunk)
+        return output
+
+    async def read_chunk(self, reader: asyncio.StreamReader) -> bytes:
+        """خواندن و رمزگشایی یک chunk (InvalidTag یعنی کلید یا سرور اشتباه)"""
+        length = struct.unpack('!H', self.decrypt(
+            await reader.readexactly(2 + SS_TAG_SIZE)))[0] & SS_MAX_CHUNK
+        return self.decrypt(await reader.readexactly(length + SS_TAG_SIZE))
+
+
+def parse_ss_credentials(config) -> Optional[Tuple[str, str]]:
+    """(method، password) کانفیگ شدوساکس یا None برای روش پشتیبانی نشده"""
+    method, _, password = (config.uuid or '').partition(':')
+    method = method.lower()
+    if method not in SS_AEAD_METHODS or not password:
+        return None
+    return method, password
+
+
+def _parse_status_line(line: bytes) -> int:
+    """کد وضعیت خط اول پاسخ HTTP (0 اگر پاسخ HTTP نباشد)"""
+    parts = line.split(b' ', 2)
+    if len(parts) < 2 or not parts[0].startswith(b'HTTP/1.') or not parts[1].isdigit():
+        return 0
+    return int(parts[1])
 
-class AdvancedProtocolTester:
-    """تست پیشرفته پروتکل‌های V2Ray"""
 
-    def __init__(self):
+class AdvancedProtocolTester:
+    """
+    تست پیشرفته پروتکل‌های V2Ray
+
+    تأیید handshake: درخواست واقعی VLESS، Trojan یا Shadowsocks (AEAD) برای
+    باز کردن اتصال به target ارسال و یک درخواست HTTP از داخل تونل فرستاده
+    می‌شود. فقط سروری که اعتبارنامه را پذیرفته و ترافیک را منتقل کرده پاسخ با
+    کد expect_status برمی‌گرداند؛ پورت باز معمولی، echo یا وب‌سرور fallback
+    پاسخ دیگری می‌دهند. همزمانی با semaphore محدود می‌شود.
+    """
+
+    def __init__(self, target: str = 'http://www.gstatic.com/generate_204',
+                 expect_status: int = 204, timeout: float = 5.0,
+                 max_concurrency: int = 200, tls_context: Optional[ssl.SSLContext] = None):
         self.test_results = {}
+        parsed = urlparse(target)
+        self.target_host = parsed.hostname or 'www.gstatic.com'
+        self.target_port = parsed.port or 80
+        self.target_path = parsed.path or '/'
+        self.expect_status = expect_status
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.tls_context = tls_context or shared_tls_context()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.reset_stats()
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """semaphore متعلق به event loop جاری"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    def _target_request(self) -> bytes:
+        return (f"GET {self.target_path} HTTP/1.1\r\nHost: {self.target_host}\r\n"
+                f"User-Agent: Mozilla/5.0\r\nConnection: close\r\n\r\n").encode()
 
     async def test_vmess_handshake(self, config) -> Tuple[bool, float, Dict]:
         """تست واقعی VMess handshake"""
@@ -66,122 +254,32 @@ class AdvancedProtocolTester:
 
     async def test_vless_handshake(self, config) -> Tuple[bool, float, Dict]:
         """تست واقعی VLESS handshake"""
-        try:
-            start_time = time.time()
-
-            # ایجاد VLESS request
-            vless_packet = self._create_vless_packet(config)
-
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(config.address, config.port),
-                timeout=10
-            )
-
-            # ارسال VLESS packet
-            writer.write(vless_packet)
-            await writer.drain()
-
-            # دریافت response
-            response = await asyncio.wait_for(
-                reader.read(1024),
-                timeout=5
-            )
-
-            writer.close()
-            await writer.wait_closed()
-
-            latency = (time.time() - start_time) * 1000
-            is_valid = len(response) > 0
-
-            return is_valid, latency, {
-                'response_size': len(response),
-                'protocol_version': 'v1' if is_valid else None
-            }
-
-        except Exception as e:
-            return False, 0.0, {'error': str(e)}
+        result = await self.verify_handshake(config)
+        return result.success, result.latency, {
+            'status': result.status,
+            'protocol_version': 'v0' if result.success else None,
+            **({'error': result.error} if result.error else {})
+        }
 
     async def test_trojan_handshake(self, config) -> Tuple[bool, float, Dict]:
         """تست واقعی Trojan handshake"""
-        try:
-            start_time = time.time()
-
-            # ایجاد Trojan request
-            trojan_packet = self._create_trojan_packet(config)
-
-            # اتصال با TLS
-            context = ssl.create_default_context()
-            context.check_hostname = False
-            context.verify_mode = ssl.CERT_NONE
-
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(
-                    config.address, config.port, ssl=context
-                ),
-                timeout=10
-            )
-
-            # ارسال Trojan packet
-            writer.write(trojan_packet)
-            await writer.drain()
-
-            # دریافت response
-            response = await asyncio.wait_for(
-                reader.read(1024),
-                timeout=5
-            )
-
-            writer.close()
-            await writer.wait_closed()
-
-            latency = (time.time() - start_time) * 1000
-            is_valid = len(response) > 0
-
-            return is_valid, latency, {
-                'tls_version': 'TLS 1.2+',
-                'response_size': len(response),
-                'ssl_verified': False  # ما SSL را verify نمی‌کنیم
-            }
-
-        except Exception as e:
-            return False, 0.0, {'error': str(e)}
+        result = await self.verify_handshake(config)
+        return result.success, result.latency, {
+            'tls_version': 'TLS 1.2+',
+            'status': result.status,
+            'ssl_verified': False,  # ما SSL را verify نمی‌کنیم
+            **({'error': result.error} if result.error else {})
+        }
 
     async def test_shadowsocks_handshake(self, config) -> Tuple[bool, float, Dict]:
         """تست واقعی Shadowsocks handshake"""
-        try:
-            start_time = time.time()
-
-            # ایجاد Shadowsocks request
-            ss_packet = self._create_ss_packet(config)
-
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(config.address, config.port),
-                timeout=10
-            )
-
-            # ارسال Shadowsocks packet
-            writer.write(ss_packet)
-            await writer.drain()
-
-            # دریافت response
-            response = await asyncio.wait_for(
-                reader.read(1024),
-                timeout=5
-            )
-
-            writer.close()
-            await writer.wait_closed()
-
-            latency = (time.time() - start_time) * 1000
-            is_valid = len(response) > 0
-
-            return is_valid, latency, {
-                'encryption_method': 'AES-256-GCM',
-                'response_size': len(response)
-            }
-
-        except Exception as e:
-            return False, 0.0, {'error': str(e)}
+        result = await self.verify_handshake(config)
+        credentials = parse_ss_credentials(config)
+        return result.success, result.latency, {
+            'encryption_method': credentials[0] if credentials else None,
+            'status': result.status,
+            **({'error': result.error} if result.error else {})
+        }
 
     async def test_speed_benchmark(self, config) -> Dict:
         """تست سرعت واقعی با download test"""
@@ -226,20 +324,176 @@ class AdvancedProtocolTester:
         return b'\x01' + config.uuid.encode()[:16].ljust(16, b'\x00')
 
     def _create_vless_packet(self, config) -> bytes:
-        """ایجاد VLESS packet برای تست"""
-        # ساختار ساده VLESS request
-        return b'\x00' + config.uuid.encode()[:16].ljust(16, b'\x00')
+        """درخواست VLESS به سمت target همراه با درخواست HTTP"""
+        return create_vless_request(config.uuid, self.target_host, self.target_port,
+                                    self._target_request())
 
     def _create_trojan_packet(self, config) -> bytes:
-        """ایجاد Trojan packet برای تست"""
-        # ساختار ساده Trojan request
-        password_hash = hashlib.sha224(config.uuid.encode()).digest()
-        return password_hash + b'\r\n'
-
-    def _create_ss_packet(self, config) -> bytes:
-        """ایجاد Shadowsocks packet برای تست"""
-        # ساختار ساده Shadowsocks request
-        return b'\x05\x01\x00'  # SOCKS5 handshake
+        """درخواست Trojan به سمت target همراه با درخواست HTTP"""
+        return create_trojan_request(config.uuid, self.target_host, self.target_port,
+                                     self._target_request())
+
+    def _create_ss_packet(self, config, cipher: 'ShadowsocksAEADCipher', salt: bytes) -> bytes:
+        """salt و chunk های رمز شده آدرس SOCKS5 مقصد و درخواست HTTP"""
+        return salt + cipher.encrypt_chunks(
+            _socks_address(self.target_host, self.target_port) + self._target_request())
+
+    def handshake_transport(self, config) -> Optional[str]:
+        """
+        لایه انتقال handshake قابل تأیید کانفیگ: 'tcp'، 'tls' یا None
+
+        فقط VLESS روی TCP خام (با یا بدون TLS، بدون flow)، Trojan روی TLS و
+        Shadowsocks با روش AEAD و بدون plugin پشتیبانی می‌شوند.
+        """
+        params = _link_params(config)
+        if params.get('type', 'tcp') not in ('tcp', 'raw'):
+            return None
+        if config.protocol == 'vless':
+            security = params.get('security', 'tls' if config.tls else 'none')
+            if params.get('flow') or security not in ('none', 'tls'):
+                return None
+            return 'tls' if security == 'tls' else 'tcp'
+        if config.protocol == 'trojan':
+            return 'tls' if params.get('security', 'tls') == 'tls' else None
+        if config.protocol == 'ss':
+            if params.get('plugin') or not SHADOWSOCKS_AEAD_AVAILABLE:
+                return None
+            return 'tcp' if parse_ss_credentials(config) else None
+        return None
+
+    async def _read_status(self, reader: asyncio.StreamReader) -> int:
+        line = await reader.readuntil(b'\r\n')
+        return _parse_status_line(line)
+
+    async def _exchange(self, config, reader: asyncio.StreamReader,
+                        writer: asyncio.StreamWriter) -> int:
+        """ارسال درخواست پروتکل و برگرداندن کد وضعیت پاسخ HTTP از داخل تونل"""
+        if config.protocol == 'vless':
+            writer.write(self._create_vless_packet(config))
+            await writer.drain()
+            version, addons_length = await reader.readexactly(2)
+            if version != 0:
+                return 0
+            await reader.readexactly(addons_length)
+            return await self._read_status(reader)
+
+        if config.protocol == 'trojan':
+            writer.write(self._create_trojan_packet(config))
+            await writer.drain()
+            return await self._read_status(reader)
+
+        method, password = parse_ss_credentials(config)
+        master_key = ss_master_key(password, SS_AEAD_METHODS[method])
+        salt = os.urandom(len(master_key))
+        writer.write(self._create_ss_packet(
+            config, ShadowsocksAEADCipher(method, master_key, salt), salt))
+        await writer.drain()
+        server_salt = await reader.readexactly(len(master_key))
+        if server_salt == salt:
+            # بازتاب بسته ما (echo) - سرور شدوساکس salt تصادفی خودش را دارد
+            return 0
+        decryptor = ShadowsocksAEADCipher(method, master_key, server_salt)
+        data = b''
+        while b'\r\n' not in data and len(data) < _MAX_STATUS_LINE:
+            data += await decryptor.read_chunk(reader)
+        return _parse_status_line(data.split(b'\r\n', 1)[0])
+
+    async def verify_handshake(self, config, address: Optional[str] = None,
+                               timeout: Optional[float] = None) -> HandshakeResult:
+        """تأیید handshake یک کانفیگ (address: IP resolve شده)"""
+        transport = self.handshake_transport(config)
+        if transport is None:
+            result = HandshakeResult(False, supported=False)
+            self._record(config.protocol, result)
+            return result
+
+        timeout = timeout or self.timeout
+        address = address or config.address
+        writer = None
+        async with self.semaphore:
+            start_time = time.perf_counter()
+            try:
+                if transport == 'tls':
+                    connect = asyncio.open_connection(
+                        address, config.port, ssl=self.tls_context,
+                        server_hostname=server_name(config) or '')
+                else:
+                    connect = asyncio.open_connection(address, config.port)
+                reader, writer = await asyncio.wait_for(connect, timeout=timeout)
+                remaining = max(0.1, timeout - (time.perf_counter() - start_time))
+                status = await asyncio.wait_for(
+                    self._exchange(config, reader, writer), timeout=remaining)
+                latency = (time.perf_counter() - start_time) * 1000
+            except asyncio.TimeoutError:
+                result = HandshakeResult(False, error="timeout")
+            except asyncio.IncompleteReadError:
+                # سرور اتصال را بست - اعتبارنامه رد شد
+                result = HandshakeResult(False, error="closed")
+            except Exception as e:
+                # InvalidTag: پاسخ با کلید ما رمزگشایی نشد
+                result = HandshakeResult(False, error=type(e).__name__)
+            else:
+                result = HandshakeResult(status == self.expect_status, latency=latency,
+                                         status=status,
+                                         error="" if status == self.expect_status else "status")
+            finally:
+                if writer is not None:
+                    writer.transport.abort()
+
+        self._record(config.protocol, result)
+        return result
+
+    def _record(self, protocol: str, result: HandshakeResult):
+        if not result.supported:
+            self.stats['unsupported'] += 1
+            return
+        counters = self.stats['by_protocol'].setdefault(
+            protocol, {'verified': 0, 'genuine': 0, 'rejected': 0})
+        counters['verified'] += 1
+        self.stats['verified'] += 1
+        if result.success:
+            counters['genuine'] += 1
+            self.stats['genuine'] += 1
+        else:
+            counters['rejected'] += 1
+            self.stats['rejected'] += 1
+
+    async def verify(self, results: Sequence[Tuple[Any, bool, float]],
+                     address_map: Optional[Dict[str, str]] = None) -> List[Tuple[Any, bool, float]]:
+        """
+        مرحله دوم دسته‌ای روی نتایج تست TCP
+
+        فقط کانفیگ‌های پاسخ‌گو با فریم‌بندی پشتیبانی شده تأیید می‌شوند؛ رد
+        شدن handshake کانفیگ را ناموفق می‌کند و latency همان زمان TCP می‌ماند.
+        """
+        verified = list(results)
+        pending = [index for index, (_, is_working, _) in enumerate(verified) if is_working]
+        if not pending:
+            return verified
+
+        def resolved(config):
+            if not address_map:
+                return None
+            return address_map.get(normalize_host(config.address))
+
+        outcomes = await asyncio.gather(*(
+            self.verify_handshake(verified[index][0], resolved(verified[index][0]))
+            for index in pending))
+        for index, outcome in zip(pending, outcomes):
+            if outcome.supported and not outcome.success:
+                config, _, _ = verified[index]
+                verified[index] = (config, False, 0.0)
+        return verified
+
+    def reset_stats(self):
+        """پاک کردن آمار سیکل قبلی"""
+        self.stats = {'verified': 0, 'genuine': 0, 'rejected': 0, 'unsupported': 0,
+                      'by_protocol': {}}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """آمار تأیید handshake سیکل جاری"""
+        return {**self.stats, 'by_protocol': {
+            protocol: dict(counters) for protocol, counters in self.stats['by_protocol'].items()}}
 
     async def comprehensive_test(self, config) -> Dict:
         """تست جامع یک کانفیگ"""
@@ -288,6 +542,160 @@ class AdvancedProtocolTester:
 
         return results
 
+    async def comprehensive_test_many(self, configs: Sequence[Any]) -> List[Dict]:
+        """تست جامع موازی چند کانفیگ (همزمانی handshake با semaphore محدود است)"""
+        return await asyncio.gather(*(self.comprehensive_test(config) for config in configs))
+
+
+class _StandInHandler:
+    """پردازش یک اتصال stand-in: تأیید handshake و پاسخ به درخواست HTTP تونل"""
+
+    def __init__(self, server: 'ProxyStandInServer'):
+        self.server = server
+
+    async def __call__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        server = self.server
+        try:
+            if server.protocol == 'vless':
+                accepted = await self._vless(reader)
+            elif server.protocol == 'trojan':
+                accepted = await self._trojan(reader)
+            else:
+                accepted = await self._shadowsocks(reader, writer)
+                return
+
+            if accepted:
+                if server.protocol == 'vless':
+                    writer.write(b'\x00\x00')
+                writer.write(server.response)
+            else:
+                # رفتار fallback: پاسخ وب‌سرور معمولی
+                writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+            await writer.drain()
+        except Exception:
+            # اتصال ناقص یا بسته شده توسط کلاینت
+            pass
+        finally:
+            server.connections += 1
+            writer.close()
+
+    async def _read_socks_address(self, reader: asyncio.StreamReader, domain_type: int):
+        address_type = (await reader.readexactly(1))[0]
+        if address_type == domain_type:
+            await reader.readexactly((await reader.readexactly(1))[0])
+        else:
+            await reader.readexactly(4 if address_type == 1 else 16)
+
+    async def _read_http_request(self, reader: asyncio.StreamReader):
+        await reader.readuntil(b'\r\n\r\n')
+
+    async def _vless(self, reader: asyncio.StreamReader) -> bool:
+        header = await reader.readexactly(18)
+        if header[0] != 0 or header[1:17] != self.server.user_id:
+            return False
+        await reader.readexactly(header[17])
+        await reader.readexactly(3)  # فرمان و پورت
+        await self._read_socks_address(reader, domain_type=2)
+        await self._read_http_request(reader)
+        return True
+
+    async def _trojan(self, reader: asyncio.StreamReader) -> bool:
+        line = await reader.readuntil(b'\r\n')
+        if line[:-2] != self.server.password_hash:
+            return False
+        await reader.readexactly(1)
+        await self._read_socks_address(reader, domain_type=3)
+        await reader.readexactly(2 + 2)  # پورت و CRLF
+        await self._read_http_request(reader)
+        return True
+
+    async def _shadowsocks(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        server = self.server
+        key_size = len(server.master_key)
+        decryptor = ShadowsocksAEADCipher(server.method, server.master_key,
+                                          await reader.readexactly(key_size))
+        try:
+            data = await decryptor.read_chunk(reader)
+        except Exception:
+            # مانند سرور واقعی: بدون پاسخ تا بسته شدن اتصال
+            await reader.read()
+            return
+        while b'\r\n\r\n' not in data:
+            data += await decryptor.read_chunk(reader)
+        salt = os.urandom(key_size)
+        encryptor = ShadowsocksAEADCipher(server.method, server.master_key, salt)
+        writer.write(salt + encryptor.encrypt_chunks(server.response))
+        await writer.drain()
+
+
+def self_signed_server_context(hostname: str = 'localhost') -> ssl.SSLContext:
+    """SSLContext سمت سرور با گواهی self-signed موقت (برای stand-in Trojan)"""
+    import datetime
+    from cryptography import x509
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, hostname)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (x509.CertificateBuilder().subject_name(name).issuer_name(name)
+                   .public_key(key.public_key()).serial_number(x509.random_serial_number())
+                   .not_valid_before(now - datetime.timedelta(days=1))
+                   .not_valid_after(now + datetime.timedelta(days=1))
+                   .sign(key, hashes.SHA256()))
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    with tempfile.TemporaryDirectory() as directory:
+        cert_file = os.path.join(directory, 'cert.pem')
+        key_file = os.path.join(directory, 'key.pem')
+        with open(cert_file, 'wb') as f:
+            f.write(certificate.public_bytes(serialization.Encoding.PEM))
+        with open(key_file, 'wb') as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM,
+                                      serialization.PrivateFormat.PKCS8,
+                                      serialization.NoEncryption()))
+        context.load_cert_chain(cert_file, key_file)
+    return context
+
+
+class ProxyStandInServer:
+    """
+    سرور محلی VLESS، Trojan یا Shadowsocks (AEAD) برای تست آفلاین
+
+    handshake را با اعتبارنامه خود بررسی و به جای اتصال به مقصد، به
+    درخواست HTTP داخل تونل مستقیماً با کد status پاسخ می‌دهد. اعتبارنامه
+    اشتباه در VLESS/Trojan پاسخ fallback (400) و در Shadowsocks سکوت دارد.
+    Trojan به ssl_context سمت سرور نیاز دارد.
+    """
+
+    def __init__(self, protocol: str, credential: str, method: str = 'aes-256-gcm',
+                 host: str = '127.0.0.1', port: int = 0, status: int = 204,
+                 ssl_context: Optional[ssl.SSLContext] = None):
+        self.protocol = protocol
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.response = f"HTTP/1.1 {status} No Content\r\nContent-Length: 0\r\n\r\n".encode()
+        self.user_id = _vless_uuid_bytes(credential) if protocol == 'vless' else b''
+        self.password_hash = hashlib.sha224(credential.encode()).hexdigest().encode()
+        self.method = method
+        self.master_key = ss_master_key(credential, SS_AEAD_METHODS.get(method, 32))
+        self.connections = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        """شروع سرور و برگرداندن پورت"""
+        self.server = await asyncio.start_server(
+            _StandInHandler(self), self.host, self.port, ssl=self.ssl_context)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
 # مثال استفاده
 
 
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async Probe Engine
+موتور تست اتصال غیرمسدودکننده بر پایه asyncio
+"""
+
+import asyncio
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from adaptive_timeout import AdaptiveTimeoutController
+from dns_resolver import AsyncDNSResolver, normalize_host
+from latency_stats import LatencyStats, apply_latency_stats, summarize_samples
+
+logger = logging.getLogger(__name__)
+
+
+def endpoint_key(config: Any, address_map: Optional[Dict[str, str]] = None) -> str:
+    """
+    کلید نرمال‌شده endpoint (host:port) برای یک کانفیگ
+
+    اگر address_map (hostname → IP) داده شود، کلید بر اساس IP resolve شده است.
+    """
+    host = normalize_host(config.address)
+    if address_map:
+        host = address_map.get(host, host)
+    if ':' in host:
+        return f"[{host}]:{config.port}"
+    return f"{host}:{config.port}"
+
+
+def group_by_endpoint(configs: Sequence[Any],
+                      address_map: Optional[Dict[str, str]] = None) -> Dict[str, List[Any]]:
+    """گروه‌بندی کانفیگ‌ها بر اساس endpoint با حفظ ترتیب اولین مشاهده"""
+    groups: Dict[str, List[Any]] = {}
+    for config in configs:
+        groups.setdefault(endpoint_key(config, address_map), []).append(config)
+    return groups
+
+
+@dataclass
+class ProbeResult:
+    """نتیجه یک تست اتصال"""
+    success: bool
+    latency: float = 0.0  # زمان اتصال TCP (میلی‌ثانیه)
+    error: str = ""
+    attempts: int = 0
+    resolve_time: float = 0.0  # زمان resolve جدا از زمان اتصال (میلی‌ثانیه)
+    stats: Optional[LatencyStats] = None  # فقط در حالت چند نمونه‌ای
+
+
+class AsyncProbeEngine:
+    """
+    موتور تست اتصال TCP بدون بلاک کردن event loop
+
+    تمام تست‌ها از یک semaphore سراسری عبور می‌کنند، هر تلاش deadline
+    مستقل دارد و در صورت اتمام زمان، اتصال در حال انجام cancel می‌شود.
+    """
+
+    def __init__(self, max_concurrency: int = 2000, timeout: float = 3.0,
+                 attempts: int = 1, resolver: Optional[AsyncDNSResolver] = None,
+                 timeout_controller: Optional[AdaptiveTimeoutController] = None,
+                 samples: int = 1, sample_interval: float = 0.01):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.attempts = max(1, attempts)
+        # تعداد نمونه همزمان برای هر endpoint (1 = یک اتصال)
+        self.samples = max(1, samples)
+        self.sample_interval = sample_interval
+        self.resolver = resolver
+        # deadline تطبیقی هر کانفیگ (None = timeout ثابت)
+        self.timeout_controller = timeout_controller
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.last_run_stats: Dict[str, Any] = {}
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """semaphore سراسری متعلق به event loop جاری"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def _connect_once(self, address: str, port: int, timeout: float) -> float:
+        """یک تلاش اتصال با deadline مستقل"""
+        start_time = time.perf_counter()
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(address, port), timeout=timeout)
+        latency = (time.perf_counter() - start_time) * 1000
+
+        # بستن فوری بدون انتظار برای FIN
+        writer.transport.abort()
+        return latency
+
+    async def _sample(self, address: str, port: int, timeout: float,
+                      delay: float) -> Optional[float]:
+        """یک نمونه از چند نمونه همزمان (None = ناموفق)"""
+        if delay:
+            await asyncio.sleep(delay)
+        async with self.semaphore:
+            try:
+                return await self._connect_once(address, port, timeout)
+            except (asyncio.TimeoutError, OSError, ValueError):
+                return None
+
+    async def _probe_samples(self, address: str, port: int, timeout: float,
+                             resolve_time: float) -> ProbeResult:
+        """
+        چند اتصال همزمان با فاصله شروع sample_interval
+
+        زمان کل تقریباً برابر کندترین نمونه است نه مجموع نمونه‌ها. هر نمونه
+        جایگاه semaphore خودش را می‌گیرد تا تعداد اتصال‌های همزمان از
+        max_concurrency بیشتر نشود؛ تلاش مجدد جای خود را به loss می‌دهد.
+        """
+        samples = await asyncio.gather(*(
+            self._sample(address, port, timeout, index * self.sample_interval)
+            for index in range(self.samples)))
+        stats = summarize_samples(samples)
+        success = stats.loss_rate < 1.0
+        return ProbeResult(success, stats.median, "" if success else "loss",
+                           self.samples, resolve_time, stats)
+
+    async def probe(self, address: str, port: int,
+                    timeout: Optional[float] = None) -> ProbeResult:
+        """تست اتصال TCP به یک endpoint"""
+        timeout = timeout or self.timeout
+        error = ""
+
+        # resolve جداگانه تا زمان DNS در latency اتصال حساب نشود
+        resolve_time = 0.0
+        if self.resolver is not None:
+            target, resolve_time = await self.resolver.resolve_timed(address)
+            if target is None:
+                return ProbeResult(False, 0.0, "dns", 0, resolve_time)
+            address = target
+
+        if self.samples > 1:
+            return await self._probe_samples(address, port, timeout, resolve_time)
+
+        async with self.semaphore:
+            for attempt in range(1, self.attempts + 1):
+                try:
+                    latency = await self._connect_once(address, port, timeout)
+                    return ProbeResult(True, latency, attempts=attempt,
+                                       resolve_time=resolve_time)
+                except asyncio.TimeoutError:
+                    error = "timeout"
+                except (OSError, ValueError) as e:
+                    error = type(e).__name__
+
+        return ProbeResult(False, 0.0, error, self.attempts, resolve_time)
+
+    async def probe_many(self, configs: Sequence[Any], deadline: Optional[float] = None,
+                         address_map: Optional[Dict[str, str]] = None) -> List[Tuple[Any, bool, float]]:
+        """
+        تست موازی تعداد زیادی کانفیگ با حافظه محدود
+
+        به جای ساخت یک task برای هر کانفیگ، تعداد ثابتی worker کانفیگ‌ها را
+        از یک iterator مشترک برمی‌دارند. deadline (بر حسب loop.time) اختیاری
+        است و کانفیگ‌هایی که تا آن زمان تست نشده‌اند در خروجی نمی‌آیند.
+        address_map نتایج resolve قبلی (hostname → IP) را در اختیار می‌گذارد.
+        با timeout_controller، deadline هر کانفیگ از توزیع تأخیر گروه آن تعیین می‌شود.
+        """
+        if not configs:
+            return []
+
+        loop = asyncio.get_running_loop()
+        results: List[Optional[Tuple[Any, bool, float]]] = [None] * len(configs)
+        pending = iter(enumerate(configs))
+        counters = {'timeouts': 0, 'errors': 0}
+        start_time = time.perf_counter()
+
+        async def worker():
+            for index, config in pending:
+                if deadline is not None and loop.time() >= deadline:
+                    return
+                address = config.address
+                if address_map:
+                    address = address_map.get(normalize_host(address), address)
+                controller = self.timeout_controller
+                timeout = controller.timeout_for(config.country, config.protocol, self.timeout) \
+                    if controller else None
+                result = await self.probe(address, config.port, timeout)
+                if controller and result.error in ("timeout", "loss") and \
+                        controller.needs_static_retry(timeout, self.timeout):
+                    # deadline تطبیقی تمام شد - یک تلاش دیگر با timeout ثابت
+                    result = await self.probe(address, config.port)
+                    controller.record_static_retry(config.country, config.protocol, result.success)
+                if controller and result.error != "dns":
+                    controller.observe(config.country, config.protocol,
+                                       result.success, result.latency)
+                if result.error == "timeout":
+                    counters['timeouts'] += 1
+                elif result.error:
+                    counters['errors'] += 1
+                if result.stats is not None:
+                    apply_latency_stats(config, result.stats)
+                results[index] = (config, result.success, result.latency)
+
+        workers = [asyncio.ensure_future(worker())
+                   for _ in range(min(self.max_concurrency, len(configs)))]
+        try:
+            if deadline is not None:
+                remaining = max(0.0, deadline - loop.time())
+                _, still_running = await asyncio.wait(workers, timeout=remaining)
+                for task in still_running:
+                    task.cancel()
+                if still_running:
+                    await asyncio.gather(*still_running, return_exceptions=True)
+            else:
+                await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                if not task.done():
+                    task.cancel()
+
+        completed = [item for item in results if item is not None]
+        duration = time.perf_counter() - start_time
+        self.last_run_stats = {
+            'probed': len(completed),
+            'skipped': len(configs) - len(completed),
+            'succeeded': sum(1 for _, ok, _ in completed if ok),
+            'timeouts': counters['timeouts'],
+            'errors': counters['errors'],
+            'duration': round(duration, 3),
+            'configs_per_second': round(len(completed) / duration, 1) if duration > 0 else 0.0,
+        }
+        return completed
@@ -100,6 +100,10 @@ class AutomationManager:
             self.save_stats()
             return False
 
+        finally:
+            # هر کار در asyncio.run جداگانه اجرا می‌شود؛ اتصال‌ها روی همین loop بسته شوند
+            await self.collector.http_client.close()
+
     def setup_schedule(self):
         """تنظیم زمان‌بندی کارها"""
 
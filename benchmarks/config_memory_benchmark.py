@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+V2RayConfig Memory Benchmark
+مقایسه حافظه dataclass معمولی قبلی، V2RayConfig فشرده (slots + intern) و
+CompactConfigStore ستونی
+
+حافظه نگه داشته شده به ازای هر کانفیگ اندازه‌گیری می‌شود: مقادیر هر کانفیگ
+(رشته‌ها و float های تازه، مانند خروجی parser) داخل اندازه‌گیری ساخته و
+ورودی‌ها پس از ساخت رها می‌شوند؛ پس سهم رشته‌ها و float هایی که هر شیء نگه
+می‌دارد هم حساب می‌شود.
+
+اجرا: python benchmarks/config_memory_benchmark.py [تعداد]
+"""
+
+import os
+import sys
+import json
+import argparse
+import random
+import gc
+import tracemalloc
+from dataclasses import fields, make_dataclass
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+logging.disable(logging.CRITICAL)
+
+from config_collector import V2RayConfig  # noqa: E402
+from config_store import CompactConfigStore  # noqa: E402
+
+# همان چیدمان قبلی: dataclass بدون slots و بدون intern
+LegacyV2RayConfig = make_dataclass(
+    'LegacyV2RayConfig',
+    [(f.name, f.type, f.default) if f.default is not f.default_factory else (f.name, f.type)
+     for f in fields(V2RayConfig)])
+
+
+def build_rows(count: int):
+    """ساخت مقادیر فیلدها شبیه خروجی parser پس از تست و امتیازدهی AI"""
+    rng = random.Random(42)
+    protocols = ['vmess', 'vless', 'trojan', 'ss']
+    countries = ['US', 'DE', 'NL', 'IR', 'TR', 'Unknown']
+    networks = ['tcp', 'ws', 'grpc']
+    rows = []
+    for i in range(count):
+        address = f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        uuid = f"{i:08x}-{rng.getrandbits(16):04x}-4abc-8def-{rng.getrandbits(48):012x}"
+        protocol = rng.choice(protocols)
+        rows.append({
+            'protocol': protocol,
+            'address': address,
+            'port': rng.choice([443, 8443, 2053, 80 + i % 1000]),
+            'uuid': uuid,
+            # رشته‌های تازه مانند خروجی json.loads (بدون intern)
+            'network': ''.join(rng.choice(networks)),
+            'tls': True,
+            'raw_config': f"{protocol}://{uuid}@{address}:443?security=tls&type=ws#node-{i}",
+            'latency': rng.uniform(20, 900),
+            'is_working': True,
+            'country': ''.join(rng.choice(countries)),
+            'ai_quality_score': rng.random(),
+            'ai_quality_category': 'good',
+            'ai_confidence_level': rng.random(),
+            'ai_latency_score': rng.random(),
+            'ai_security_score': rng.random(),
+            'ai_stability_score': rng.random(),
+            'ai_performance_score': rng.random(),
+        })
+    return rows
+
+
+def measure_objects(factory, count: int) -> int:
+    """حافظه نگه داشته شده لیست اشیاء factory (بایت)"""
+    tracemalloc.start()
+    rows = build_rows(count)
+    objects = [factory(**row) for row in rows]
+    del rows
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current
+
+
+def measure_store(count: int) -> int:
+    """حافظه نگه داشته شده CompactConfigStore (بایت)"""
+    tracemalloc.start()
+    store = CompactConfigStore(V2RayConfig)
+    for row in build_rows(count):
+        store.append(V2RayConfig(**row))
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description='V2RayConfig memory benchmark')
+    parser.add_argument('count', nargs='?', type=int, default=100_000,
+                        help='تعداد کانفیگ')
+    count = parser.parse_args().count
+    layouts = {
+        'legacy_dataclass': measure_objects(LegacyV2RayConfig, count),
+        'slotted_interned': measure_objects(V2RayConfig, count),
+        'columnar_store': measure_store(count),
+    }
+    legacy_bytes = layouts['legacy_dataclass']
+
+    result = {'configs': count}
+    for name, retained in layouts.items():
+        result[name] = {
+            'bytes_per_config': round(retained / count, 1),
+            'mb_per_100k': round(retained / count * 100_000 / 1024 / 1024, 2),
+            'reduction_vs_legacy': round(legacy_bytes / retained, 2) if retained else None,
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GeoIP Loader Benchmark
+زمان بارگذاری، حافظه و سرعت lookup پایگاه داده GeoIP در قالب CSV و MMDB
+
+N رنج تصادفی IPv4 (و چند رنج IPv6) ساخته و در یک پوشه موقت به صورت CSV و
+MMDB نوشته می‌شود. برای هر backend زمان باز کردن، حافظه Python اختصاص یافته
+هنگام بارگذاری، زمان هر lookup تکی، زمان lookup دسته‌ای 100k آدرس و زمان
+بارگذاری مجدد پس از جایگزینی اتمیک فایل گزارش می‌شود. MMDB روی mmap باز
+می‌شود پس حافظه آن عملاً صفحات فایل در page cache است، نه heap.
+
+اجرا: python benchmarks/geoip_loader_benchmark.py [تعداد رنج] [تعداد آدرس]
+"""
+
+import os
+import sys
+import time
+import json
+import random
+import shutil
+import socket
+import logging
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+from geo_database import GeoDatabase, write_country_mmdb  # noqa: E402
+
+COUNTRIES = ['US', 'DE', 'NL', 'FR', 'GB', 'IR', 'TR', 'SG', 'JP', 'CA', 'FI', 'SE']
+
+
+def build_ranges(count: int, seed: int = 7):
+    """شبکه‌های تصادفی IPv4 (/16 تا /24) و چند شبکه IPv6"""
+    rng = random.Random(seed)
+    ranges = []
+    for _ in range(count):
+        prefix = rng.choice([16, 18, 20, 22, 24])
+        base = rng.getrandbits(32) & (0xffffffff << (32 - prefix)) & 0xffffffff
+        network = socket.inet_ntoa(base.to_bytes(4, 'big'))
+        ranges.append((f'{network}/{prefix}', rng.choice(COUNTRIES)))
+    for index in range(max(1, count // 100)):
+        ranges.append((f'2a0{index % 10}:{index:x}::/32', rng.choice(COUNTRIES)))
+    return ranges
+
+
+def write_csv(path: str, ranges):
+    with open(path, 'w', encoding='utf-8') as f:
+        for network, country in ranges:
+            f.write(f'{network},{country}\n')
+
+
+def measure_backend(path: str, addresses, rewrite) -> dict:
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    database = GeoDatabase(path, reload_interval=0)
+    load_ms = (time.perf_counter() - start_time) * 1000
+    heap_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sample = addresses[:10_000]
+    start_time = time.perf_counter()
+    for address in sample:
+        database.lookup(address)
+    single_us = (time.perf_counter() - start_time) / len(sample) * 1e6
+
+    start_time = time.perf_counter()
+    countries = database.lookup_many(addresses)
+    batch_ms = (time.perf_counter() - start_time) * 1000
+
+    # جایگزینی اتمیک فایل و اندازه‌گیری reload در lookup بعدی
+    rewrite(path)
+    start_time = time.perf_counter()
+    database.lookup(addresses[0])
+    reload_ms = (time.perf_counter() - start_time) * 1000
+    reloads = database.get_stats()['reloads']
+    database.close()
+
+    return {
+        'file_mb': round(os.path.getsize(path) / 1024 / 1024, 2),
+        'load_ms': round(load_ms, 1),
+        'load_heap_mb': round(heap_bytes / 1024 / 1024, 2),
+        'single_lookup_us': round(single_us, 2),
+        'batch_lookup_ms': round(batch_ms, 1),
+        'found': sum(country is not None for country in countries),
+        'reload_ms': round(reload_ms, 1),
+        'reloaded': reloads == 1,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GeoIP CSV/MMDB loader benchmark')
+    parser.add_argument('ranges', nargs='?', type=int, default=50_000,
+                        help='تعداد رنج')
+    parser.add_argument('addresses', nargs='?', type=int, default=100_000,
+                        help='تعداد آدرس')
+    args = parser.parse_args()
+    range_count = args.ranges
+    address_count = args.addresses
+
+    ranges = build_ranges(range_count)
+    rng = random.Random(11)
+    addresses = [socket.inet_ntoa(rng.getrandbits(32).to_bytes(4, 'big'))
+                 for _ in range(address_count)]
+
+    directory = tempfile.mkdtemp(prefix='geoip_bench_')
+    try:
+        csv_path = os.path.join(directory, 'ranges.csv')
+        mmdb_path = os.path.join(directory, 'ranges.mmdb')
+        write_csv(csv_path, ranges)
+        start_time = time.perf_counter()
+        write_country_mmdb(mmdb_path, ranges)
+        mmdb_write_s = time.perf_counter() - start_time
+
+        def rewrite_csv(path):
+            temp_path = path + '.new'
+            write_csv(temp_path, ranges[::-1])
+            os.replace(temp_path, path)
+
+        def rewrite_mmdb(path):
+            write_country_mmdb(path, ranges[::-1])
+
+        result = {
+            'ranges': len(ranges),
+            'addresses': address_count,
+            'mmdb_build_s': round(mmdb_write_s, 2),
+            'csv': measure_backend(csv_path, addresses, rewrite_csv),
+            'mmdb': measure_backend(mmdb_path, addresses, rewrite_mmdb),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
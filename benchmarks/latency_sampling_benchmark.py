@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Latency Sampling Benchmark
+هزینه اندازه‌گیری چند نمونه‌ای تأخیر (K نمونه همزمان) در برابر یک نمونه
+
+روی loopback تعدادی endpoint باز و بسته ساخته می‌شود و برای هر K زمان
+واقعی، زمان CPU و تعداد اتصال هر دو موتور تست گزارش می‌شود. socket های باز
+فقط listen می‌کنند (handshake را kernel کامل می‌کند) تا سرور روی CPU بنچمارک
+اثری نگذارد. روی loopback زمان اتصال ناچیز است پس هزینه عمدتاً CPU است؛ برای
+تخمین زمان واقعی روی شبکه، موتور async یک بار هم با RTT شبیه‌سازی شده اجرا
+می‌شود (تأخیر ثابت پیش از هر اتصال).
+
+اجرا: python benchmarks/latency_sampling_benchmark.py [تعداد endpoint] [K ...]
+"""
+
+import os
+import sys
+import time
+import json
+import socket
+import asyncio
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+from async_probe_engine import AsyncProbeEngine  # noqa: E402
+from config_collector import UltraFastConnectionPool, V2RayConfig  # noqa: E402
+
+
+def start_endpoints(count: int):
+    """نیمی از endpoint ها باز (socket در حال listen) و نیمی بسته"""
+    servers = []
+    ports = []
+    for index in range(count):
+        if index % 2 == 0:
+            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server.bind(('127.0.0.1', 0))
+            server.listen(256)
+            servers.append(server)
+            ports.append(server.getsockname()[1])
+        else:
+            # پورت بسته: اتصال بلافاصله رد می‌شود
+            ports.append(1 + index)
+    return servers, ports
+
+
+class EmulatedRTTProbeEngine(AsyncProbeEngine):
+    """موتور async با تأخیر ثابت پیش از هر اتصال (شبیه RTT شبکه)"""
+
+    def __init__(self, rtt: float, **kwargs):
+        super().__init__(**kwargs)
+        self.rtt = rtt
+
+    async def _connect_once(self, address: str, port: int, timeout: float) -> float:
+        start_time = time.perf_counter()
+        await asyncio.sleep(self.rtt)
+        await super()._connect_once(address, port, timeout)
+        return (time.perf_counter() - start_time) * 1000
+
+
+def build_configs(ports):
+    return [V2RayConfig(protocol='vless', address='127.0.0.1', port=port,
+                        uuid=f'bench-{index}')
+            for index, port in enumerate(ports)]
+
+
+async def run_engine(name: str, ports, samples: int):
+    configs = build_configs(ports)
+    if name == 'async':
+        engine = AsyncProbeEngine(max_concurrency=200, timeout=2.0, samples=samples)
+        probe = engine.probe_many(configs)
+    elif name.startswith('async+rtt'):
+        rtt = int(name[len('async+rtt'):]) / 1000
+        engine = EmulatedRTTProbeEngine(rtt, max_concurrency=200, timeout=2.0, samples=samples)
+        probe = engine.probe_many(configs)
+    else:
+        engine = UltraFastConnectionPool(max_workers=200, timeout=2.0)
+        engine.samples = samples
+        probe = engine.test_multiple_connections(configs)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    results = await probe
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    if name == 'pool':
+        engine.close()
+
+    working = [config for config, ok, _ in results if ok]
+    return {
+        'engine': name,
+        'samples': samples,
+        'endpoints': len(configs),
+        'connections': len(configs) * samples,
+        'working': len(working),
+        'wall_time': round(wall, 3),
+        'cpu_time': round(cpu, 3),
+        'cpu_us_per_connection': round(cpu / (len(configs) * samples) * 1e6, 1),
+        'mean_jitter_ms': round(sum(c.jitter for c in working) / len(working), 3) if working else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='multi-sample latency benchmark')
+    parser.add_argument('count', nargs='?', type=int, default=400,
+                        help='تعداد endpoint')
+    parser.add_argument('samples', nargs='*', type=int, default=[1, 3, 5],
+                        help='تعداد نمونه‌های هر اجرا (K)')
+    args = parser.parse_args()
+    count = args.count
+    sample_counts = args.samples
+    servers, ports = start_endpoints(count)
+
+    rows = []
+    try:
+        for name in ('async', 'pool', 'async+rtt100'):
+            baseline = None
+            for samples in sample_counts:
+                row = await run_engine(name, ports, samples)
+                baseline = baseline or row
+                row['wall_overhead'] = round(row['wall_time'] / baseline['wall_time'], 2) \
+                    if baseline['wall_time'] else None
+                row['cpu_overhead'] = round(row['cpu_time'] / baseline['cpu_time'], 2) \
+                    if baseline['cpu_time'] else None
+                rows.append(row)
+    finally:
+        for server in servers:
+            server.close()
+
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
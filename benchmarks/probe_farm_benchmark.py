@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Probe Target Farm Benchmark
+مزرعه endpoint های محلی روی loopback برای بنچمارک تکرارپذیر توان تست
+
+هزاران listener محلی TCP، TLS، UDP و پروکسی (VLESS/Trojan/Shadowsocks)
+با رفتارهای مختلف ساخته می‌شود و برای هر کدام کانفیگ مصنوعی متناظر تولید
+می‌شود. سپس test_all_configs_ultra_fast (هر دو موتور) و مرحله تأیید
+handshake در AdvancedProtocolTester روی آن‌ها اجرا و برای هر اجرا تعداد
+کانفیگ در ثانیه، p50/p99 تأخیر تست و تأخیر event loop به صورت JSON چاپ
+می‌شود تا تغییرات موتور تست قابل مقایسه باشند.
+
+رفتار endpoint ها:
+  tcp_open       socket در حال listen (handshake را kernel کامل می‌کند)
+  tcp_refused    پورت بسته (رد فوری اتصال)
+  tcp_reset      پذیرش و بستن فوری اتصال با RST
+  tcp_blackhole  صف accept پر - SYN ها دور ریخته می‌شوند (timeout)
+  tls            handshake TLS با تأخیر پاسخ قابل تنظیم
+  udp_quic       پاسخ Version Negotiation با تأخیر قابل تنظیم
+  udp_drop       socket UDP بدون پاسخ
+  udp_refused    پورت UDP بسته (خطای ICMP)
+
+تأخیر روی loopback فقط در لایه برنامه قابل شبیه‌سازی است (TLS، پاسخ UDP و
+پروکسی)؛ اتصال TCP را kernel بدون دخالت سرور کامل می‌کند.
+
+اجرا: python benchmarks/probe_farm_benchmark.py [تعداد endpoint] [--delay ms] [--engines async,pool,handshake]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import struct
+import asyncio
+import logging
+import argparse
+import tempfile
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+from advanced_protocol_tester import (AdvancedProtocolTester, ProxyStandInServer,  # noqa: E402
+                                      self_signed_server_context)
+from config_collector import V2RayCollector, V2RayConfig  # noqa: E402
+from udp_probe_engine import UDPStandInServer  # noqa: E402
+
+# سهم هر رفتار در مزرعه (جمع 1)
+DEFAULT_MIX = {
+    'tcp_open': 0.35,
+    'tcp_refused': 0.15,
+    'tcp_reset': 0.05,
+    'tcp_blackhole': 0.05,
+    'tls': 0.15,
+    'udp_quic': 0.15,
+    'udp_drop': 0.05,
+    'udp_refused': 0.05,
+}
+
+USER_ID = 'b831381d-6324-4d53-ad4f-8cda48b30811'
+
+
+def percentile(values, fraction: float) -> float:
+    """صدک nearest-rank (0 برای لیست خالی)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(len(ordered) * fraction + 0.5) - 1))]
+
+
+def free_port(kind: int) -> int:
+    """پورت آزاد (بسته) از نوع داده شده"""
+    probe = socket.socket(socket.AF_INET, kind)
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+class _ResetProtocol(asyncio.Protocol):
+    def connection_made(self, transport):
+        sock = transport.get_extra_info('socket')
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        transport.abort()
+
+
+class ProbeTargetFarm:
+    """مجموعه listener های محلی و کانفیگ‌های مصنوعی متناظر"""
+
+    def __init__(self, count: int, mix=None, delay: float = 0.0):
+        self.count = count
+        self.mix = mix or DEFAULT_MIX
+        self.delay = delay
+        self.sockets = []
+        self.servers = []
+        self.udp_servers = []
+        self.endpoints = []  # (behaviour, port)
+        self.tls_context = self_signed_server_context()
+
+    async def _tls_handler(self, reader, writer):
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            await writer.start_tls(self.tls_context)
+            await reader.read(1)
+        except Exception:
+            pass
+        finally:
+            writer.close()
+
+    def _listen(self, backlog: int = 4096) -> int:
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(backlog)
+        self.sockets.append(server)
+        return server.getsockname()[1]
+
+    def _blackhole(self) -> int:
+        port = self._listen(backlog=0)
+        # پر کردن صف accept؛ SYN های بعدی بدون پاسخ می‌مانند
+        for _ in range(3):
+            filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            filler.setblocking(False)
+            try:
+                filler.connect(('127.0.0.1', port))
+            except BlockingIOError:
+                pass
+            self.sockets.append(filler)
+        return port
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        counts = {name: int(round(self.count * share)) for name, share in self.mix.items()}
+        for behaviour, amount in counts.items():
+            for _ in range(amount):
+                if behaviour == 'tcp_open':
+                    port = self._listen()
+                elif behaviour == 'tcp_refused':
+                    port = free_port(socket.SOCK_STREAM)
+                elif behaviour == 'tcp_reset':
+                    server = await loop.create_server(_ResetProtocol, '127.0.0.1', 0)
+                    self.servers.append(server)
+                    port = server.sockets[0].getsockname()[1]
+                elif behaviour == 'tcp_blackhole':
+                    port = self._blackhole()
+                elif behaviour == 'tls':
+                    server = await asyncio.start_server(self._tls_handler, '127.0.0.1', 0)
+                    self.servers.append(server)
+                    port = server.sockets[0].getsockname()[1]
+                elif behaviour == 'udp_quic':
+                    stand_in = UDPStandInServer('quic', delay=self.delay)
+                    port = await stand_in.start()
+                    self.udp_servers.append(stand_in)
+                elif behaviour == 'udp_drop':
+                    stand_in = UDPStandInServer('drop')
+                    port = await stand_in.start()
+                    self.udp_servers.append(stand_in)
+                else:
+                    port = free_port(socket.SOCK_DGRAM)
+                self.endpoints.append((behaviour, port))
+
+    def build_configs(self):
+        """کانفیگ مصنوعی برای هر endpoint (هر بار اشیاء تازه)"""
+        configs = []
+        for index, (behaviour, port) in enumerate(self.endpoints):
+            if behaviour.startswith('udp'):
+                protocol, tls = 'hysteria', False
+                raw = f'hysteria2://farm-{index}@127.0.0.1:{port}?sni=farm.local#farm-{index}'
+            elif behaviour == 'tls':
+                protocol, tls = 'trojan', True
+                raw = f'trojan://farm-{index}@127.0.0.1:{port}?sni=farm.local#farm-{index}'
+            else:
+                protocol, tls = 'vless', False
+                raw = f'vless://{USER_ID}@127.0.0.1:{port}?type=tcp#farm-{index}'
+            configs.append(V2RayConfig(protocol=protocol, address='127.0.0.1', port=port,
+                                       uuid=f'farm-{index:06d}-{USER_ID}', tls=tls,
+                                       sni='farm.local' if tls else '', raw_config=raw))
+        return configs
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+        for server in self.servers:
+            await server.wait_closed()
+        for stand_in in self.udp_servers:
+            stand_in.close()
+        for sock in self.sockets:
+            sock.close()
+
+
+class LoopLagMonitor:
+    """اندازه‌گیری تأخیر event loop (تأخیر بیدار شدن یک sleep دوره‌ای)"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append((loop.time() - started - self.interval) * 1000)
+
+    def __enter__(self):
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+    def report(self):
+        return {
+            'loop_lag_p50_ms': round(percentile(self.samples, 0.50), 3),
+            'loop_lag_p99_ms': round(percentile(self.samples, 0.99), 3),
+            'loop_lag_max_ms': round(max(self.samples), 3) if self.samples else 0.0,
+        }
+
+
+def new_collector(tls_probe: bool) -> V2RayCollector:
+    """collector با فیلتر loopback و بدون وضعیت بین اجراها (کش و backoff)"""
+    collector = V2RayCollector()
+    collector.smart_filter.allow_private = True
+    collector.smart_filter.dead_index = None
+    collector.dead_endpoints = None
+    collector.probe_cache = None
+    collector.tls_probe_enabled = tls_probe
+    return collector
+
+
+def summarize(name: str, configs, latencies, wall: float, cpu: float, monitor, extra=None):
+    row = {
+        'run': name,
+        'configs': len(configs),
+        'working': len(latencies),
+        'wall_time': round(wall, 3),
+        'cpu_time': round(cpu, 3),
+        'configs_per_second': round(len(configs) / wall, 1) if wall else 0.0,
+        'latency_p50_ms': round(percentile(latencies, 0.50), 3),
+        'latency_p99_ms': round(percentile(latencies, 0.99), 3),
+        **monitor.report(),
+    }
+    row.update(extra or {})
+    return row
+
+
+async def run_collector(farm: ProbeTargetFarm, mode: str, tls_probe: bool, workdir: str):
+    collector = new_collector(tls_probe)
+    configs = farm.build_configs()
+    # خروجی‌های collector (کش DNS، آمار اولویت) در پوشه موقت نوشته می‌شوند
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        with LoopLagMonitor() as monitor:
+            await collector.test_all_configs_ultra_fast(configs, mode=mode)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+    finally:
+        os.chdir(cwd)
+    if mode == 'pool':
+        collector.connection_pool.close()
+    latencies = [config.latency for config in collector.working_configs]
+    return summarize(f'ultra_fast:{mode}' + ('+tls' if tls_probe else ''), configs,
+                     latencies, wall, cpu, monitor,
+                     {'udp_probe': collector.cycle_stats.get('udp_probe'),
+                      'tls_probe': collector.cycle_stats.get('tls_probe')})
+
+
+async def run_handshake(count: int, delay: float):
+    """تأیید handshake روی stand-in های پروکسی (یک سوم با اعتبارنامه اشتباه)"""
+    tls_context = self_signed_server_context()
+    servers = [ProxyStandInServer('vless', USER_ID),
+               ProxyStandInServer('trojan', 'farm-password', ssl_context=tls_context),
+               ProxyStandInServer('ss', 'farm-password', method='aes-256-gcm')]
+    ports = [await server.start() for server in servers]
+
+    configs = []
+    for index in range(count):
+        kind = index % 3
+        wrong = index % 9 < 3
+        if kind == 0:
+            user = '00000000-0000-0000-0000-000000000001' if wrong else USER_ID
+            configs.append(V2RayConfig(protocol='vless', address='127.0.0.1', port=ports[0],
+                                       uuid=user, raw_config=f'vless://{user}@127.0.0.1:{ports[0]}'))
+        elif kind == 1:
+            password = 'wrong' if wrong else 'farm-password'
+            configs.append(V2RayConfig(protocol='trojan', address='127.0.0.1', port=ports[1],
+                                       uuid=password, tls=True,
+                                       raw_config=f'trojan://{password}@127.0.0.1:{ports[1]}'))
+        else:
+            # رمز اشتباه شدوساکس سکوت است و تا timeout طول می‌کشد
+            password = 'wrong' if wrong else 'farm-password'
+            configs.append(V2RayConfig(protocol='ss', address='127.0.0.1', port=ports[2],
+                                       uuid=f'aes-256-gcm:{password}', raw_config='ss://farm'))
+
+    tester = AdvancedProtocolTester(timeout=max(0.5, delay * 4))
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    with LoopLagMonitor() as monitor:
+        results = await asyncio.gather(*(tester.verify_handshake(config) for config in configs))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    for server in servers:
+        await server.close()
+
+    latencies = [result.latency for result in results if result.success]
+    return summarize('handshake', configs, latencies, wall, cpu, monitor,
+                     {'handshake': tester.get_stats()})
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='loopback probe-target farm benchmark')
+    parser.add_argument('count', nargs='?', type=int, default=2000)
+    parser.add_argument('--delay', type=float, default=5.0,
+                        help='تأخیر پاسخ TLS/UDP (میلی‌ثانیه)')
+    parser.add_argument('--engines', default='async,pool,async+tls,handshake')
+    args = parser.parse_args()
+
+    delay = args.delay / 1000
+    farm = ProbeTargetFarm(args.count, delay=delay)
+    await farm.start()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            for engine in args.engines.split(','):
+                if engine == 'handshake':
+                    rows.append(await run_handshake(max(90, args.count // 4), delay))
+                else:
+                    mode, _, option = engine.partition('+')
+                    rows.append(await run_collector(farm, mode, option == 'tls', workdir))
+        finally:
+            await farm.close()
+
+    endpoints = {name: sum(1 for kind, _ in farm.endpoints if kind == name) for name in farm.mix}
+    print(json.dumps({'endpoints': endpoints, 'delay_ms': args.delay, 'runs': rows}, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
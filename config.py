@@ -20,6 +20,75 @@ COLLECTION_CONFIG = {
     'min_latency_threshold': 5000,  # حداقل تأخیر قابل قبول (میلی‌ثانیه)
     'enable_speed_test': True,  # فعال‌سازی تست سرعت
     'enable_ssl_check': True,  # بررسی گواهی SSL
+    'test_engine': 'pool',  # موتور تست: pool (ThreadPool) یا async (asyncio)
+    'async_max_concurrency': 2000,  # حداکثر اتصال همزمان در موتور async
+    'async_probe_timeout': 3.0,  # deadline هر تلاش اتصال (ثانیه)
+    'async_probe_attempts': 1,  # تعداد تلاش برای هر endpoint
+    'dns_cache_file': 'cache/dns_cache.json',  # کش DNS بین سیکل‌ها
+    'dns_positive_ttl': 1800,  # TTL نتایج موفق DNS (ثانیه)
+    'dns_negative_ttl': 300,  # TTL نتایج ناموفق DNS (ثانیه)
+    'dns_max_concurrency': 200,  # حداکثر lookup همزمان
+    'dns_timeout': 5.0,  # زمان انتظار هر lookup (ثانیه)
+    'parallel_parsing': True,  # تجزیه چندپردازه‌ای برای batch های بزرگ
+    'parse_workers': 0,  # تعداد پردازه‌ها (0 = تعداد هسته‌ها)
+    'parse_chunk_size': 2000,  # تعداد کانفیگ در هر chunk
+    'parallel_parse_min_configs': 5000,  # زیر این تعداد، تجزیه درون‌پردازه‌ای
+    'conditional_fetch': True,  # درخواست شرطی با ETag/Last-Modified برای منابع
+    'source_validators_file': 'cache/source_validators.json',  # مسیر ذخیره validator ها
+    'source_configs_dir': 'cache/source_configs',  # لیست کانفیگ هر منبع در یک فایل جدا
+    'http_pool_limit': 100,  # حداکثر اتصال‌های باز session مشترک HTTP
+    'http_limit_per_host': 8,  # حداکثر اتصال همزمان به هر host
+    'http_dns_cache_ttl': 300,  # مدت کش DNS داخلی aiohttp (ثانیه)
+    'stream_chunk_size': 65536,  # اندازه chunk خواندن تدریجی بدنه منابع (بایت)
+    'streaming_pipeline': True,  # همپوشانی دریافت و تست با صف‌های محدود
+    'pipeline_queue_size': 1000,  # ظرفیت هر صف بین مراحل (backpressure)
+    'pipeline_filter_workers': 64,  # worker های فیلتر و resolve
+    'pipeline_test_workers': 0,  # worker های تست (0 = همزمانی موتور تست)
+    'probe_cache_enabled': True,  # استفاده از نتایج تست سیکل‌های قبل
+    'probe_cache_file': 'cache/probe_results.json',  # مسیر ذخیره نتایج تست
+    'probe_cache_ttl': 1800,  # endpoint سالم تأیید شده در این بازه دوباره تست نمی‌شود (ثانیه)
+    'dead_endpoint_backoff': True,  # backoff نمایی برای endpoint های مرده
+    'dead_endpoint_file': 'cache/dead_endpoints.json',  # مسیر ذخیره فهرست endpoint های مرده
+    'dead_endpoint_threshold': 2,  # تعداد شکست متوالی تا شروع backoff
+    'dead_endpoint_base_delay': 1800,  # فاصله اولین تست مجدد (ثانیه)
+    'dead_endpoint_max_delay': 604800,  # سقف فاصله تست مجدد (ثانیه)
+    'adaptive_timeouts': True,  # deadline تست بر اساس p95 تأخیر مشاهده شده
+    'adaptive_timeout_percentile': 0.95,  # percentile مبنای deadline
+    'adaptive_timeout_initial_multiplier': 4.0,  # ضریب p95 در ابتدای سیکل
+    'adaptive_timeout_final_multiplier': 2.0,  # ضریب p95 پس از نمونه‌های کافی
+    'adaptive_timeout_min_samples': 20,  # حداقل نمونه موفق یک گروه برای استفاده از آن
+    'adaptive_timeout_min': 0.5,  # کف deadline تطبیقی (ثانیه)
+    'adaptive_timeout_max': 10.0,  # سقف deadline تطبیقی (ثانیه)
+    'probe_order': 'priority',  # ترتیب تست: priority (احتمال موفقیت) یا arrival
+    'probe_priority_file': 'cache/probe_priority.json',  # آمار موفقیت منابع و پروتکل‌ها
+    'probe_time_budget': 0,  # بودجه زمانی تست در هر سیکل (ثانیه، 0 = نامحدود)
+    'cycle_deadline': 0,  # deadline سخت کل سیکل با انتشار تدریجی (ثانیه، 0 = غیرفعال)
+    'early_publish_per_protocol': 50,  # انتشار پس از هر N کانفیگ تأیید شده جدید یک پروتکل
+    'early_publish_min_interval': 15.0,  # حداقل فاصله بین انتشارهای زودهنگام (ثانیه)
+    'latency_samples': 1,  # تعداد نمونه همزمان تأخیر برای هر endpoint (میانه، p90، jitter، loss)
+    'latency_sample_interval': 0.01,  # فاصله شروع نمونه‌ها (ثانیه)
+    'tls_probe': False,  # مرحله دوم: handshake TLS برای کانفیگ‌های TLS پاسخ‌گو در تست TCP
+    'tls_probe_timeout': 5.0,  # زمان انتظار اتصال و handshake TLS (ثانیه)
+    'seen_index': True,  # فهرست پایدار کانفیگ‌های دیده شده (Bloom filter) و اشتراک new_subscription
+    'seen_index_file': 'cache/seen_configs.bloom',  # فایل memory-mapped فهرست
+    'seen_index_capacity': 2_000_000,  # ظرفیت هر نسل (اندازه فایل ثابت، حدود 7MB برای دو نسل)
+    'seen_index_error_rate': 0.001,  # نرخ مثبت کاذب هدف (کانفیگ جدید که دیده شده حساب شود)
+    'new_configs_only': False,  # فقط کانفیگ‌هایی که در سیکل‌های قبل دیده نشده‌اند تست شوند
+    'cluster_near_duplicates': True,  # فقط بهترین نماینده هر خوشه کانفیگ هم‌زیرساخت در اشتراک‌ها
+    'cluster_similarity': 0.5,  # حداقل شباهت Jaccard وزن‌دار (credential، شبکه IP، Host/SNI، پورت، path)
+    'geoip_database': '',  # پایگاه داده IP به کشور: .mmdb (MaxMind، روی mmap) یا CSV رنج‌ها (خالی = data/ip_ranges.csv در صورت وجود؛ داده پیش‌فرضی همراه پروژه نیست و بدون آن کشور IP ها نامشخص است)
+    'geoip_reload_interval': 30.0,  # فاصله بررسی جایگزینی فایل پایگاه داده برای reload خودکار (ثانیه)
+    'allow_private_addresses': False,  # پذیرش آدرس‌های خصوصی/loopback در فیلتر (فقط بنچمارک و تست محلی)
+    'handshake_verify': False,  # تأیید handshake واقعی VLESS/Trojan/Shadowsocks (نیاز به دسترسی پروکسی به target)
+    'handshake_verify_target': 'http://www.gstatic.com/generate_204',  # مقصد درخواست HTTP داخل تونل
+    'handshake_verify_status': 204,  # کد وضعیت مورد انتظار پاسخ target
+    'handshake_verify_timeout': 5.0,  # زمان انتظار اتصال، handshake و پاسخ (ثانیه)
+    'handshake_verify_concurrency': 200,  # حداکثر تأیید handshake همزمان
+    'udp_probe': True,  # تست UDP برای Hysteria/TUIC (QUIC) و WireGuard به جای اتصال TCP
+    'udp_probe_timeout': 2.0,  # زمان انتظار پاسخ هر بسته UDP (ثانیه)
+    'udp_probe_attempts': 2,  # تعداد ارسال بسته در صورت نبود پاسخ (از دست رفتن بسته UDP)
+    'udp_max_concurrency': 500,  # حداکثر تست UDP همزمان (جدا از موتور TCP)
+    'udp_silent_is_reachable': False,  # نبود پاسخ (بدون خطای ICMP) موفق حساب شود
 }
 
 # منابع کانفیگ‌ها - منابع فعال و معتبر (بهینه‌سازی شده)
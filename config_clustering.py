@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Config Clustering
+خوشه‌بندی کانفیگ‌های تقریباً تکراری (یک سرور پشت hostname، پورت یا path متفاوت)
+"""
+
+import json
+import logging
+import random
+import time
+import zlib
+from collections import defaultdict
+from typing import Any, Callable, Dict, FrozenSet, List, Sequence
+from urllib.parse import unquote
+
+import numpy as np
+
+from config_identity import _b64decode
+from dns_resolver import is_ip_address, normalize_host
+from latency_stats import latency_sort_key
+
+logger = logging.getLogger(__name__)
+
+# وزن هر فیلد در شباهت (با تکرار توکن، مانند weighted MinHash)
+FIELD_WEIGHTS = {
+    'cred': 3,  # UUID / password
+    'net': 2,  # شبکه /24 (IPv4) یا /48 (IPv6) آدرس resolve شده
+    'host': 2,  # Host header یا SNI (سرور واقعی پشت CDN)
+    'sni': 1,
+    'port': 1,
+}
+# تعداد کوچک‌ترین hash های 3-gram مسیر (sketch فیلد fuzzy مسیر)
+PATH_SKETCH_SIZE = 4
+# حداکثر عضو نگه داشته شده در هر سطل LSH برای مقایسه
+BUCKET_CANDIDATES = 4
+# بزرگ‌ترین خوشه‌های گزارش شده
+TOP_CLUSTERS = 10
+
+
+def _token(name: str, value: str) -> int:
+    return zlib.crc32(f'{name}:{value}'.encode('utf-8'))
+
+
+def transport_fields(raw_config: str) -> Dict[str, str]:
+    """path و Host header (یا serviceName در gRPC) از لینک کانفیگ"""
+    scheme, _, body = raw_config.strip().partition('://')
+    body = body.split('#', 1)[0]
+    if scheme.lower() == 'vmess':
+        try:
+            data = json.loads(_b64decode(body).decode('utf-8'))
+            return {'path': str(data.get('path') or ''), 'host': str(data.get('host') or '')}
+        except (ValueError, UnicodeDecodeError, AttributeError):
+            pass
+
+    main, _, query = body.partition('?')
+    fields = {'path': '', 'host': ''}
+    for part in query.split('&'):
+        name, _, value = part.partition('=')
+        name = name.lower()
+        if name in ('path', 'servicename') and not fields['path']:
+            fields['path'] = unquote(value)
+        elif name == 'host':
+            fields['host'] = unquote(value)
+    if not fields['path']:
+        fields['path'] = unquote(main.rpartition('@')[2].partition('/')[2])
+    return fields
+
+
+def _network_prefix(address: str) -> str:
+    """/24 برای IPv4 و /48 برای IPv6"""
+    if ':' in address:
+        return ':'.join(address.split(':')[:3]) + '::/48'
+    return address.rpartition('.')[0] + '.0/24'
+
+
+def _path_sketch(path: str) -> List[int]:
+    """bottom-k از hash های 3-gram مسیر نرمال شده (بدون query مانند ?ed=2048)"""
+    path = path.split('?', 1)[0].strip('/').lower()
+    grams = {path[i:i + 3] for i in range(len(path) - 2)} or {path}
+    return sorted(_token('path', gram) for gram in grams)[:PATH_SKETCH_SIZE]
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+class ConfigClusterer:
+    """
+    خوشه‌بندی کانفیگ‌های سالم هم‌زیرساخت با MinHash و LSH
+
+    هر کانفیگ به مجموعه‌ای وزن‌دار از توکن‌ها (credential، شبکه IP، Host/SNI،
+    پورت و sketch مسیر) تبدیل می‌شود. signature های MinHash با numpy برای همه
+    کانفیگ‌ها یکجا محاسبه می‌شوند و کانفیگ‌های هم‌سطل در باندهای LSH با شباهت
+    Jaccard دقیق تأیید و در union-find ادغام می‌شوند؛ هزینه تقریباً خطی است.
+    خوشه‌ها فقط درون یک پروتکل ساخته می‌شوند.
+    """
+
+    def __init__(self, resolver=None, similarity: float = 0.5,
+                 num_perm: int = 24, band_rows: int = 2, seed: int = 1):
+        self.resolver = resolver
+        self.similarity = similarity
+        self.band_rows = max(1, band_rows)
+        self.num_perm = max(self.band_rows, num_perm - num_perm % self.band_rows)
+        rng = random.Random(seed)
+        self._perm_a = np.array([rng.getrandbits(64) | 1 for _ in range(self.num_perm)],
+                                dtype=np.uint64)
+        self._perm_b = np.array([rng.getrandbits(64) for _ in range(self.num_perm)],
+                                dtype=np.uint64)
+        # توکن‌های هر لینک و شبکه هر آدرس (انتشار زودهنگام چند بار خوشه‌بندی می‌کند)
+        self._tokens: Dict[str, FrozenSet[int]] = {}
+        self._networks: Dict[str, str] = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        """پاک کردن آمار و توکن‌های سیکل قبلی"""
+        self._tokens = {}
+        self._networks = {}
+        self.stats = {
+            'configs': 0,
+            'clusters': 0,
+            'duplicates_removed': 0,
+            'size_histogram': {},
+            'largest': [],
+            'cluster_time_ms': 0.0,
+        }
+
+    def _network(self, address: str) -> str:
+        """شبکه آدرس resolve شده (یا خود hostname اگر در کش DNS نباشد)"""
+        network = self._networks.get(address)
+        if network is None:
+            host = normalize_host(address)
+            resolved = self.resolver.get_cached(host) if self.resolver else \
+                host if is_ip_address(host) else None
+            network = _network_prefix(resolved) if resolved else host
+            self._networks[address] = network
+        return network
+
+    def tokens(self, config: Any) -> FrozenSet[int]:
+        """مجموعه توکن‌های زیرساخت یک کانفیگ"""
+        cached = self._tokens.get(config.raw_config)
+        if cached is not None:
+            return cached
+
+        fields = transport_fields(config.raw_config)
+        values = {
+            'cred': config.uuid,
+            'net': self._network(config.address),
+            'host': (fields['host'] or config.sni or config.address).lower(),
+            'sni': config.sni.lower(),
+            'port': str(config.port),
+        }
+        tokens = set(_path_sketch(fields['path']))
+        for name, value in values.items():
+            if value:
+                # نسخه‌های تکراری یک توکن (وزن فیلد) در 32 بیت بالا متمایز می‌شوند
+                base = _token(name, value)
+                tokens.update((copy << 32) | base for copy in range(FIELD_WEIGHTS[name]))
+
+        result = frozenset(tokens)
+        self._tokens[config.raw_config] = result
+        return result
+
+    def signatures(self, token_sets: Sequence[FrozenSet[int]]) -> np.ndarray:
+        """ماتریس MinHash (تعداد کانفیگ × num_perm) برای همه مجموعه‌ها یکجا"""
+        lengths = np.fromiter((len(tokens) for tokens in token_sets), dtype=np.int64,
+                              count=len(token_sets))
+        values = np.fromiter((token for tokens in token_sets for token in tokens),
+                             dtype=np.uint64, count=int(lengths.sum()))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        result = np.empty((len(token_sets), self.num_perm), dtype=np.uint64)
+        for index in range(self.num_perm):
+            # ضرب و جمع به پیمانه 2^64؛ 32 بیت بالا بهترین اختلاط را دارند
+            hashed = (values * self._perm_a[index] + self._perm_b[index]) >> np.uint64(32)
+            result[:, index] = np.minimum.reduceat(hashed, offsets)
+        return result
+
+    def cluster(self, configs: Sequence[Any]) -> List[List[Any]]:
+        """خوشه‌های کانفیگ‌های یک پروتکل (هر خوشه لیستی از کانفیگ‌ها)"""
+        if len(configs) < 2:
+            return [list(configs)]
+
+        token_sets = [self.tokens(config) for config in configs]
+        signatures = self.signatures(token_sets)
+        groups = _UnionFind(len(configs))
+
+        for start in range(0, self.num_perm, self.band_rows):
+            band = signatures[:, start]
+            for row in range(1, self.band_rows):
+                band = (band << np.uint64(32)) ^ signatures[:, start + row]
+            # فقط سطل‌های چند عضوی در پایتون بررسی می‌شوند
+            order = np.argsort(band, kind='stable')
+            ordered = band[order]
+            shared = np.flatnonzero(ordered[1:] == ordered[:-1]) + 1
+            if not len(shared):
+                continue
+            order = order.tolist()
+            previous = -2
+            candidates: List[int] = []
+            for position in shared.tolist():
+                if position != previous + 1:
+                    # سطل جدید از عضو قبلی در ترتیب مرتب شده شروع می‌شود
+                    candidates = [order[position - 1]]
+                previous = position
+                index = order[position]
+                root = groups.find(index)
+                for other in candidates:
+                    if root != groups.find(other) and \
+                            jaccard(token_sets[index], token_sets[other]) >= self.similarity:
+                        groups.union(index, other)
+                        root = groups.find(index)
+                if len(candidates) < BUCKET_CANDIDATES:
+                    candidates.append(index)
+
+        clusters: Dict[int, List[Any]] = defaultdict(list)
+        for index, config in enumerate(configs):
+            clusters[groups.find(index)].append(config)
+        return list(clusters.values())
+
+    def representatives(self, configs: Sequence[Any],
+                        key: Callable[[Any], float] = latency_sort_key) -> List[Any]:
+        """
+        بهترین کانفیگ هر خوشه (کمترین key، پیش‌فرض latency_sort_key)
+
+        آمار اندازه خوشه‌ها برای گزارش سیکل در stats ثبت می‌شود.
+        """
+        start_time = time.perf_counter()
+        by_protocol: Dict[str, List[Any]] = defaultdict(list)
+        for config in configs:
+            by_protocol[config.protocol.lower()].append(config)
+
+        selected = []
+        clusters = []
+        for protocol_configs in by_protocol.values():
+            for members in self.cluster(protocol_configs):
+                best = min(members, key=key)
+                selected.append(best)
+                clusters.append((len(members), best))
+
+        histogram: Dict[str, int] = defaultdict(int)
+        for size, _ in clusters:
+            label = str(size) if size <= 2 else '3-5' if size <= 5 else \
+                '6-10' if size <= 10 else '11+'
+            histogram[label] += 1
+        clusters.sort(key=lambda item: -item[0])
+
+        self.stats = {
+            'configs': len(configs),
+            'clusters': len(clusters),
+            'duplicates_removed': len(configs) - len(clusters),
+            'size_histogram': dict(histogram),
+            'largest': [{'size': size, 'protocol': best.protocol,
+                         'representative': f'{best.address}:{best.port}'}
+                        for size, best in clusters[:TOP_CLUSTERS] if size > 1],
+            'cluster_time_ms': round((time.perf_counter() - start_time) * 1000, 1),
+        }
+        return selected
+
+    def get_stats(self) -> Dict[str, Any]:
+        """آمار آخرین خوشه‌بندی"""
+        return dict(self.stats)
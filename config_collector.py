@@ -14,10 +14,34 @@ import time
 import logging
 import hashlib
 import socket
+import sys
 import concurrent.futures
-from typing import List, Dict, Optional, Tuple, Set, Any
-from dataclasses import dataclass
-from urllib.parse import urlparse
+from typing import AsyncIterator, Iterable, List, Dict, Optional, Tuple, Set, Any, Union
+from dataclasses import dataclass, fields
+from urllib.parse import parse_qs, urlparse
+
+from adaptive_timeout import AdaptiveTimeoutController
+from advanced_protocol_tester import AdvancedProtocolTester
+from async_probe_engine import AsyncProbeEngine, endpoint_key, group_by_endpoint
+from config_clustering import ConfigClusterer
+from config_identity import config_identity, identity_key, unique_by_identity
+from config_store import CompactConfigStore
+from dns_resolver import AsyncDNSResolver, normalize_host
+from parallel_parser import ParallelConfigParser
+from probe_cache import ProbeResultCache
+from probe_scheduler import ProbePriorityScheduler
+from seen_config_index import SeenConfigIndex
+from dead_endpoint_index import DeadEndpointIndex
+from latency_stats import (apply_latency_stats, copy_latency_stats, latency_sort_key,
+                           summarize_samples)
+from source_validators import SourceValidatorStore, content_hasher
+from subscription_decoder import SubscriptionStreamDecoder, decode_subscription
+from subscription_publisher import IncrementalSubscriptionPublisher, write_file_atomic
+from tls_probe import TLSHandshakeProber, requires_tls
+from udp_probe_engine import AsyncUDPProbeEngine, is_udp_config
+from http_client import SharedHTTPClient
+from performance_monitor import performance_monitor
+from streaming_pipeline import StreamingCollectionPipeline
 
 # Import Telegram Collector
 try:
@@ -38,9 +62,61 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# الگوهای regex برای تشخیص پروتکل‌ها
+PROTOCOL_PATTERNS = {
+    'vmess': r'vmess://([A-Za-z0-9+/=]+)',
+    'vless': r'vless://([^@]+)@([^:]+):(\d+)(\?[^#]*)?(#.*)?',
+    'trojan': r'trojan://([^@]+)@([^:]+):(\d+)(\?[^#]*)?(#.*)?',
+    'ss': r'ss://([A-Za-z0-9+/=]+)',
+    'ssr': r'ssr://([A-Za-z0-9+/=]+)',
+    'hysteria': r'hysteria://([^#]+)(#.*)?',
+    'hy2': r'hy2://([^#]+)(#.*)?',
+    'hysteria2': r'hysteria2://([^#]+)(#.*)?',
+    'hysteria3': r'hysteria3://([^#]+)(#.*)?',
+    'wireguard': r'wireguard://([^#]+)(#.*)?',
+    'tuic': r'tuic://([^#]+)(#.*)?',
+    'tuic5': r'tuic5://([^#]+)(#.*)?',
+    'naive': r'naive://([^#]+)(#.*)?',
+    'reality': r'reality://([^#]+)(#.*)?',
+    'xray-reality': r'xray-reality://([^#]+)(#.*)?',
+    'sing-box': r'sing-box://([^#]+)(#.*)?',
+    'clash-meta': r'clash-meta://([^#]+)(#.*)?'
+}
+
+
+def _slotted(cls):
+    """بازسازی dataclass با __slots__ (معادل slots=True پایتون 3.10+ برای نسخه‌های قدیمی‌تر)"""
+    field_names = tuple(f.name for f in fields(cls))
+    cls_dict = dict(cls.__dict__)
+    cls_dict['__slots__'] = field_names
+    for name in field_names:
+        cls_dict.pop(name, None)
+    cls_dict.pop('__dict__', None)
+    cls_dict.pop('__weakref__', None)
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
+def _sni_from_query(params: Optional[str]) -> str:
+    """استخراج SNI از query string لینک (sni، peer یا host)"""
+    if not params:
+        return ""
+    query = parse_qs(params.lstrip('?'))
+    for name in ('sni', 'peer', 'host'):
+        if query.get(name):
+            return query[name][0]
+    return ""
+
+
+@_slotted
 @dataclass
 class V2RayConfig:
-    """کلاس برای ذخیره اطلاعات کانفیگ V2Ray"""
+    """
+    کلاس برای ذخیره اطلاعات کانفیگ V2Ray
+
+    با __slots__ و رشته‌های intern شده برای protocol/country/network تا
+    نگه‌داشتن کانفیگ‌های working_configs حافظه کمی بگیرد؛ failed_configs
+    (معمولاً اکثر کانفیگ‌ها) در CompactConfigStore به صورت ستونی ذخیره می‌شوند.
+    """
     protocol: str
     address: str
     port: int
@@ -50,6 +126,15 @@ class V2RayConfig:
     tls: bool = False
     raw_config: str = ""
     latency: float = 0.0
+    resolve_latency: float = 0.0  # زمان DNS جدا از latency اتصال
+    # آمار چند نمونه‌ای (latency در این حالت میانه نمونه‌هاست)
+    latency_p90: float = 0.0
+    jitter: float = 0.0
+    loss_rate: float = 0.0
+    latency_samples: int = 0
+    sni: str = ""  # server name برای handshake TLS (خالی = hostname آدرس)
+    tls_handshake_latency: float = 0.0  # زمان handshake TLS جدا از اتصال TCP
+    identity_key: str = ""  # hash فرم کانونی لینک (config_identity.config_identity)
     is_working: bool = False
     country: str = "unknown"
     # AI Quality Metrics
@@ -61,14 +146,28 @@ class V2RayConfig:
     ai_stability_score: float = 0.0
     ai_performance_score: float = 0.0
 
+    def __post_init__(self):
+        # مقادیر تکراری بین تمام کانفیگ‌ها یک نمونه مشترک داشته باشند
+        for name in ('protocol', 'network', 'country'):
+            value = getattr(self, name)
+            if type(value) is str:
+                setattr(self, name, sys.intern(value))
+
 
 class UltraFastConnectionPool:
     """Connection Pool برای تست فوق سریع"""
 
-    def __init__(self, max_workers: int = 100):
+    def __init__(self, max_workers: int = 100, timeout: float = 2.0,
+                 timeout_controller: Optional[AdaptiveTimeoutController] = None,
+                 samples: int = 1):
         self.max_workers = max_workers
         self.executor = concurrent.futures.ThreadPoolExecutor(
             max_workers=max_workers)
+        self.timeout = timeout
+        # deadline تطبیقی هر کانفیگ (None = timeout ثابت)
+        self.timeout_controller = timeout_controller
+        # تعداد نمونه همزمان برای هر endpoint (1 = یک اتصال)
+        self.samples = max(1, samples)
         self.connection_cache = {}
         self.test_results = {}
         self.advanced_test = True  # فعال کردن تست پیشرفته
@@ -128,20 +227,57 @@ class UltraFastConnectionPool:
         except Exception as e:
             return False, 0.0, {'error': str(e)}
 
-    async def test_multiple_connections(self, configs: List[V2RayConfig]) -> List[Tuple[V2RayConfig, bool, float]]:
-        """تست چندگانه اتصالات"""
-        loop = asyncio.get_event_loop()
+    async def measure(self, config: V2RayConfig, address: str,
+                      timeout: float) -> Tuple[bool, float]:
+        """
+        تست یک endpoint در executor
+
+        با samples > 1 چند اتصال همزمان در thread های جدا انجام می‌شود و
+        آمار میانه/p90/jitter/loss روی کانفیگ ثبت می‌شود.
+        """
+        loop = asyncio.get_running_loop()
+        if self.samples == 1:
+            return await loop.run_in_executor(
+                self.executor, self.test_connection_sync, address, config.port, timeout)
+
+        outcomes = await asyncio.gather(*(
+            loop.run_in_executor(
+                self.executor, self.test_connection_sync, address, config.port, timeout)
+            for _ in range(self.samples)))
+        stats = summarize_samples([latency if is_working else None
+                                   for is_working, latency in outcomes])
+        apply_latency_stats(config, stats)
+        return stats.loss_rate < 1.0, stats.median
+
+    async def measure_adaptive(self, config: V2RayConfig, address: str,
+                               timeout: float) -> Tuple[bool, float]:
+        """
+        تست با deadline تطبیقی و در صورت شکست، یک بار دیگر با timeout ثابت
+
+        شکست سریع (اتصال رد شده) از timeout قابل تشخیص نیست، پس هر شکست با
+        deadline کوتاه‌تر از timeout ثابت تکرار می‌شود.
+        """
+        is_working, latency = await self.measure(config, address, timeout)
+        controller = self.timeout_controller
+        if not is_working and controller and controller.needs_static_retry(timeout, self.timeout):
+            is_working, latency = await self.measure(config, address, self.timeout)
+            controller.record_static_retry(config.country, config.protocol, is_working)
+        return is_working, latency
+
+    async def test_multiple_connections(self, configs: List[V2RayConfig],
+                                        address_map: Optional[Dict[str, str]] = None) -> List[Tuple[V2RayConfig, bool, float]]:
+        """تست چندگانه اتصالات (address_map: آدرس‌های resolve شده hostname → IP)"""
+        controller = self.timeout_controller
 
         # ایجاد tasks برای تست موازی
         tasks = []
         for config in configs:
-            task = loop.run_in_executor(
-                self.executor,
-                self.test_connection_sync,
-                config.address,
-                config.port,
-                2.0  # timeout کوتاه
-            )
+            address = config.address
+            if address_map:
+                address = address_map.get(normalize_host(address), address)
+            timeout = controller.timeout_for(config.country, config.protocol, self.timeout) \
+                if controller else self.timeout
+            task = asyncio.ensure_future(self.measure_adaptive(config, address, timeout))
             tasks.append((config, task))
 
         # اجرای موازی
@@ -149,9 +285,11 @@ class UltraFastConnectionPool:
         for config, task in tasks:
             try:
                 is_working, latency = await task
-                results.append((config, is_working, latency))
             except Exception:
-                results.append((config, False, 0.0))
+                is_working, latency = False, 0.0
+            if controller:
+                controller.observe(config.country, config.protocol, is_working, latency)
+            results.append((config, is_working, latency))
 
         return results
 
@@ -163,8 +301,14 @@ class UltraFastConnectionPool:
 class SmartConfigFilter:
     """فیلتر هوشمند برای حذف کانفیگ‌های نامناسب قبل از تست"""
 
-    def __init__(self):
+    def __init__(self, dead_index: Optional[DeadEndpointIndex] = None,
+                 allow_private: bool = False):
         self.blacklisted_ips = set()
+        # فهرست endpoint های مرده (تست مجدد فقط طبق زمان‌بندی backoff)
+        self.dead_index = dead_index
+        # پذیرش آدرس‌های خصوصی و loopback (برای بنچمارک و تست محلی)
+        self.allow_private = allow_private
+        self.backoff_skipped = 0
         self.blacklisted_ports = {22, 23, 25, 53, 80,
                                   110, 143, 993, 995, 3389, 5432, 6379, 27017}
         self.valid_ports = set(range(1024, 65536))  # پورت‌های کاربری
@@ -184,19 +328,25 @@ class SmartConfigFilter:
             return False
 
         # بررسی آدرس IP خصوصی (معمولاً غیرقابل دسترس)
-        if config.address.startswith(('127.', '192.168.', '10.', '172.')):
+        if not self.allow_private and config.address.startswith(('127.', '192.168.', '10.', '172.')):
             return False
 
         # بررسی UUID خالی
         if not config.uuid or len(config.uuid) < 10:
             return False
 
+        # endpoint مرده‌ای که هنوز زمان تست مجدد آن نرسیده
+        if self.dead_index and not self.dead_index.should_probe(config.address, config.port):
+            self.backoff_skipped += 1
+            return False
+
         return True
 
     def filter_configs(self, configs: List[V2RayConfig]) -> List[V2RayConfig]:
         """فیلتر کردن کانفیگ‌ها"""
         valid_configs = []
         filtered_count = 0
+        skipped_before = self.backoff_skipped
 
         for config in configs:
             if self.is_valid_config(config):
@@ -204,7 +354,8 @@ class SmartConfigFilter:
             else:
                 filtered_count += 1
 
-        logger.info(f"🔍 فیلتر هوشمند: {filtered_count} کانفیگ نامناسب حذف شد")
+        logger.info(f"🔍 فیلتر هوشمند: {filtered_count} کانفیگ نامناسب حذف شد "
+                    f"({self.backoff_skipped - skipped_before} endpoint مرده در backoff)")
         return valid_configs
 
 
@@ -214,11 +365,169 @@ class V2RayCollector:
     def __init__(self):
         self.configs: List[V2RayConfig] = []
         self.working_configs: List[V2RayConfig] = []
-        self.failed_configs: List[V2RayConfig] = []
+        # کانفیگ‌های ناموفق فقط نگه داشته و شمرده می‌شوند: ذخیره ستونی فشرده
+        self.failed_configs = CompactConfigStore(V2RayConfig)
+
+        # آمار عملکرد سیکل جاری (در گزارش نهایی منتشر می‌شود)
+        self.cycle_stats: Dict[str, Any] = {}
+        # شمارنده فراخوانی‌های parse_config و رشته‌های یکتای ورودی در سیکل جاری
+        self.parse_count = 0
+        self.distinct_raw_count = 0
+
+        # بارگذاری تنظیمات جمع‌آوری از config.py
+        try:
+            from config import COLLECTION_CONFIG
+            self.collection_config = COLLECTION_CONFIG
+        except ImportError:
+            self.collection_config = {}
+
+        # resolver مشترک برای تست اتصال و GeoIP (کش بین سیکل‌ها حفظ می‌شود)
+        self.resolver = AsyncDNSResolver(
+            cache_file=self.collection_config.get(
+                'dns_cache_file', 'cache/dns_cache.json'),
+            positive_ttl=self.collection_config.get('dns_positive_ttl', 1800),
+            negative_ttl=self.collection_config.get('dns_negative_ttl', 300),
+            max_concurrency=self.collection_config.get(
+                'dns_max_concurrency', 200),
+            timeout=self.collection_config.get('dns_timeout', 5.0))
+
+        # deadline تطبیقی تست‌ها بر اساس توزیع تأخیر (توزیع بین سیکل‌ها با decay حفظ می‌شود)
+        if self.collection_config.get('adaptive_timeouts', True):
+            self.timeout_controller = AdaptiveTimeoutController(
+                percentile=self.collection_config.get('adaptive_timeout_percentile', 0.95),
+                initial_multiplier=self.collection_config.get(
+                    'adaptive_timeout_initial_multiplier', 4.0),
+                final_multiplier=self.collection_config.get(
+                    'adaptive_timeout_final_multiplier', 2.0),
+                min_samples=self.collection_config.get('adaptive_timeout_min_samples', 20),
+                min_timeout=self.collection_config.get('adaptive_timeout_min', 0.5),
+                max_timeout=self.collection_config.get('adaptive_timeout_max', 10.0))
+        else:
+            self.timeout_controller = None
 
         # اضافه کردن سیستم‌های جدید
-        self.connection_pool = UltraFastConnectionPool(max_workers=200)
-        self.smart_filter = SmartConfigFilter()
+        latency_samples = self.collection_config.get('latency_samples', 1)
+        self.connection_pool = UltraFastConnectionPool(
+            max_workers=200, timeout_controller=self.timeout_controller,
+            samples=latency_samples)
+        self.async_engine = AsyncProbeEngine(
+            max_concurrency=self.collection_config.get(
+                'async_max_concurrency', 2000),
+            timeout=self.collection_config.get('async_probe_timeout', 3.0),
+            attempts=self.collection_config.get('async_probe_attempts', 1),
+            resolver=self.resolver,
+            timeout_controller=self.timeout_controller,
+            samples=latency_samples,
+            sample_interval=self.collection_config.get('latency_sample_interval', 0.01))
+        # handshake TLS با SSLContext مشترک زیر همان semaphore موتور async
+        self.tls_prober = TLSHandshakeProber(
+            self.async_engine, timeout=self.collection_config.get('tls_probe_timeout', 5.0))
+        # مرحله دوم اختیاری: handshake TLS فقط روی endpoint های TLS پاسخ‌گو در تست TCP
+        self.tls_probe_enabled = self.collection_config.get('tls_probe', False)
+        # مرحله تأیید handshake واقعی VLESS/Trojan/Shadowsocks روی endpoint های پاسخ‌گو
+        if self.collection_config.get('handshake_verify', False):
+            self.handshake_verifier = AdvancedProtocolTester(
+                target=self.collection_config.get(
+                    'handshake_verify_target', 'http://www.gstatic.com/generate_204'),
+                expect_status=self.collection_config.get('handshake_verify_status', 204),
+                timeout=self.collection_config.get('handshake_verify_timeout', 5.0),
+                max_concurrency=self.collection_config.get('handshake_verify_concurrency', 200))
+        else:
+            self.handshake_verifier = None
+        # تست UDP برای Hysteria/TUIC (QUIC) و WireGuard، همزمان با موتور TCP
+        if self.collection_config.get('udp_probe', True):
+            self.udp_engine = AsyncUDPProbeEngine(
+                max_concurrency=self.collection_config.get('udp_max_concurrency', 500),
+                timeout=self.collection_config.get('udp_probe_timeout', 2.0),
+                attempts=self.collection_config.get('udp_probe_attempts', 2),
+                silent_is_reachable=self.collection_config.get('udp_silent_is_reachable', False))
+        else:
+            self.udp_engine = None
+        # فهرست endpoint های مرده با backoff نمایی (بین سیکل‌ها حفظ می‌شود)
+        if self.collection_config.get('dead_endpoint_backoff', True):
+            self.dead_endpoints = DeadEndpointIndex(
+                index_file=self.collection_config.get(
+                    'dead_endpoint_file', 'cache/dead_endpoints.json'),
+                failure_threshold=self.collection_config.get(
+                    'dead_endpoint_threshold', 2),
+                base_delay=self.collection_config.get('dead_endpoint_base_delay', 1800),
+                max_delay=self.collection_config.get('dead_endpoint_max_delay', 604800))
+        else:
+            self.dead_endpoints = None
+        self.smart_filter = SmartConfigFilter(
+            dead_index=self.dead_endpoints,
+            allow_private=self.collection_config.get('allow_private_addresses', False))
+
+        # کش نتایج تست بین سیکل‌ها (endpoint های سالم اخیر دوباره تست نمی‌شوند)
+        if self.collection_config.get('probe_cache_enabled', True):
+            self.probe_cache = ProbeResultCache(
+                cache_file=self.collection_config.get(
+                    'probe_cache_file', 'cache/probe_results.json'),
+                fresh_ttl=self.collection_config.get('probe_cache_ttl', 1800))
+        else:
+            self.probe_cache = None
+
+        # ترتیب تست بر اساس احتمال موفقیت (سابقه endpoint، منبع و پروتکل)
+        if self.collection_config.get('probe_order', 'priority') == 'priority':
+            self.probe_scheduler = ProbePriorityScheduler(
+                stats_file=self.collection_config.get(
+                    'probe_priority_file', 'cache/probe_priority.json'))
+        else:
+            self.probe_scheduler = None
+        # منبع هر رشته کانفیگ در سیکل جاری (برای اعتبار منبع در زمان‌بند)
+        self.config_origins: Dict[str, str] = {}
+
+        # فهرست پایدار کانفیگ‌های دیده شده در سیکل‌های قبل (تشخیص کانفیگ جدید)
+        if self.collection_config.get('seen_index', True):
+            self.seen_index = SeenConfigIndex(
+                index_file=self.collection_config.get(
+                    'seen_index_file', 'cache/seen_configs.bloom'),
+                capacity=self.collection_config.get('seen_index_capacity', 2_000_000),
+                error_rate=self.collection_config.get('seen_index_error_rate', 0.001))
+        else:
+            self.seen_index = None
+        # کلید هویت کانفیگ‌هایی که در سیکل جاری برای اولین بار دیده شده‌اند
+        self.new_config_keys: Set[str] = set()
+
+        # خوشه‌بندی کانفیگ‌های تقریباً تکراری (یک سرور با hostname/پورت/path متفاوت)
+        if self.collection_config.get('cluster_near_duplicates', True):
+            self.config_clusterer = ConfigClusterer(
+                resolver=self.resolver,
+                similarity=self.collection_config.get('cluster_similarity', 0.5))
+        else:
+            self.config_clusterer = None
+
+        # سیکل با deadline: انتشار تدریجی اشتراک‌ها و نهایی‌سازی در deadline
+        if self.collection_config.get('cycle_deadline', 0):
+            self.early_publisher = IncrementalSubscriptionPublisher(
+                self.publish_subscriptions,
+                per_protocol=self.collection_config.get('early_publish_per_protocol', 50),
+                min_interval=self.collection_config.get('early_publish_min_interval', 15.0))
+        else:
+            self.early_publisher = None
+
+        # مرحله تجزیه چندپردازه‌ای برای batch های بزرگ
+        self.parallel_parser = ParallelConfigParser(
+            workers=self.collection_config.get('parse_workers') or None,
+            chunk_size=self.collection_config.get('parse_chunk_size', 2000),
+            min_parallel_size=self.collection_config.get(
+                'parallel_parse_min_configs', 5000))
+
+        # session HTTP مشترک collector، تلگرام و health monitor (keep-alive و کش DNS)
+        self.http_client = SharedHTTPClient(
+            limit=self.collection_config.get('http_pool_limit', 100),
+            limit_per_host=self.collection_config.get('http_limit_per_host', 8),
+            dns_cache_ttl=self.collection_config.get('http_dns_cache_ttl', 300))
+        performance_monitor.register_pool('http', self.http_client.get_pool_stats)
+
+        # validator های HTTP منابع برای دریافت شرطی (بین سیکل‌ها حفظ می‌شود)
+        if self.collection_config.get('conditional_fetch', True):
+            self.source_validators = SourceValidatorStore(
+                self.collection_config.get(
+                    'source_validators_file', 'cache/source_validators.json'),
+                self.collection_config.get('source_configs_dir', 'cache/source_configs'))
+        else:
+            self.source_validators = None
 
         # اضافه کردن Cache Manager
         try:
@@ -242,8 +551,11 @@ class V2RayCollector:
 
         # اضافه کردن GeoIP Lookup
         try:
-            from geoip_lookup import GeoIPLookup
-            self.geoip = GeoIPLookup()
+            from geoip_lookup import DEFAULT_RANGES_FILE, GeoIPLookup
+            self.geoip = GeoIPLookup(
+                resolver=self.resolver,
+                database_file=self.collection_config.get('geoip_database') or DEFAULT_RANGES_FILE,
+                reload_interval=self.collection_config.get('geoip_reload_interval', 30.0))
             logger.info("GeoIP Lookup initialized successfully")
 
             # Initialize SingBox parser
@@ -269,7 +581,8 @@ class V2RayCollector:
             try:
                 import os
                 bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-                self.telegram_collector = TelegramCollector(bot_token)
+                self.telegram_collector = TelegramCollector(
+                    bot_token, http_client=self.http_client, geoip=self.geoip)
                 # اضافه کردن منابع تلگرام
                 for source in TELEGRAM_SOURCES:
                     self.telegram_collector.add_source(source)
@@ -291,131 +604,182 @@ class V2RayCollector:
             self.config_sources = []
 
         # الگوهای regex برای تشخیص پروتکل‌ها
-        self.protocol_patterns = {
-            'vmess': r'vmess://([A-Za-z0-9+/=]+)',
-            'vless': r'vless://([^@]+)@([^:]+):(\d+)(\?[^#]*)?(#.*)?',
-            'trojan': r'trojan://([^@]+)@([^:]+):(\d+)(\?[^#]*)?(#.*)?',
-            'ss': r'ss://([A-Za-z0-9+/=]+)',
-            'ssr': r'ssr://([A-Za-z0-9+/=]+)',
-            'hysteria': r'hysteria://([^#]+)(#.*)?',
-            'hy2': r'hy2://([^#]+)(#.*)?',
-            'hysteria2': r'hysteria2://([^#]+)(#.*)?',
-            'hysteria3': r'hysteria3://([^#]+)(#.*)?',
-            'wireguard': r'wireguard://([^#]+)(#.*)?',
-            'tuic': r'tuic://([^#]+)(#.*)?',
-            'tuic5': r'tuic5://([^#]+)(#.*)?',
-            'naive': r'naive://([^#]+)(#.*)?',
-            'reality': r'reality://([^#]+)(#.*)?',
-            'xray-reality': r'xray-reality://([^#]+)(#.*)?',
-            'sing-box': r'sing-box://([^#]+)(#.*)?',
-            'clash-meta': r'clash-meta://([^#]+)(#.*)?'
-        }
+        self.protocol_patterns = dict(PROTOCOL_PATTERNS)
+
+    @classmethod
+    def create_parser(cls) -> 'V2RayCollector':
+        """ساخت نمونه سبک فقط برای تجزیه کانفیگ (بدون شبکه، AI و تلگرام)"""
+        parser = cls.__new__(cls)
+        parser.protocol_patterns = dict(PROTOCOL_PATTERNS)
+        parser.parse_count = 0
+        parser.distinct_raw_count = 0
+        try:
+            from geoip_lookup import GeoIPLookup
+            parser.geoip = GeoIPLookup()
+        except ImportError:
+            parser.geoip = None
+        return parser
 
     async def fetch_configs_from_source(self, source_url: str) -> List[str]:
-        """دریافت کانفیگ‌ها از یک منبع با کش"""
+        """دریافت کانفیگ‌ها از یک منبع با کش و درخواست شرطی"""
+        return [config async for config in self.stream_configs_from_source(source_url)]
+
+    async def stream_configs_from_source(self, source_url: str) -> AsyncIterator[str]:
+        """
+        دریافت تدریجی کانفیگ‌های یک منبع به صورت async generator
+
+        بدنه به صورت chunk خوانده و همزمان decode می‌شود، پس کل بدنه (و نسخه
+        decode شده Base64 آن) در حافظه نگه داشته نمی‌شود. منابع SingBox JSON
+        همچنان به صورت کامل خوانده می‌شوند. اگر hash دریافت قبلی منبع موجود
+        باشد، بدنه خام تا پایان دریافت نگه داشته می‌شود و فقط در صورت تفاوت
+        hash، decode می‌شود (پاسخ 304 اصلاً بدنه‌ای ندارد).
+        """
         # بررسی کش
         if self.cache:
             cached_configs = self.cache.get(source_url)
             if cached_configs is not None:
                 logger.info(
                     f"Cache hit for {source_url} - {len(cached_configs)} configs")
-                return cached_configs
+                for config in cached_configs:
+                    yield config
+                return
+
+        validators = self.source_validators
+        previous = validators.get(source_url) if validators else None
+        headers = validators.conditional_headers(source_url) if validators else {}
+        chunk_size = self.collection_config.get('stream_chunk_size', 65536)
+        configs: List[str] = []
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(source_url, timeout=30) as response:
-                    if response.status == 200:
-                        content = await response.text()
-
-                        # بررسی فرمت JSON (SingBox)
-                        if source_url.endswith('.json') or content.strip().startswith('{'):
-                            try:
-                                # استفاده از SingBox parser جدید
-                                if hasattr(self, 'singbox_parser') and self.singbox_parser:
-                                    configs = self.singbox_parser.parse_singbox_json(
-                                        content)
-                                    logger.info(
-                                        f"✅ دریافت {len(configs)} کانفیگ از SingBox JSON: {source_url}")
-                                else:
-                                    # Fallback to old parser
-                                    import json
-                                    json_data = json.loads(content)
-                                    singbox_configs = self.parse_singbox_config(
-                                        json_data)
-                                    configs = [
-                                        config.raw_config for config in singbox_configs]
-                                    logger.info(
-                                        f"دریافت {len(configs)} کانفیگ از SingBox JSON: {source_url}")
-
-                                # ذخیره در کش
-                                if self.cache:
-                                    self.cache.set(
-                                        source_url, configs, ttl=1800)  # 30 دقیقه
-
-                                return configs
-                            except json.JSONDecodeError:
-                                logger.warning(
-                                    f"فرمت JSON نامعتبر در {source_url}")
-
-                        # تجزیه کانفیگ‌ها از متن معمولی
-                        configs = []
-                        lines = content.strip().split('\n')
-
-                        # اگر فقط یک خط است و بسیار بلند است، احتمالاً Base64 است
-                        if len(lines) == 1 and len(lines[0]) > 100:
-                            try:
-                                # تلاش برای decode کردن Base64
-                                import base64
-                                decoded_content = base64.b64decode(
-                                    lines[0]).decode('utf-8')
-                                lines = decoded_content.strip().split('\n')
-                                logger.info(
-                                    f"✅ Base64 decoded: {len(lines)} configs")
-                            except Exception as e:
-                                logger.debug(
-                                    f"Not Base64 or decode failed: {e}")
-
-                        # تجزیه خطوط - حتی اگر Base64 نبود، ممکن است هر خط یک کانفیگ Base64 باشه
-                        for line in lines:
-                            line = line.strip()
-                            if not line or line.startswith('#'):
-                                continue
-
-                            # اگر خط شامل پروتکل است، مستقیم اضافه کن
-                            if any(proto in line for proto in ['vmess://', 'vless://', 'trojan://', 'ss://', 'ssr://', 'hysteria://', 'hysteria2://', 'hy2://', 'tuic://', 'wireguard://']):
-                                configs.append(line)
-                            # اگر خط بلند است و شبیه Base64، سعی کن decode کنی
-                            elif len(line) > 50 and not ' ' in line:
-                                try:
-                                    # ممکن است Base64 encoded configs باشد
-                                    decoded = base64.b64decode(
-                                        line).decode('utf-8')
-                                    # اگر داخل decoded چند کانفیگ بود، همشون رو اضافه کن
-                                    if '\n' in decoded:
-                                        for subline in decoded.split('\n'):
-                                            subline = subline.strip()
-                                            if subline and any(proto in subline for proto in ['vmess://', 'vless://', 'trojan://', 'ss://', 'ssr://', 'hysteria://', 'tuic://', 'wireguard://']):
-                                                configs.append(subline)
-                                    elif any(proto in decoded for proto in ['vmess://', 'vless://', 'trojan://', 'ss://', 'ssr://']):
-                                        configs.append(decoded)
-                                except:
-                                    # اگر decode نشد، شاید خود لینک باشد
-                                    configs.append(line)
-                            else:
-                                configs.append(line)
+            async with self.http_client.get(source_url, timeout=30, headers=headers) as response:
+                etag = response.headers.get('ETag', '')
+                last_modified = response.headers.get('Last-Modified', '')
+
+                if response.status == 304 and previous:
+                    # منبع تغییر نکرده - لیست قبلی بدون دریافت و decode
+                    validators.touch(source_url, etag, last_modified)
+                    validators.record(source_url, 'not_modified',
+                                      0, previous.content_length)
+                    configs = validators.load_configs(source_url)
+                    logger.info(
+                        f"بدون تغییر (304) - {len(configs)} کانفیگ از {source_url}")
+                    for config in configs:
+                        yield config
+
+                elif response.status == 200:
+                    hasher = content_hasher()
+                    size = 0
+                    decoder = SubscriptionStreamDecoder()
+                    json_body = bytearray() if source_url.endswith('.json') else None
+                    first_chunk = True
+                    # با hash قبلی، decode تا مقایسه hash کل بدنه به تعویق می‌افتد
+                    pending: Optional[List[bytes]] = \
+                        [] if previous and previous.content_hash else None
+
+                    def feed(chunk: bytes) -> List[str]:
+                        nonlocal json_body, first_chunk
+                        # بررسی فرمت JSON (SingBox) از روی اولین chunk
+                        if json_body is None and first_chunk and chunk.lstrip().startswith(b'{'):
+                            json_body = bytearray()
+                        first_chunk = False
+                        if json_body is not None:
+                            json_body += chunk
+                            return []
+                        return decoder.feed(chunk)
+
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        hasher.update(chunk)
+                        size += len(chunk)
+                        if pending is not None:
+                            pending.append(chunk)
+                            continue
+                        for config in feed(chunk):
+                            configs.append(config)
+                            yield config
+
+                    digest = hasher.hexdigest()
+                    if pending is not None and previous.content_hash == digest:
+                        # سرور validator نداشت ولی محتوا یکسان است - لیست قبلی بدون decode
+                        pending = None
+                        validators.touch(source_url, etag, last_modified)
+                        validators.record(source_url, 'unchanged', size, size)
+                        configs = validators.load_configs(source_url)
+                        logger.info(
+                            f"محتوای یکسان - {len(configs)} کانفیگ از {source_url}")
+                        for config in configs:
+                            yield config
+                    else:
+                        for chunk in pending or ():
+                            for config in feed(chunk):
+                                configs.append(config)
+                                yield config
+                        pending = None
+
+                        if json_body is not None:
+                            content = bytes(json_body).decode(
+                                response.charset or 'utf-8', errors='replace')
+                            remaining = self._parse_source_content(source_url, content)
+                        else:
+                            remaining = decoder.finish()
+                            logger.debug(
+                                f"Streamed {size} bytes from {source_url} "
+                                f"(peak buffer {decoder.peak_buffer} bytes)")
+                        for config in remaining:
+                            configs.append(config)
+                            yield config
 
                         logger.info(
                             f"دریافت {len(configs)} کانفیگ از {source_url}")
-
-                        # ذخیره در کش
-                        if self.cache:
-                            self.cache.set(source_url, configs,
-                                           ttl=1800)  # 30 دقیقه
-
-                        return configs
+                        if validators:
+                            validators.update(source_url, etag, last_modified,
+                                              digest, size, configs)
+                            validators.record(source_url, 'changed', size, 0)
+                else:
+                    if validators:
+                        validators.record(source_url, 'error', 0, 0)
+                    return
+
+                # ذخیره در کش
+                if self.cache:
+                    self.cache.set(source_url, configs,
+                                   ttl=1800)  # 30 دقیقه
         except Exception as e:
             logger.error(f"خطا در دریافت از {source_url}: {e}")
-        return []
+            if validators:
+                validators.record(source_url, 'error', 0, 0)
+
+    def _parse_source_content(self, source_url: str, content: str) -> List[str]:
+        """استخراج رشته‌های کانفیگ از محتوای یک منبع (SingBox JSON، Base64 یا متن)"""
+        # بررسی فرمت JSON (SingBox)
+        if source_url.endswith('.json') or content.strip().startswith('{'):
+            try:
+                # استفاده از SingBox parser جدید
+                if hasattr(self, 'singbox_parser') and self.singbox_parser:
+                    configs = self.singbox_parser.parse_singbox_json(
+                        content)
+                    logger.info(
+                        f"✅ دریافت {len(configs)} کانفیگ از SingBox JSON: {source_url}")
+                else:
+                    # Fallback to old parser
+                    json_data = json.loads(content)
+                    singbox_configs = self.parse_singbox_config(
+                        json_data)
+                    configs = [
+                        config.raw_config for config in singbox_configs]
+                    logger.info(
+                        f"دریافت {len(configs)} کانفیگ از SingBox JSON: {source_url}")
+
+                return configs
+            except json.JSONDecodeError:
+                logger.warning(
+                    f"فرمت JSON نامعتبر در {source_url}")
+
+        # تجزیه کانفیگ‌ها از متن معمولی یا Base64
+        configs = decode_subscription([content.encode('utf-8')])
+        logger.info(
+            f"دریافت {len(configs)} کانفیگ از {source_url}")
+
+        return configs
 
     async def collect_all_configs(self) -> List[str]:
         """جمع‌آوری کانفیگ‌ها از تمام منابع"""
@@ -426,9 +790,10 @@ class V2RayCollector:
             source) for source in self.config_sources]
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        for result in results:
+        for source, result in zip(self.config_sources, results):
             if isinstance(result, list):
                 all_configs.extend(result)
+                self.record_config_origins(source, result)
             elif isinstance(result, Exception):
                 logger.error(f"خطا در جمع‌آوری: {result}")
 
@@ -438,6 +803,7 @@ class V2RayCollector:
                 logger.info("📱 شروع جمع‌آوری از تلگرام...")
                 telegram_configs = await self.telegram_collector.collect_all_sources()
                 all_configs.extend(telegram_configs)
+                self.record_config_origins('telegram', telegram_configs)
                 logger.info(f"📱 {len(telegram_configs)} کانفیگ از تلگرام جمع‌آوری شد")
             except Exception as e:
                 logger.error(f"خطا در جمع‌آوری از تلگرام: {e}")
@@ -447,8 +813,36 @@ class V2RayCollector:
         logger.info(
             f"مجموع {len(unique_configs)} کانفیگ منحصر به فرد جمع‌آوری شد")
 
+        if self.seen_index:
+            unique_configs = [config_str for config_str in unique_configs
+                              if self.mark_seen(identity_key(config_str))]
         return unique_configs
 
+    def mark_seen(self, key: str) -> bool:
+        """
+        ثبت کلید هویت در فهرست کانفیگ‌های دیده شده
+
+        کلید جدید در new_config_keys ثبت می‌شود. خروجی False یعنی کانفیگ باید
+        کنار گذاشته شود (فقط در حالت new_configs_only برای کانفیگ‌های تکراری).
+        """
+        if key in self.new_config_keys:
+            return True
+        if self.seen_index.add(key):
+            self.new_config_keys.add(key)
+            return True
+        return not self.collection_config.get('new_configs_only', False)
+
+    def record_config_origins(self, source: str, configs: Iterable[str]):
+        """ثبت منبع رشته‌های کانفیگ (فقط وقتی زمان‌بند اولویت فعال است)"""
+        if not self.probe_scheduler:
+            return
+        for config_str in configs:
+            self.config_origins.setdefault(config_str.strip(), source)
+
+    def config_source(self, config: V2RayConfig) -> str:
+        """منبعی که کانفیگ در سیکل جاری از آن دریافت شده است"""
+        return self.config_origins.get(config.raw_config, '')
+
     def parse_vmess_config(self, config_str: str) -> Optional[V2RayConfig]:
         """تجزیه کانفیگ VMess"""
         try:
@@ -475,6 +869,7 @@ class V2RayCollector:
                 alter_id=config_data.get('aid', 0),
                 network=config_data.get('net', 'tcp'),
                 tls=config_data.get('tls') == 'tls',
+                sni=config_data.get('sni') or config_data.get('host') or '',
                 raw_config=config_str,
                 country=country
             )
@@ -509,6 +904,7 @@ class V2RayCollector:
                     uuid=uuid,
                     raw_config=config_str,
                     tls=tls,
+                    sni=_sni_from_query(params),
                     country=country
                 )
         except Exception as e:
@@ -537,6 +933,7 @@ class V2RayCollector:
                     uuid=password,  # در Trojan از password به عنوان uuid استفاده می‌کنیم
                     raw_config=config_str,
                     tls=True,  # Trojan همیشه TLS دارد
+                    sni=_sni_from_query(params),
                     country=country
                 )
         except Exception as e:
@@ -719,6 +1116,8 @@ class V2RayCollector:
                 return await self._test_trojan_connection(config, start_time)
             elif config.protocol in ["ss", "ssr"]:
                 return await self._test_ss_connection(config, start_time)
+            elif self.udp_engine and is_udp_config(config):
+                return await self._test_udp_connection(config, start_time, timeout=10)
             else:
                 return await self._test_generic_connection(config, start_time)
 
@@ -729,120 +1128,67 @@ class V2RayCollector:
 
     async def _test_vmess_connection(self, config: V2RayConfig, start_time: float) -> Tuple[bool, float]:
         """تست اتصال VMess"""
-        try:
-            import socket
-
-            # تست اتصال TCP
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            result = sock.connect_ex((config.address, config.port))
-            sock.close()
-
-            if result == 0:
-                latency = (time.time() - start_time) * 1000
-                return True, latency
-            return False, 0.0
-
-        except Exception:
-            return False, 0.0
+        if config.tls and self.tls_probe_enabled:
+            return await self._test_tls_connection(config, start_time)
+        result = await self.async_engine.probe(
+            config.address, config.port, timeout=10)
+        if result.success:
+            latency = (time.time() - start_time) * 1000
+            return True, latency
+        return False, 0.0
 
     async def _test_vless_connection(self, config: V2RayConfig, start_time: float) -> Tuple[bool, float]:
         """تست اتصال VLESS"""
-        try:
-            import socket
-
-            # تست اتصال TCP
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            result = sock.connect_ex((config.address, config.port))
-            sock.close()
-
-            if result == 0:
-                latency = (time.time() - start_time) * 1000
-                return True, latency
-            return False, 0.0
-
-        except Exception:
-            return False, 0.0
+        if config.tls and self.tls_probe_enabled:
+            return await self._test_tls_connection(config, start_time)
+        result = await self.async_engine.probe(
+            config.address, config.port, timeout=10)
+        if result.success:
+            latency = (time.time() - start_time) * 1000
+            return True, latency
+        return False, 0.0
 
     async def _test_trojan_connection(self, config: V2RayConfig, start_time: float) -> Tuple[bool, float]:
-        """تست اتصال Trojan"""
-        try:
-            import socket
-            import ssl
+        """تست اتصال Trojan (TCP + handshake TLS)"""
+        return await self._test_tls_connection(config, start_time)
 
-            # تست اتصال TCP + TLS
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-
-            try:
-                sock.connect((config.address, config.port))
-
-                # تست TLS
-                context = ssl.create_default_context()
-                # برای تست فقط hostname check رو غیرفعال می‌کنیم
-                context.check_hostname = False
-                # اما certificate verification رو نگه می‌داریم برای امنیت بیشتر
-                context.verify_mode = ssl.CERT_OPTIONAL
-
-                try:
-                    tls_sock = context.wrap_socket(
-                        sock, server_hostname=config.address)
-                    tls_sock.close()
-                except ssl.SSLError:
-                    # اگر TLS verification ناموفق بود، با CERT_NONE امتحان می‌کنیم
-                    context.verify_mode = ssl.CERT_NONE
-                    tls_sock = context.wrap_socket(
-                        sock, server_hostname=config.address)
-                    tls_sock.close()
-
-                latency = (time.time() - start_time) * 1000
-                return True, latency
-
-            except:
-                sock.close()
-                return False, 0.0
-
-        except Exception:
+    async def _test_tls_connection(self, config: V2RayConfig, start_time: float) -> Tuple[bool, float]:
+        """تست اتصال TCP و handshake TLS غیرمسدودکننده با SNI کانفیگ"""
+        result = await self.tls_prober.probe_config(config, timeout=10)
+        if result.success:
+            latency = (time.time() - start_time) * 1000
+            return True, latency
+        return False, 0.0
+
+    async def _test_udp_connection(self, config: V2RayConfig, start_time: float,
+                                   timeout: float) -> Tuple[bool, float]:
+        """تست UDP (QUIC برای Hysteria/TUIC و handshake برای WireGuard)"""
+        address = await self.resolver.resolve(config.address)
+        if address is None:
             return False, 0.0
+        result = await self.udp_engine.probe(config, address, timeout=timeout)
+        if result.success:
+            latency = (time.time() - start_time) * 1000
+            return True, latency
+        return False, 0.0
 
     async def _test_ss_connection(self, config: V2RayConfig, start_time: float) -> Tuple[bool, float]:
         """تست اتصال Shadowsocks"""
-        try:
-            import socket
-
-            # تست اتصال TCP
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            result = sock.connect_ex((config.address, config.port))
-            sock.close()
-
-            if result == 0:
-                latency = (time.time() - start_time) * 1000
-                return True, latency
-            return False, 0.0
-
-        except Exception:
-            return False, 0.0
+        result = await self.async_engine.probe(
+            config.address, config.port, timeout=10)
+        if result.success:
+            latency = (time.time() - start_time) * 1000
+            return True, latency
+        return False, 0.0
 
     async def _test_generic_connection(self, config: V2RayConfig, start_time: float) -> Tuple[bool, float]:
         """تست اتصال عمومی"""
-        try:
-            import socket
-
-            # تست اتصال TCP ساده
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(10)
-            result = sock.connect_ex((config.address, config.port))
-            sock.close()
-
-            if result == 0:
-                latency = (time.time() - start_time) * 1000
-                return True, latency
-            return False, 0.0
-
-        except Exception:
-            return False, 0.0
+        result = await self.async_engine.probe(
+            config.address, config.port, timeout=10)
+        if result.success:
+            latency = (time.time() - start_time) * 1000
+            return True, latency
+        return False, 0.0
 
     async def test_config_connectivity_fast(self, config: V2RayConfig) -> Tuple[bool, float]:
         """تست سریع اتصال کانفیگ با timeout کوتاه‌تر"""
@@ -858,6 +1204,8 @@ class V2RayCollector:
                 return await self._test_trojan_connection_fast(config, start_time)
             elif config.protocol in ["ss", "ssr"]:
                 return await self._test_ss_connection_fast(config, start_time)
+            elif self.udp_engine and is_udp_config(config):
+                return await self._test_udp_connection(config, start_time, timeout=5)
             else:
                 return await self._test_generic_connection_fast(config, start_time)
 
@@ -868,93 +1216,48 @@ class V2RayCollector:
 
     async def _test_vmess_connection_fast(self, config: V2RayConfig, start_time: float) -> Tuple[bool, float]:
         """تست سریع اتصال VMess"""
-        try:
-            import socket
-
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)  # timeout کوتاه‌تر
-            result = sock.connect_ex((config.address, config.port))
-            sock.close()
-
-            if result == 0:
-                latency = (time.time() - start_time) * 1000
-                return True, latency
-            return False, 0.0
-
-        except Exception:
-            return False, 0.0
+        result = await self.async_engine.probe(
+            config.address, config.port, timeout=5)
+        if result.success:
+            latency = (time.time() - start_time) * 1000
+            return True, latency
+        return False, 0.0
 
     async def _test_vless_connection_fast(self, config: V2RayConfig, start_time: float) -> Tuple[bool, float]:
         """تست سریع اتصال VLESS"""
-        try:
-            import socket
-
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            result = sock.connect_ex((config.address, config.port))
-            sock.close()
-
-            if result == 0:
-                latency = (time.time() - start_time) * 1000
-                return True, latency
-            return False, 0.0
-
-        except Exception:
-            return False, 0.0
+        result = await self.async_engine.probe(
+            config.address, config.port, timeout=5)
+        if result.success:
+            latency = (time.time() - start_time) * 1000
+            return True, latency
+        return False, 0.0
 
     async def _test_trojan_connection_fast(self, config: V2RayConfig, start_time: float) -> Tuple[bool, float]:
         """تست سریع اتصال Trojan"""
-        try:
-            import socket
-
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            result = sock.connect_ex((config.address, config.port))
-            sock.close()
-
-            if result == 0:
-                latency = (time.time() - start_time) * 1000
-                return True, latency
-            return False, 0.0
-
-        except Exception:
-            return False, 0.0
+        result = await self.async_engine.probe(
+            config.address, config.port, timeout=5)
+        if result.success:
+            latency = (time.time() - start_time) * 1000
+            return True, latency
+        return False, 0.0
 
     async def _test_ss_connection_fast(self, config: V2RayConfig, start_time: float) -> Tuple[bool, float]:
         """تست سریع اتصال Shadowsocks"""
-        try:
-            import socket
-
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            result = sock.connect_ex((config.address, config.port))
-            sock.close()
-
-            if result == 0:
-                latency = (time.time() - start_time) * 1000
-                return True, latency
-            return False, 0.0
-
-        except Exception:
-            return False, 0.0
+        result = await self.async_engine.probe(
+            config.address, config.port, timeout=5)
+        if result.success:
+            latency = (time.time() - start_time) * 1000
+            return True, latency
+        return False, 0.0
 
     async def _test_generic_connection_fast(self, config: V2RayConfig, start_time: float) -> Tuple[bool, float]:
         """تست سریع اتصال عمومی"""
-        try:
-            import socket
-
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            result = sock.connect_ex((config.address, config.port))
-            sock.close()
-
-            if result == 0:
-                latency = (time.time() - start_time) * 1000
-                return True, latency
-            return False, 0.0
-
-        except Exception:
-            return False, 0.0
+        result = await self.async_engine.probe(
+            config.address, config.port, timeout=5)
+        if result.success:
+            latency = (time.time() - start_time) * 1000
+            return True, latency
+        return False, 0.0
 
     def parse_singbox_config(self, json_data: dict) -> List[V2RayConfig]:
         """تجزیه کانفیگ SingBox JSON"""
@@ -1218,6 +1521,7 @@ class V2RayCollector:
 
     def parse_config(self, config_str: str) -> Optional[V2RayConfig]:
         """تجزیه کانفیگ بر اساس نوع پروتکل"""
+        self.parse_count += 1
         config_str = config_str.strip()
 
         if config_str.startswith('vmess://'):
@@ -1423,122 +1727,385 @@ class V2RayCollector:
             logger.debug(f"خطا در تجزیه Naive: {e}")
             return None
 
-    def remove_duplicate_configs_advanced(self, configs: List[str]) -> List[str]:
-        """حذف تکراری‌های پیشرفته بر اساس محتوا"""
-        logger.info("🔍 شروع حذف تکراری‌های پیشرفته...")
+    def parse_configs(self, configs: List[Union[str, V2RayConfig]]) -> List[V2RayConfig]:
+        """
+        تجزیه یکباره کانفیگ‌ها
 
-        unique_configs = []
-        seen_hashes = set()
-        duplicate_count = 0
+        رشته‌های تکراری فقط یک بار تجزیه می‌شوند و V2RayConfig های آماده
+        بدون تغییر عبور می‌کنند تا هر کانفیگ در کل سیکل فقط یک بار parse شود.
+        """
+        parsed_configs = []
+        seen_raw = set()
 
-        for config_str in configs:
-            if not config_str or len(config_str.strip()) == 0:
+        for item in configs:
+            if isinstance(item, V2RayConfig):
+                parsed_configs.append(item)
                 continue
 
-            # ایجاد hash از محتوای کانفیگ
-            config_hash = hashlib.md5(config_str.encode('utf-8')).hexdigest()
-
-            if config_hash not in seen_hashes:
-                # بررسی تکراری بر اساس آدرس و پورت
-                config = self.parse_config(config_str)
-                if config:
-                    server_key = f"{config.address}:{config.port}:{config.protocol}"
-                    if server_key not in seen_hashes:
-                        unique_configs.append(config_str)
-                        seen_hashes.add(config_hash)
-                        seen_hashes.add(server_key)
-                    else:
-                        duplicate_count += 1
-                else:
-                    unique_configs.append(config_str)
-                    seen_hashes.add(config_hash)
-            else:
-                duplicate_count += 1
+            config_str = item.strip() if item else ''
+            if not config_str or config_str in seen_raw:
+                continue
+            seen_raw.add(config_str)
+            self.distinct_raw_count += 1
+
+            config = self.parse_config(config_str)
+            if config:
+                parsed_configs.append(config)
+
+        return parsed_configs
+
+    async def parse_configs_parallel(self, configs: List[Union[str, V2RayConfig]]) -> List[V2RayConfig]:
+        """
+        تجزیه یکباره کانفیگ‌ها با مرحله چندپردازه‌ای برای ورودی‌های بزرگ
+
+        برای ورودی‌های کوچک یا در صورت خطای process pool به parse_configs
+        درون‌پردازه‌ای برمی‌گردد.
+        """
+        raw_configs = list(dict.fromkeys(
+            item.strip() for item in configs if isinstance(item, str) and item.strip()))
+        parse_start = time.time()
+
+        if (self.collection_config.get('parallel_parsing', True) and
+                self.parallel_parser.should_parallelize(len(raw_configs))):
+            try:
+                parsed = await self.parallel_parser.parse(raw_configs, V2RayConfig)
+                self.parse_count += len(raw_configs)
+                self.distinct_raw_count += len(raw_configs)
+                self.cycle_stats.setdefault('parsing', {})[
+                    'stage'] = self.parallel_parser.last_run_stats
+                logger.info(
+                    f"⚙️ تجزیه موازی: {len(raw_configs)} کانفیگ در {self.parallel_parser.last_run_stats['duration']:.1f}s "
+                    f"با {self.parallel_parser.last_run_stats['workers']} پردازه")
+                passthrough = [
+                    item for item in configs if isinstance(item, V2RayConfig)]
+                return passthrough + parsed
+            except Exception as e:
+                logger.warning(
+                    f"⚠️ خطا در تجزیه موازی، بازگشت به تجزیه درون‌پردازه‌ای: {e}")
+
+        parsed = self.parse_configs(configs)
+        duration = time.time() - parse_start
+        self.cycle_stats.setdefault('parsing', {})['stage'] = {
+            'mode': 'in_process',
+            'inputs': len(raw_configs),
+            'parsed': len(parsed),
+            'duration': round(duration, 3),
+            'configs_per_second': round(len(raw_configs) / duration, 1) if duration > 0 else 0.0,
+        }
+        return parsed
+
+    def remove_duplicate_configs_advanced(self, configs: List[Union[str, V2RayConfig]]) -> list:
+        """
+        حذف تکراری‌ها بر اساس کلید هویت کانونی (ورودی رشته یا V2RayConfig تجزیه شده)
+
+        لینک‌هایی که فقط در remark، ترتیب پارامترها یا encoding تفاوت دارند
+        تکراری‌اند؛ UUID های متفاوت روی یک سرور کانفیگ‌های جدا هستند (تست
+        endpoint مشترک را گروه‌بندی endpoint یک بار انجام می‌دهد).
+        """
+        logger.info("🔍 شروع حذف تکراری‌های پیشرفته...")
+
+        non_empty = [item for item in configs
+                     if (item.raw_config if isinstance(item, V2RayConfig) else item or '').strip()]
+        unique_configs = list(unique_by_identity(non_empty))
+        duplicate_count = len(non_empty) - len(unique_configs)
 
         logger.info(f"🔄 حذف {duplicate_count} کانفیگ تکراری")
         return unique_configs
 
-    async def test_all_configs_ultra_fast(self, configs: List[str], max_concurrent: int = 50):
-        """تست فوق سریع کانفیگ‌ها با بهینه‌سازی پیشرفته"""
+    async def test_all_configs_ultra_fast(self, configs: List[Union[str, V2RayConfig]],
+                                          max_concurrent: int = 50, mode: str = 'pool'):
+        """
+        تست فوق سریع کانفیگ‌ها با بهینه‌سازی پیشرفته
+
+        mode: 'pool' برای UltraFastConnectionPool و 'async' برای AsyncProbeEngine
+        """
         start_time = time.time()
         logger.info(f"🚀 شروع تست فوق سریع {len(configs)} کانفیگ...")
 
-        # مرحله 1: حذف تکراری‌های پیشرفته
-        unique_configs = self.remove_duplicate_configs_advanced(configs)
-        logger.info(
-            f"🔄 حذف تکراری‌ها: {len(configs)} → {len(unique_configs)} کانفیگ")
-
-        # مرحله 2: تبدیل به V2RayConfig و فیلتر هوشمند
-        parsed_configs = []
+        # مرحله 1: تبدیل یکباره به V2RayConfig
         parse_start = time.time()
+        parsed_configs = self.parse_configs(configs)
 
-        for config_str in unique_configs:
-            config = self.parse_config(config_str)
-            if config:
-                parsed_configs.append(config)
+        # مرحله 2: حذف تکراری‌های پیشرفته روی کانفیگ‌های تجزیه شده
+        unique_configs = self.remove_duplicate_configs_advanced(parsed_configs)
+        logger.info(
+            f"🔄 حذف تکراری‌ها: {len(configs)} → {len(unique_configs)} کانفیگ")
 
-        # فیلتر هوشمند
-        valid_configs = self.smart_filter.filter_configs(parsed_configs)
+        self.cycle_stats.setdefault('parsing', {}).update({
+            'input_configs': len(configs),
+            'parsed_configs': len(parsed_configs),
+            'unique_configs': len(unique_configs),
+            'distinct_raw_configs': self.distinct_raw_count,
+            'parse_calls': self.parse_count,
+            # باید 1.0 باشد؛ عدد بزرگ‌تر یعنی جایی کانفیگ دوباره parse شده است
+            'parses_per_unique_config': round(
+                self.parse_count / self.distinct_raw_count, 2) if self.distinct_raw_count else 0.0,
+        })
+
+        # فیلتر هوشمند (شامل endpoint های مرده در backoff)
+        if self.dead_endpoints:
+            self.dead_endpoints.reset_stats()
+        if self.timeout_controller:
+            self.timeout_controller.start_cycle()
+        if self.probe_scheduler:
+            self.probe_scheduler.start_cycle()
+        self.tls_prober.reset_stats()
+        if self.udp_engine:
+            self.udp_engine.reset_stats()
+        if self.handshake_verifier:
+            self.handshake_verifier.reset_stats()
+        valid_configs = self.smart_filter.filter_configs(unique_configs)
         parse_time = time.time() - parse_start
         logger.info(
-            f"🔍 فیلتر هوشمند: {len(parsed_configs)} → {len(valid_configs)} کانفیگ معتبر ({parse_time:.1f}s)")
+            f"🔍 فیلتر هوشمند: {len(unique_configs)} → {len(valid_configs)} کانفیگ معتبر ({parse_time:.1f}s)")
 
         if not valid_configs:
             logger.warning("❌ هیچ کانفیگ معتبری یافت نشد")
+            self.save_probe_state()
             return
 
-        # مرحله 3: تست فوق سریع با Connection Pool
-        test_start = time.time()
+        # مرحله 3: resolve یکباره hostname ها (زمان DNS جدا از زمان اتصال)
+        resolve_start = time.time()
+        resolved = await self.resolver.resolve_many(
+            config.address for config in valid_configs)
+        address_map = {host: address for host, (address, _) in resolved.items()
+                       if address}
+        resolve_time = time.time() - resolve_start
+
+        resolvable_configs = []
+        unresolved_count = 0
+        for config in valid_configs:
+            address, resolve_latency = resolved[normalize_host(config.address)]
+            config.resolve_latency = resolve_latency
+            if address is None:
+                # hostname قابل resolve نیست - بدون تست ناموفق است
+                config.is_working = False
+                self.failed_configs.append(config)
+                unresolved_count += 1
+                continue
+
+            resolvable_configs.append(config)
+
+        # تکمیل کشور با IP resolve شده (یک جستجوی دسته‌ای برای همه)
+        if self.geoip:
+            unknown_country = [config for config in resolvable_configs
+                               if config.country in ('Unknown', 'unknown')]
+            countries = self.geoip.get_countries([config.address for config in unknown_country])
+            for config, country in zip(unknown_country, countries):
+                config.country = country or config.country
+
+        self.cycle_stats['dns'] = {
+            **self.resolver.get_stats(),
+            'unique_hosts': len(resolved),
+            'unresolved_configs': unresolved_count,
+            'resolve_time': round(resolve_time, 2),
+        }
         logger.info(
-            f"⚡ شروع تست فوق سریع با {self.connection_pool.max_workers} worker")
+            f"🌐 DNS: {len(resolved)} host در {resolve_time:.1f}s - {unresolved_count} کانفیگ قابل resolve نبود")
 
-        # تقسیم به batch های بزرگ برای تست موازی
-        batch_size = 500  # batch بزرگ‌تر
-        batches = [valid_configs[i:i + batch_size]
-                   for i in range(0, len(valid_configs), batch_size)]
+        if not resolvable_configs:
+            logger.warning("❌ هیچ کانفیگ قابل resolve یافت نشد")
+            self.resolver.save_cache_to_disk()
+            self.save_probe_state()
+            return
 
-        total_tested = 0
-        for batch_idx, batch in enumerate(batches):
+        # مرحله 4: گروه‌بندی بر اساس endpoint resolve شده - هر endpoint فقط یک بار تست می‌شود
+        endpoint_groups = group_by_endpoint(resolvable_configs, address_map)
+        representatives = [group[0] for group in endpoint_groups.values()]
+
+        # endpoint های سالمی که اخیراً تأیید شده‌اند از کش نتایج سرو می‌شوند
+        cached_results = []
+        to_probe = representatives
+        if self.probe_cache:
+            self.probe_cache.reset_stats()
+            to_probe = []
+            for key, group in endpoint_groups.items():
+                cached = self.probe_cache.lookup(key)
+                if cached:
+                    cached_results.append((group[0], *cached))
+                else:
+                    to_probe.append(group[0])
             logger.info(
-                f"🧪 تست batch {batch_idx + 1}/{len(batches)} ({len(batch)} کانفیگ)")
-
-            # تست موازی با Connection Pool
-            results = await self.connection_pool.test_multiple_connections(batch)
+                f"💾 کش نتایج تست: {len(cached_results)} endpoint از کش، {len(to_probe)} endpoint برای تست")
+        duplication_ratio = len(resolvable_configs) / len(representatives)
+        self.cycle_stats['endpoint_dedup'] = {
+            'configs': len(resolvable_configs),
+            'unique_endpoints': len(representatives),
+            'duplication_ratio': round(duplication_ratio, 2),
+            'probes_saved': len(resolvable_configs) - len(representatives),
+        }
+        logger.info(
+            f"🎯 گروه‌بندی endpoint: {len(resolvable_configs)} کانفیگ → {len(representatives)} endpoint (نسبت {duplication_ratio:.2f})")
 
-            # پردازش نتایج
-            for config, is_working, latency in results:
-                config.is_working = is_working
-                config.latency = latency
+        # مرتب‌سازی بر اساس احتمال موفقیت - endpoint های احتمالاً سالم اول تست می‌شوند
+        if self.probe_scheduler:
+            def best_source(representative):
+                group = endpoint_groups[endpoint_key(representative, address_map)]
+                return max((self.config_source(config) for config in group),
+                           key=self.probe_scheduler.source_reliability)
 
-                # اعمال AI Quality Scoring
-                config = self.apply_ai_quality_scoring(config)
+            def history(representative):
+                if not self.probe_cache:
+                    return None
+                return self.probe_cache.get(endpoint_key(representative, address_map))
 
-                if is_working:
-                    self.working_configs.append(config)
-                    logger.debug(
-                        f"✅ {config.protocol.upper()} {config.address}:{config.port} - {latency:.0f}ms - AI Score: {config.ai_quality_score:.3f}")
-                else:
-                    self.failed_configs.append(config)
+            to_probe = self.probe_scheduler.rank(to_probe, history, best_source)
 
-            total_tested += len(batch)
+        # مرحله 5: تست فوق سریع با Connection Pool یا موتور async
+        test_start = time.time()
+        loop = asyncio.get_running_loop()
+        # بودجه زمانی تست؛ endpoint های باقیمانده پس از اتمام آن تست نمی‌شوند
+        time_budget = self.collection_config.get('probe_time_budget', 0)
+        budget_deadline = test_start + time_budget if time_budget else None
+        deferred = 0
+        probe_outcomes: List[bool] = []
+        if mode == 'async':
+            logger.info(
+                f"⚡ شروع تست async با {self.async_engine.max_concurrency} اتصال همزمان")
+            # batch فقط برای گزارش پیشرفت است؛ همزمانی را semaphore کنترل می‌کند
+            batch_size = max(500, self.async_engine.max_concurrency * 4)
+        else:
+            logger.info(
+                f"⚡ شروع تست فوق سریع با {self.connection_pool.max_workers} worker")
+            batch_size = 500  # batch بزرگ‌تر
+
+        # endpoint های UDP با موتور datagram و همزمان با batch های TCP تست می‌شوند
+        udp_batch: List[V2RayConfig] = []
+        udp_task = None
+        if self.udp_engine:
+            udp_batch = [config for config in to_probe if is_udp_config(config)]
+            if udp_batch:
+                to_probe = [config for config in to_probe if not is_udp_config(config)]
+                udp_deadline = loop.time() + max(0.0, budget_deadline - time.time()) \
+                    if budget_deadline is not None else None
+                udp_task = asyncio.ensure_future(self.udp_engine.probe_many(
+                    udp_batch, deadline=udp_deadline, address_map=address_map))
+                logger.info(f"📡 تست UDP همزمان برای {len(udp_batch)} endpoint")
+
+        # تقسیم endpoint ها به batch های بزرگ برای تست موازی
+        batches = [to_probe[i:i + batch_size]
+                   for i in range(0, len(to_probe), batch_size)]
+        if cached_results:
+            # نتایج کش مانند یک batch از پیش تست شده پردازش می‌شوند
+            batches.insert(0, cached_results)
+        if udp_task:
+            # نتایج UDP پس از batch های TCP جمع‌آوری می‌شوند
+            batches.append(udp_batch)
 
-            # گزارش پیشرفت
-            if batch_idx % 5 == 0 or batch_idx == len(batches) - 1:
-                success_rate = (len(self.working_configs) /
-                                total_tested * 100) if total_tested > 0 else 0
-                logger.info(
-                    f"📊 پیشرفت: {total_tested}/{len(valid_configs)} - موفقیت: {success_rate:.1f}%")
+        total_tested = 0
+        try:
+            for batch_idx, batch in enumerate(batches):
+                if batch is cached_results:
+                    results = cached_results
+                elif batch is udp_batch:
+                    results = await udp_task
+                    deferred += len(batch) - len(results)
+                    for representative, is_working, latency in results:
+                        probe_outcomes.append(is_working)
+                        if self.probe_cache:
+                            self.probe_cache.record(
+                                endpoint_key(representative, address_map), is_working, latency)
+                else:
+                    if budget_deadline is not None and time.time() >= budget_deadline:
+                        # بودجه زمانی تمام شده - بهترین endpoint ها قبلاً تست شده‌اند
+                        deferred += len(batch)
+                        continue
+                    logger.info(
+                        f"🧪 تست batch {batch_idx + 1}/{len(batches)} ({len(batch)} endpoint)")
+
+                    # تست موازی با موتور انتخاب شده
+                    if mode == 'async':
+                        deadline = loop.time() + max(0.0, budget_deadline - time.time()) \
+                            if budget_deadline is not None else None
+                        results = await self.async_engine.probe_many(
+                            batch, deadline=deadline, address_map=address_map)
+                        deferred += len(batch) - len(results)
+                    else:
+                        results = await self.connection_pool.test_multiple_connections(
+                            batch, address_map=address_map)
+
+                    if self.tls_probe_enabled:
+                        # مرحله دوم: handshake TLS فقط برای endpoint های پاسخ‌گو (هر SNI جدا)
+                        results = await self.tls_prober.verify(
+                            results, address_map, groups=endpoint_groups)
+                    if self.handshake_verifier:
+                        # تأیید handshake پروتکل (تمایز پروکسی واقعی از هر پورت باز)
+                        results = await self.handshake_verifier.verify(results, address_map)
+
+                    for representative, is_working, latency in results:
+                        probe_outcomes.append(is_working)
+                        if self.probe_cache:
+                            self.probe_cache.record(
+                                endpoint_key(representative, address_map), is_working, latency)
+
+                # پردازش نتایج و پخش نتیجه هر endpoint به تمام کانفیگ‌های گروه
+                for representative, is_working, latency in results:
+                    group = endpoint_groups[endpoint_key(representative, address_map)]
+                    self.record_dead_endpoints(group, is_working)
+                    for config in group:
+                        if config is not representative:
+                            copy_latency_stats(representative, config)
+                        # handshake TLS با SNI همین کانفیگ (نه فقط SNI نماینده)
+                        config_working = is_working and (
+                            not self.tls_probe_enabled or
+                            self.tls_prober.handshake_passed(config, address_map))
+                        config.is_working = config_working
+                        config.latency = latency if config_working else 0.0
+                        if self.probe_scheduler:
+                            self.probe_scheduler.record(
+                                self.config_source(config), config.protocol, config_working)
+
+                        # اعمال AI Quality Scoring
+                        config = self.apply_ai_quality_scoring(config)
+
+                        if config_working:
+                            self.working_configs.append(config)
+                            if self.early_publisher:
+                                self.early_publisher.config_verified(config)
+                            logger.debug(
+                                f"✅ {config.protocol.upper()} {config.address}:{config.port} - {latency:.0f}ms - AI Score: {config.ai_quality_score:.3f}")
+                        else:
+                            self.failed_configs.append(config)
+
+                    total_tested += len(group)
+
+                # گزارش پیشرفت
+                if batch_idx % 5 == 0 or batch_idx == len(batches) - 1:
+                    success_rate = (len(self.working_configs) /
+                                    total_tested * 100) if total_tested > 0 else 0
+                    logger.info(
+                        f"📊 پیشرفت: {total_tested}/{len(resolvable_configs)} - موفقیت: {success_rate:.1f}%")
+        finally:
+            # در صورت لغو سیکل (deadline) تست UDP در پس‌زمینه رها نمی‌شود
+            if udp_task and not udp_task.done():
+                udp_task.cancel()
 
         test_time = time.time() - test_start
         total_time = time.time() - start_time
 
+        # ذخیره کش DNS و نتایج تست برای سیکل بعدی
+        self.resolver.save_cache_to_disk()
+        self.save_probe_state()
+
         # گزارش نهایی
         success_rate = (len(self.working_configs) /
                         len(valid_configs) * 100) if valid_configs else 0
         configs_per_second = len(valid_configs) / \
             test_time if test_time > 0 else 0
 
-        logger.info(f"🎉 تست فوق سریع کامل شد:")
+        self.record_probe_scheduling(time_budget, probe_outcomes, deferred)
+
+        self.cycle_stats['testing'] = {
+            'engine': mode,
+            'tested': len(valid_configs),
+            'probes': len(probe_outcomes),
+            'resolve_time': round(resolve_time, 2),
+            'test_time': round(test_time, 2),
+            'total_time': round(total_time, 2),
+            'configs_per_second': round(configs_per_second, 1),
+        }
+
+        logger.info(f"🎉 تست فوق سریع کامل شد ({mode}):")
         logger.info(f"   ⏱️ زمان کل: {total_time:.1f}s")
         logger.info(f"   🧪 زمان تست: {test_time:.1f}s")
         logger.info(f"   ⚡ سرعت: {configs_per_second:.1f} کانفیگ/ثانیه")
@@ -1546,15 +2113,163 @@ class V2RayCollector:
             f"   ✅ موفق: {len(self.working_configs)} ({success_rate:.1f}%)")
         logger.info(f"   ❌ ناموفق: {len(self.failed_configs)}")
 
+    def finish_fetch_stage(self):
+        """ثبت آمار پایان مرحله دریافت (validator های منابع و pool اتصال HTTP)"""
+        if self.source_validators:
+            self.source_validators.save_to_disk()
+            self.cycle_stats['sources'] = self.source_validators.get_cycle_report()
+        self.cycle_stats['http_pool'] = self.http_client.get_pool_stats()
+
+    async def run_streaming_pipeline(self):
+        """
+        اجرای pipeline مرحله‌ای fetch → parse → dedup → filter → test → score
+
+        تست از اولین کانفیگ اولین منبع شروع می‌شود، پس زمان سیکل به جای
+        مجموع زمان دریافت و تست به بیشینه آن دو نزدیک می‌شود.
+        """
+        mode = self.collection_config.get('test_engine', 'pool')
+        pipeline = StreamingCollectionPipeline(
+            self,
+            queue_size=self.collection_config.get('pipeline_queue_size', 1000),
+            filter_workers=self.collection_config.get('pipeline_filter_workers', 64),
+            test_workers=self.collection_config.get('pipeline_test_workers') or None,
+            mode=mode)
+
+        if self.probe_cache:
+            self.probe_cache.reset_stats()
+        if self.dead_endpoints:
+            self.dead_endpoints.reset_stats()
+        if self.timeout_controller:
+            self.timeout_controller.start_cycle()
+        if self.probe_scheduler:
+            self.probe_scheduler.start_cycle()
+        self.tls_prober.reset_stats()
+        if self.udp_engine:
+            self.udp_engine.reset_stats()
+        if self.handshake_verifier:
+            self.handshake_verifier.reset_stats()
+
+        logger.info(
+            f"🚰 شروع pipeline همپوشان ({mode}) - صف {pipeline.queue_size}، {pipeline.test_workers} worker تست")
+        stats = await pipeline.run()
+
+        # ذخیره کش DNS و نتایج تست برای سیکل بعدی
+        self.resolver.save_cache_to_disk()
+        self.save_probe_state()
+
+        self.record_probe_scheduling(pipeline.time_budget, pipeline.probe_outcomes, pipeline.deferred)
+
+        stages = stats['stages']
+        tested = stages['score']['items_in']
+        test_time = stats['test_time']
+        self.cycle_stats['pipeline'] = stats
+        self.cycle_stats['parsing'] = {
+            'raw_configs': stages['fetch']['items_out'],
+            'parsed_configs': stages['parse']['items_out'],
+            'unique_configs': stages['dedup']['items_out'],
+            'distinct_raw_configs': self.distinct_raw_count,
+            'parse_calls': self.parse_count,
+            'parses_per_unique_config': round(
+                self.parse_count / self.distinct_raw_count, 2) if self.distinct_raw_count else 0.0,
+        }
+        self.cycle_stats['dns'] = {
+            **self.resolver.get_stats(),
+            'unresolved_configs': stats['unresolved'],
+        }
+        self.cycle_stats['endpoint_dedup'] = {
+            'configs': tested,
+            'unique_endpoints': stats['unique_endpoints'],
+            'duplication_ratio': round(tested / stats['unique_endpoints'], 2)
+            if stats['unique_endpoints'] else 0.0,
+            'probes_saved': tested - stats['unique_endpoints'],
+        }
+        self.cycle_stats['testing'] = {
+            'engine': mode,
+            'tested': tested,
+            'probes': stages['test']['items_in'],
+            'test_time': test_time,
+            'total_time': stats['total_time'],
+            'configs_per_second': round(tested / test_time, 1) if test_time > 0 else 0.0,
+        }
+
+        logger.info(
+            f"🎉 pipeline کامل شد: {stats['total_time']:.1f}s (دریافت {stats['fetch_time']:.1f}s، "
+            f"تست {test_time:.1f}s، همپوشانی {stats['overlap_time']:.1f}s)")
+        for name, stage in stages.items():
+            logger.info(
+                f"   {name}: {stage['items_in']} → {stage['items_out']} "
+                f"({stage['items_per_second'] or 0} مورد/ثانیه)")
+        logger.info(
+            f"   ✅ موفق: {len(self.working_configs)} - ❌ ناموفق: {len(self.failed_configs)}")
+
+    def record_dead_endpoints(self, configs: Iterable[V2RayConfig], is_working: bool):
+        """
+        ثبت نتیجه تست در فهرست endpoint های مرده (یک بار برای هر address:port)
+
+        سکوت مبهم UDP (WireGuard بدون کلید یا QUIC مبهم‌سازی شده) شکست قطعی
+        نیست و backoff نمی‌گیرد.
+        """
+        if not self.dead_endpoints:
+            return
+        for address, port in {(config.address, config.port) for config in configs}:
+            if not is_working and self.udp_engine and (address, port) in self.udp_engine.inconclusive:
+                continue
+            self.dead_endpoints.record_result(address, port, is_working)
+
+    def record_probe_scheduling(self, time_budget: float, probe_outcomes: List[bool], deferred: int):
+        """ثبت آمار ترتیب تست و بودجه زمانی سیکل (نتایج به ترتیب تست)"""
+        quarter = probe_outcomes[:max(1, len(probe_outcomes) // 4)]
+        self.cycle_stats['probe_scheduling'] = {
+            'order': 'priority' if self.probe_scheduler else 'arrival',
+            'time_budget': time_budget,
+            'probed': len(probe_outcomes),
+            'deferred': deferred,
+            # در ترتیب اولویت‌دار، نرخ موفقیت ربع اول باید بالاتر از نرخ کل باشد
+            'first_quarter_success_rate': round(
+                sum(quarter) / len(quarter) * 100, 2) if probe_outcomes else 0.0,
+            'overall_success_rate': round(
+                sum(probe_outcomes) / len(probe_outcomes) * 100, 2) if probe_outcomes else 0.0,
+        }
+        if deferred:
+            logger.info(
+                f"⏳ بودجه زمانی {time_budget}s تمام شد - {deferred} endpoint با اولویت پایین تست نشد")
+
+    def save_probe_state(self):
+        """ذخیره کش نتایج تست و فهرست endpoint های مرده و ثبت deadline های سیکل"""
+        if self.timeout_controller:
+            self.cycle_stats['adaptive_timeouts'] = self.timeout_controller.get_cycle_report()
+            self.timeout_controller.log_cycle_report()
+        if self.tls_probe_enabled:
+            self.cycle_stats['tls_probe'] = self.tls_prober.get_stats()
+        if self.udp_engine:
+            self.cycle_stats['udp_probe'] = self.udp_engine.get_stats()
+        if self.handshake_verifier:
+            self.cycle_stats['handshake_verify'] = self.handshake_verifier.get_stats()
+        if self.probe_cache:
+            self.probe_cache.save_to_disk()
+            self.cycle_stats['probe_cache'] = self.probe_cache.get_stats()
+        if self.dead_endpoints:
+            self.dead_endpoints.save_to_disk()
+            self.cycle_stats['dead_endpoints'] = self.dead_endpoints.get_stats()
+        if self.probe_scheduler:
+            self.probe_scheduler.save_to_disk()
+        if self.seen_index:
+            self.seen_index.save_to_disk()
+            self.cycle_stats['seen_index'] = self.seen_index.get_stats()
+
     def cleanup_resources(self):
         """پاکسازی منابع"""
         if hasattr(self, 'connection_pool'):
             self.connection_pool.close()
+        if self.seen_index:
+            self.seen_index.close()
         logger.info("🧹 منابع پاکسازی شدند")
 
-    async def test_all_configs(self, configs: List[str], max_concurrent: int = 50):
-        """Wrapper برای تست فوق سریع"""
-        await self.test_all_configs_ultra_fast(configs, max_concurrent)
+    async def test_all_configs(self, configs: List[Union[str, V2RayConfig]], max_concurrent: int = 50,
+                               mode: Optional[str] = None):
+        """Wrapper برای تست فوق سریع (mode پیش‌فرض از COLLECTION_CONFIG)"""
+        mode = mode or self.collection_config.get('test_engine', 'pool')
+        await self.test_all_configs_ultra_fast(configs, max_concurrent, mode=mode)
 
     def apply_ai_quality_scoring(self, config: V2RayConfig) -> V2RayConfig:
         """اعمال AI Quality Scoring به کانفیگ"""
@@ -1650,8 +2365,8 @@ class V2RayCollector:
             'low_quality_count': len([s for s in scores if s < 0.5])
         }
 
-    def apply_geo_filter(self, configs: List[str]) -> List[str]:
-        """اعمال فیلتر جغرافیایی"""
+    def apply_geo_filter(self, configs: List[Union[str, V2RayConfig]]) -> list:
+        """اعمال فیلتر جغرافیایی (ورودی رشته یا V2RayConfig تجزیه شده)"""
         from config import GEO_FILTER_CONFIG
 
         if not GEO_FILTER_CONFIG['enabled']:
@@ -1660,8 +2375,9 @@ class V2RayCollector:
         filtered_configs = []
         country_counts = {}
 
-        for config_str in configs:
-            config = self.parse_config(config_str)
+        for item in configs:
+            config = item if isinstance(
+                item, V2RayConfig) else self.parse_config(item)
             if not config:
                 continue
 
@@ -1677,7 +2393,7 @@ class V2RayCollector:
             if country_counts.get(country, 0) >= max_per_country:
                 continue
 
-            filtered_configs.append(config_str)
+            filtered_configs.append(item)
             country_counts[country] = country_counts.get(country, 0) + 1
 
         logger.info(
@@ -1702,8 +2418,18 @@ class V2RayCollector:
             'naive': []
         }
 
+        # فقط بهترین نماینده هر خوشه تقریباً تکراری (پیش از اعمال محدودیت‌ها)
+        # کپی لیست: انتشار زودهنگام در thread جدا و همزمان با تست اجرا می‌شود
+        working_configs = list(self.working_configs)
+        if self.config_clusterer:
+            working_configs = self.config_clusterer.representatives(working_configs)
+            self.cycle_stats['clusters'] = self.config_clusterer.get_stats()
+            logger.info(
+                f"🧬 خوشه‌بندی: {len(self.working_configs)} کانفیگ سالم در "
+                f"{len(working_configs)} خوشه ({self.cycle_stats['clusters']['cluster_time_ms']}ms)")
+
         # دسته‌بندی بر اساس پروتکل
-        for config in self.working_configs:
+        for config in working_configs:
             protocol = config.protocol.lower()
 
             # Normalize protocol names
@@ -1730,7 +2456,7 @@ class V2RayCollector:
         for protocol, configs in categories.items():
             # مرتب‌سازی بر اساس تأخیر
             if CATEGORIZATION_CONFIG.get('sort_by_latency', True):
-                configs.sort(key=lambda x: x.latency or float('inf'))
+                configs.sort(key=latency_sort_key)
 
             # محدودیت تعداد
             if len(configs) > max_per_protocol:
@@ -1756,8 +2482,9 @@ class V2RayCollector:
 
         return categories
 
-    def generate_subscription_links(self, categories: Dict[str, List[V2RayConfig]]):
-        """تولید لینک‌های اشتراک"""
+    def generate_subscription_links(self, categories: Dict[str, List[V2RayConfig]],
+                                    per_protocol_only: bool = False):
+        """تولید لینک‌های اشتراک (با per_protocol_only فقط فایل‌های هر پروتکل)"""
         subscription_files = {}
 
         # ایجاد پوشه‌های مورد نیاز
@@ -1768,8 +2495,8 @@ class V2RayCollector:
         # تولید فایل برای هر پروتکل
         for protocol, configs in categories.items():
             if configs:
-                # مرتب‌سازی بر اساس سرعت
-                configs.sort(key=lambda x: x.latency)
+                # مرتب‌سازی بر اساس سرعت (میانه تأخیر با جریمه loss)
+                configs.sort(key=latency_sort_key)
 
                 # تولید محتوای اشتراک
                 subscription_content = '\n'.join(
@@ -1793,6 +2520,9 @@ class V2RayCollector:
 
                 logger.info(f"تولید شد: {filename} با {len(configs)} کانفیگ")
 
+        if per_protocol_only:
+            return subscription_files
+
         # تولید فایل‌های بر اساس کشور
         country_files = self.generate_country_subscriptions(categories)
         subscription_files.update(country_files)
@@ -1803,7 +2533,7 @@ class V2RayCollector:
             all_configs.extend(configs)
 
         if all_configs:
-            all_configs.sort(key=lambda x: x.latency)
+            all_configs.sort(key=latency_sort_key)
             all_content = '\n'.join(
                 [config.raw_config for config in all_configs])
 
@@ -1813,6 +2543,16 @@ class V2RayCollector:
                 'count': len(all_configs)
             }
 
+        # کانفیگ‌های سالمی که در این سیکل برای اولین بار دیده شده‌اند
+        if self.seen_index:
+            new_configs = [config for config in all_configs
+                           if config_identity(config) in self.new_config_keys]
+            subscription_files['new'] = {
+                'filename': 'subscriptions/new_subscription.txt',
+                'content': '\n'.join(config.raw_config for config in new_configs),
+                'count': len(new_configs)
+            }
+
         return subscription_files
 
     def generate_country_subscriptions(self, categories: dict) -> dict:
@@ -1836,8 +2576,8 @@ class V2RayCollector:
         for country, configs in country_configs.items():
             # فقط کشورهای معتبر (نه Unknown)
             if configs and country != "Unknown" and len(configs) >= 1:
-                # مرتب‌سازی بر اساس سرعت
-                configs.sort(key=lambda x: x.latency)
+                # مرتب‌سازی بر اساس سرعت (میانه تأخیر با جریمه loss)
+                configs.sort(key=latency_sort_key)
 
                 # تولید محتوای اشتراک
                 subscription_content = '\n'.join(
@@ -1891,29 +2631,100 @@ class V2RayCollector:
 
         return safe_filename
 
-    async def run_collection_cycle(self):
-        """اجرای یک سیکل کامل جمع‌آوری و تست"""
-        logger.info("🚀 شروع سیکل جمع‌آوری کانفیگ‌ها...")
+    async def _collect_and_test(self):
+        """مراحل دریافت، تجزیه و تست یک سیکل"""
+        if self.collection_config.get('streaming_pipeline', True):
+            # دریافت، تجزیه و تست همپوشان
+            await self.run_streaming_pipeline()
+        else:
+            # جمع‌آوری کانفیگ‌ها
+            raw_configs = await self.collect_all_configs()
+            self.cycle_stats['parsing'] = {'raw_configs': len(raw_configs)}
+            self.finish_fetch_stage()
 
-        # جمع‌آوری کانفیگ‌ها
-        raw_configs = await self.collect_all_configs()
+            # تجزیه یکباره - از اینجا به بعد فقط V2RayConfig جریان دارد
+            parsed_configs = await self.parse_configs_parallel(raw_configs)
 
-        # تست کانفیگ‌ها
-        await self.test_all_configs(raw_configs)
+            # تست کانفیگ‌ها
+            await self.test_all_configs(parsed_configs)
 
-        # دسته‌بندی
-        categories = self.categorize_configs()
+    def generate_subscription_files(self, min_per_protocol: int = 0) -> Dict[str, Dict[str, Any]]:
+        """
+        دسته‌بندی کانفیگ‌های سالم فعلی و نوشتن فایل‌های اشتراک
 
-        # تولید لینک‌های اشتراک
-        subscription_files = self.generate_subscription_links(categories)
+        با min_per_protocol (انتشار زودهنگام در میانه سیکل) فقط فایل‌های
+        پروتکل‌هایی که حداقل این تعداد کانفیگ دارند نوشته می‌شوند؛ فایل ترکیبی،
+        فایل‌های کشور و new_subscription تا انتشار کامل پایان سیکل دست نمی‌خورند.
+        """
+        categories = self.categorize_configs()
+        if min_per_protocol:
+            categories = {protocol: configs for protocol, configs in categories.items()
+                          if len(configs) >= min_per_protocol}
+
+        subscription_files = self.generate_subscription_links(
+            categories, per_protocol_only=bool(min_per_protocol))
+        for file_info in subscription_files.values():
+            write_file_atomic(file_info['filename'], file_info['content'])
+        return subscription_files
 
-        # ذخیره فایل‌ها
-        import os
-        os.makedirs('subscriptions', exist_ok=True)
+    def publish_subscriptions(self, min_per_protocol: int = 0) -> int:
+        """انتشار فایل‌های اشتراک و برگرداندن تعداد کانفیگ‌های منتشر شده"""
+        subscription_files = self.generate_subscription_files(min_per_protocol)
+        if 'all' in subscription_files:
+            return subscription_files['all']['count']
+        # انتشار زودهنگام: مجموع فایل‌های پروتکل (بدون نسخه تکراری by_protocol)
+        return sum(file_info['count'] for name, file_info in subscription_files.items()
+                   if not name.endswith('_by_protocol'))
 
-        for protocol, file_info in subscription_files.items():
-            with open(file_info['filename'], 'w', encoding='utf-8') as f:
-                f.write(file_info['content'])
+    async def run_collection_cycle(self):
+        """اجرای یک سیکل کامل جمع‌آوری و تست"""
+        logger.info("🚀 شروع سیکل جمع‌آوری کانفیگ‌ها...")
+        self.cycle_stats = {}
+        self.parse_count = 0
+        self.distinct_raw_count = 0
+        self.config_origins = {}
+        self.new_config_keys = set()
+        if self.seen_index:
+            self.seen_index.reset_stats()
+        if self.config_clusterer:
+            self.config_clusterer.reset_stats()
+
+        if self.source_validators:
+            self.source_validators.reset_cycle_stats()
+
+        deadline = self.collection_config.get('cycle_deadline', 0)
+        deadline_hit = False
+        if self.early_publisher:
+            self.early_publisher.start_cycle()
+
+        if deadline:
+            # deadline سخت: هر چه تا این لحظه تأیید شده منتشر می‌شود
+            task = asyncio.ensure_future(self._collect_and_test())
+            done, _ = await asyncio.wait({task}, timeout=deadline)
+            if task in done:
+                task.result()
+            else:
+                deadline_hit = True
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                logger.warning(
+                    f"⏰ deadline سیکل ({deadline}s) رسید - انتشار {len(self.working_configs)} کانفیگ تأیید شده")
+                self.resolver.save_cache_to_disk()
+                self.save_probe_state()
+        else:
+            await self._collect_and_test()
+
+        # دسته‌بندی، تولید لینک‌های اشتراک و ذخیره فایل‌ها
+        if self.early_publisher:
+            await self.early_publisher.wait_pending()
+        subscription_files = self.generate_subscription_files()
+        published = subscription_files.get('all', {}).get('count', 0)
+        if self.early_publisher:
+            self.cycle_stats['publishing'] = self.early_publisher.finalize(
+                published, deadline_hit)
+            logger.info(
+                f"📤 انتشار: {self.cycle_stats['publishing']['published_before_deadline']} کانفیگ پیش از deadline، "
+                f"{published} کانفیگ در انتشار نهایی")
 
         logger.info(
             f"✅ سیکل کامل شد - {len(self.working_configs)} کانفیگ سالم ذخیره شد")
@@ -1945,6 +2756,7 @@ class V2RayCollector:
             'protocols': {},
             'countries': {},
             'ai_quality': self.get_ai_quality_statistics(),
+            'cycle_stats': self.cycle_stats,
             'available_files': {
                 'protocols': [],
                 'countries': []
@@ -2051,6 +2863,7 @@ async def main():
         logger.error(f"خطای کلی در اجرا: {e}")
     finally:
         # پاکسازی منابع
+        await collector.http_client.close()
         collector.cleanup_resources()
         logger.info("منابع پاکسازی شدند")
 
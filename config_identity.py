@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Config Identity
+فرم کانونی لینک کانفیگ‌ها و کلید هویت پایدار برای حذف تکراری، کش و تاریخچه
+"""
+
+import base64
+import hashlib
+import json
+import logging
+from typing import Iterable, Iterator, Optional, Tuple
+from urllib.parse import quote, unquote
+
+logger = logging.getLogger(__name__)
+
+# نام‌های مستعار scheme ها
+SCHEME_ALIASES = {
+    'hy2': 'hysteria2',
+    'tuic5': 'tuic',
+    'shadowsocks': 'ss',
+}
+
+# فیلدهای نمایشی VMess که در هویت کانفیگ نقشی ندارند
+VMESS_DISPLAY_FIELDS = frozenset({'ps', 'remark', 'remarks', 'v'})
+# پارامترهای نمایشی SSR
+SSR_DISPLAY_PARAMS = frozenset({'remarks', 'group'})
+# پارامترهایی که مقدارشان به حروف کوچک حساس نیست
+CASE_INSENSITIVE_PARAMS = frozenset({'security', 'type', 'encryption', 'headertype',
+                                     'fp', 'alpn', 'flow', 'mode', 'sni', 'host', 'peer'})
+
+_SAFE = "-._~!$&'()*+,;=:@/"
+
+
+def _b64decode(data: str) -> bytes:
+    """decode base64 معمولی یا urlsafe با padding ناقص"""
+    data = data.strip().replace('-', '+').replace('_', '/')
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+
+def _normalize_host(host: str) -> str:
+    host = host.strip().lower().rstrip('.')
+    if host.startswith('[') and host.endswith(']'):
+        return host
+    return f'[{host}]' if ':' in host else host
+
+
+def _split_host_port(server: str) -> Tuple[str, str]:
+    host, _, port = server.rpartition(':')
+    if not host:
+        return server, ''
+    return host, port
+
+
+def _canonical_port(port: str) -> str:
+    port = port.strip()
+    return str(int(port)) if port.isdigit() else port
+
+
+def _canonical_query(query: str, drop: frozenset = frozenset()) -> str:
+    """
+    پارامترهای query مرتب شده با percent-encoding یکسان
+
+    '+' به فاصله تبدیل نمی‌شود چون کلیدهای base64 (مثلاً publickey) آن را دارند؛
+    پارامترهای خالی و نمایشی حذف می‌شوند.
+    """
+    pairs = []
+    for part in query.split('&'):
+        if not part:
+            continue
+        name, _, value = part.partition('=')
+        name = unquote(name).strip().lower()
+        value = unquote(value).strip()
+        if not value or name in drop:
+            continue
+        if name in CASE_INSENSITIVE_PARAMS:
+            value = value.lower()
+        pairs.append((name, value))
+    pairs.sort()
+    return '&'.join(f'{quote(name, safe=_SAFE)}={quote(value, safe=_SAFE)}'
+                    for name, value in pairs)
+
+
+def _canonical_url(scheme: str, body: str) -> str:
+    """فرم کانونی لینک‌های URL مانند (vless، trojan، hysteria، tuic، ...)"""
+    body = body.split('#', 1)[0]
+    main, _, query = body.partition('?')
+    userinfo, has_user, server = main.rpartition('@')
+    server, _, path = server.partition('/')
+    host, port = _split_host_port(server)
+
+    canonical = f'{scheme}://'
+    if has_user:
+        userinfo = unquote(userinfo)
+        if scheme == 'vless':
+            # UUID به حروف کوچک/بزرگ حساس نیست
+            userinfo = userinfo.lower()
+        canonical += quote(userinfo, safe=_SAFE.replace('@', '')) + '@'
+    canonical += f'{_normalize_host(host)}:{_canonical_port(port)}'
+    if path.strip('/'):
+        canonical += '/' + quote(unquote(path.strip('/')), safe=_SAFE)
+    query = _canonical_query(query)
+    return f'{canonical}?{query}' if query else canonical
+
+
+def _canonical_vmess(body: str) -> str:
+    """VMess base64 JSON: حذف فیلدهای نمایشی و مرتب‌سازی کلیدها"""
+    try:
+        data = json.loads(_b64decode(body.split('#', 1)[0]).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        # VMess با قالب URL (uuid@host:port?...)
+        return _canonical_url('vmess', body)
+    if not isinstance(data, dict):
+        return _canonical_url('vmess', body)
+
+    normalized = {}
+    for name, value in data.items():
+        name = str(name).lower()
+        if name in VMESS_DISPLAY_FIELDS or value is None:
+            continue
+        value = str(value).strip()
+        if not value or (name == 'aid' and value == '0'):
+            continue
+        if name in ('add', 'host', 'sni'):
+            value = value.lower().rstrip('.')
+        elif name in ('id', 'net', 'type', 'tls', 'scy', 'fp', 'alpn'):
+            value = value.lower()
+        elif name == 'port':
+            value = _canonical_port(value)
+        normalized[name] = value
+    return 'vmess://' + json.dumps(normalized, sort_keys=True, separators=(',', ':'),
+                                   ensure_ascii=False)
+
+
+def _canonical_ss(body: str) -> str:
+    """Shadowsocks (SIP002 یا قالب قدیمی تمام base64) به ss://method:password@host:port"""
+    body = body.split('#', 1)[0]
+    main, _, query = body.partition('?')
+    main = main.rstrip('/')
+    if '@' in main:
+        userinfo, _, server = main.rpartition('@')
+        userinfo = unquote(userinfo)
+        if ':' not in userinfo:
+            try:
+                userinfo = _b64decode(userinfo).decode('utf-8')
+            except (ValueError, UnicodeDecodeError):
+                pass
+    else:
+        try:
+            decoded = _b64decode(main).decode('utf-8')
+        except (ValueError, UnicodeDecodeError):
+            return _canonical_url('ss', body)
+        userinfo, _, server = decoded.rpartition('@')
+
+    method, _, password = userinfo.partition(':')
+    host, port = _split_host_port(server)
+    canonical = (f'ss://{quote(method.lower(), safe=_SAFE)}:{quote(password, safe=_SAFE)}'
+                 f'@{_normalize_host(host)}:{_canonical_port(port)}')
+    query = _canonical_query(query)
+    return f'{canonical}?{query}' if query else canonical
+
+
+def _canonical_ssr(body: str) -> str:
+    """ShadowsocksR: decode base64 و حذف remarks/group"""
+    try:
+        decoded = _b64decode(body.split('#', 1)[0]).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return 'ssr://' + body.split('#', 1)[0]
+    main, _, query = decoded.partition('/?')
+    parts = main.split(':')
+    if len(parts) >= 6:
+        parts[0] = parts[0].lower()
+        parts[1] = _canonical_port(parts[1])
+    canonical = 'ssr://' + ':'.join(parts)
+    query = _canonical_query(query, drop=SSR_DISPLAY_PARAMS)
+    return f'{canonical}/?{query}' if query else canonical
+
+
+def canonicalize(raw_config: str) -> Optional[str]:
+    """
+    فرم کانونی یک لینک کانفیگ
+
+    لینک‌هایی که فقط در remark، ترتیب پارامترها، percent-encoding، حروف
+    hostname یا قالب base64 تفاوت دارند فرم کانونی یکسانی دارند. برای رشته
+    بدون scheme، None برمی‌گردد.
+    """
+    if not raw_config:
+        return None
+    raw_config = raw_config.strip()
+    scheme, separator, body = raw_config.partition('://')
+    if not separator or not scheme:
+        return None
+    scheme = scheme.lower()
+    scheme = SCHEME_ALIASES.get(scheme, scheme)
+
+    if scheme == 'vmess':
+        return _canonical_vmess(body)
+    if scheme == 'ss':
+        return _canonical_ss(body)
+    if scheme == 'ssr':
+        return _canonical_ssr(body)
+    return _canonical_url(scheme, body)
+
+
+def _hash_key(data: bytes) -> str:
+    """
+    hash 64 بیتی blake2b
+
+    همیشه همین الگوریتم (کتابخانه استاندارد) استفاده می‌شود تا کلیدهای ذخیره
+    شده در جدول‌های پایدار با نصب یا حذف یک وابستگی اختیاری تغییر نکنند.
+    """
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def identity_key(raw_config: str) -> str:
+    """
+    کلید هویت پایدار کانفیگ (16 رقم hex از hash فرم کانونی)
+
+    برای رشته‌ای که فرم کانونی ندارد، hash خود رشته برگردانده می‌شود.
+    """
+    canonical = canonicalize(raw_config)
+    return _hash_key((canonical if canonical is not None else raw_config.strip()).encode('utf-8'))
+
+
+def config_identity(config) -> str:
+    """کلید هویت V2RayConfig (یک بار محاسبه و روی کانفیگ نگه داشته می‌شود)"""
+    if not config.identity_key:
+        config.identity_key = identity_key(config.raw_config)
+    return config.identity_key
+
+
+def unique_by_identity(items: Iterable, key_of=None, seen: Optional[set] = None) -> Iterator:
+    """
+    حذف تکراری یک گذره بر اساس کلید هویت با حفظ ترتیب اولین مشاهده
+
+    key_of: تابع کلید هر مورد (پیش‌فرض: identity_key برای رشته و
+    config_identity برای کانفیگ). seen برای ادامه حذف تکراری بین فراخوانی‌ها.
+    """
+    seen = set() if seen is None else seen
+    for item in items:
+        if key_of is not None:
+            key = key_of(item)
+        elif isinstance(item, str):
+            key = identity_key(item)
+        else:
+            key = config_identity(item)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield item
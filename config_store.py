@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact Config Store
+ذخیره ستونی کانفیگ‌ها در آرایه‌های فشرده به جای یک شیء پایتون برای هر کانفیگ
+"""
+
+import sys
+import typing
+from array import array
+from dataclasses import fields
+from typing import Any, Dict, Iterator, List, Sequence
+
+# فیلدهای متنی کم‌تنوع که با کد عددی در جدول مشترک ذخیره می‌شوند
+DEFAULT_CATEGORICAL = ('protocol', 'network', 'country', 'ai_quality_category')
+# نشانگر None برای فیلدهای Optional[int]
+_NONE_INT = -(1 << 63)
+_SEPARATOR = '\x00'
+
+
+def _field_kind(field_type: Any) -> str:
+    """نوع ستون یک فیلد dataclass: float، int، bool یا str"""
+    if isinstance(field_type, str):
+        field_type = {'float': float, 'int': int, 'bool': bool, 'str': str}.get(field_type, str)
+    if typing.get_origin(field_type) is typing.Union:
+        # Optional[X]
+        field_type = next(arg for arg in typing.get_args(field_type) if arg is not type(None))
+    for kind in (bool, float, int):
+        if field_type is kind:
+            return kind.__name__
+    return 'str'
+
+
+class CompactConfigStore:
+    """
+    لیست append-only کانفیگ‌ها با چیدمان ستونی
+
+    برای کانفیگ‌هایی که فقط نگه داشته و شمرده می‌شوند (مانند failed_configs)
+    به جای صدها هزار شیء V2RayConfig با رشته‌ها و float های جداگانه:
+    - فیلدهای float در یک array('f') (float32)،
+    - فیلدهای int در array('q') و bool ها در array('B')،
+    - فیلدهای متنی کم‌تنوع (protocol، country، ...) با کد در array('H')،
+    - باقی فیلدهای متنی هر کانفیگ به صورت UTF-8 پشت سر هم در یک bytearray.
+
+    خواندن (اندیس یا پیمایش) هر بار یک شیء جدید از کلاس کانفیگ می‌سازد؛ پس
+    تغییر شیء خوانده شده در store ذخیره نمی‌شود. دقت float ها float32 است.
+    """
+
+    def __init__(self, config_class, categorical: Sequence[str] = DEFAULT_CATEGORICAL):
+        self.config_class = config_class
+        hints = typing.get_type_hints(config_class)
+        kinds = {f.name: _field_kind(hints.get(f.name, f.type)) for f in fields(config_class)}
+        self._field_names = [f.name for f in fields(config_class)]
+        self._float_fields = [name for name in self._field_names if kinds[name] == 'float']
+        self._int_fields = [name for name in self._field_names if kinds[name] == 'int']
+        self._bool_fields = [name for name in self._field_names if kinds[name] == 'bool']
+        self._code_fields = [name for name in self._field_names
+                             if kinds[name] == 'str' and name in categorical]
+        self._text_fields = [name for name in self._field_names
+                             if kinds[name] == 'str' and name not in categorical]
+
+        self._floats = array('f')
+        self._ints = array('q')
+        self._bools = array('B')
+        self._codes = array('H')
+        self._text = bytearray()
+        self._offsets = array('Q', [0])
+        self._values: List[str] = []
+        self._value_codes: Dict[str, int] = {}
+
+    def append(self, config: Any):
+        """افزودن یک کانفیگ (مقادیر کپی می‌شوند و شیء نگه داشته نمی‌شود)"""
+        self._floats.extend(getattr(config, name) or 0.0 for name in self._float_fields)
+        self._ints.extend(_NONE_INT if getattr(config, name) is None else int(getattr(config, name))
+                          for name in self._int_fields)
+        flags = 0
+        for bit, name in enumerate(self._bool_fields):
+            if getattr(config, name):
+                flags |= 1 << bit
+        self._bools.append(flags)
+        for name in self._code_fields:
+            value = getattr(config, name) or ''
+            code = self._value_codes.get(value)
+            if code is None:
+                code = self._value_codes[value] = len(self._values)
+                self._values.append(sys.intern(value))
+            self._codes.append(code)
+        self._text += _SEPARATOR.join(
+            (getattr(config, name) or '').replace(_SEPARATOR, '') for name in self._text_fields
+        ).encode('utf-8')
+        self._offsets.append(len(self._text))
+
+    def extend(self, configs):
+        for config in configs:
+            self.append(config)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getitem__(self, index: int) -> Any:
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError('config store index out of range')
+
+        values: Dict[str, Any] = {}
+        width = len(self._float_fields)
+        for position, name in enumerate(self._float_fields):
+            values[name] = float(self._floats[index * width + position])
+        width = len(self._int_fields)
+        for position, name in enumerate(self._int_fields):
+            value = self._ints[index * width + position]
+            values[name] = None if value == _NONE_INT else value
+        flags = self._bools[index]
+        for bit, name in enumerate(self._bool_fields):
+            values[name] = bool(flags & (1 << bit))
+        width = len(self._code_fields)
+        for position, name in enumerate(self._code_fields):
+            values[name] = self._values[self._codes[index * width + position]]
+        text = self._text[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+        values.update(zip(self._text_fields, text.split(_SEPARATOR)))
+        return self.config_class(**values)
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def clear(self):
+        self.__init__(self.config_class, tuple(self._code_fields))
+
+    def nbytes(self) -> int:
+        """حافظه بافرهای store (بایت، بدون جدول مقادیر کم‌تنوع)"""
+        return sum(buffer.itemsize * len(buffer) for buffer in
+                   (self._floats, self._ints, self._bools, self._codes, self._offsets)) + \
+            len(self._text)
+
+    def get_stats(self) -> Dict[str, Any]:
+        count = len(self)
+        return {
+            'configs': count,
+            'bytes': self.nbytes(),
+            'bytes_per_config': round(self.nbytes() / count, 1) if count else 0.0,
+        }
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dead Endpoint Index
+فهرست endpoint های مرده با backoff نمایی برای کاهش تست‌های تکراری
+"""
+
+import json
+import os
+import time
+import logging
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+from dns_resolver import normalize_host
+
+logger = logging.getLogger(__name__)
+
+
+def endpoint_id(address: str, port: int) -> str:
+    """کلید address:port نرمال‌شده (قبل از resolve)"""
+    return f"{normalize_host(address)}:{port}"
+
+
+@dataclass
+class DeadEndpointEntry:
+    """وضعیت backoff یک endpoint ناموفق"""
+    failures: int = 0
+    last_failure: float = 0.0
+    next_probe_at: float = 0.0
+
+
+class DeadEndpointIndex:
+    """
+    فهرست پایدار endpoint های ناموفق با backoff نمایی
+
+    بعد از failure_threshold شکست متوالی، endpoint تا next_probe_at تست
+    نمی‌شود و فاصله تست بعدی با هر شکست دو برابر (تا max_delay) می‌شود.
+    موفقیت یک endpoint آن را از فهرست حذف می‌کند.
+    """
+
+    def __init__(self, index_file: str = "cache/dead_endpoints.json",
+                 failure_threshold: int = 2, base_delay: int = 1800,
+                 max_delay: int = 7 * 86400, factor: float = 2.0):
+        self.index_file = index_file
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self._entries: Dict[str, DeadEndpointEntry] = {}
+        self.stats = {'skipped': 0, 'backed_off': 0, 'recovered': 0}
+
+        self._load_from_disk()
+
+    def is_backed_off(self, entry: Optional[DeadEndpointEntry]) -> bool:
+        """آیا ورودی به آستانه backoff رسیده است؟"""
+        return entry is not None and entry.failures >= self.failure_threshold
+
+    def should_probe(self, address: str, port: int, now: Optional[float] = None) -> bool:
+        """آیا زمان تست مجدد این endpoint رسیده است؟"""
+        entry = self._entries.get(endpoint_id(address, port))
+        if not self.is_backed_off(entry):
+            return True
+
+        if (now or time.time()) >= entry.next_probe_at:
+            return True
+        self.stats['skipped'] += 1
+        return False
+
+    def record_result(self, address: str, port: int, success: bool):
+        """ثبت نتیجه تست یک endpoint"""
+        key = endpoint_id(address, port)
+        entry = self._entries.get(key)
+
+        if success:
+            if entry is not None:
+                if self.is_backed_off(entry):
+                    # endpoint پس از backoff دوباره سالم شد
+                    self.stats['recovered'] += 1
+                del self._entries[key]
+            return
+
+        now = time.time()
+        if entry is None:
+            entry = self._entries[key] = DeadEndpointEntry()
+        entry.failures += 1
+        entry.last_failure = now
+        if self.is_backed_off(entry):
+            exponent = entry.failures - self.failure_threshold
+            delay = min(self.base_delay * (self.factor ** exponent), self.max_delay)
+            entry.next_probe_at = now + delay
+            if entry.failures == self.failure_threshold:
+                self.stats['backed_off'] += 1
+
+    def reset_stats(self):
+        """پاک کردن آمار سیکل قبلی"""
+        self.stats = {'skipped': 0, 'backed_off': 0, 'recovered': 0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """آمار سیکل جاری و اندازه فهرست"""
+        return {
+            **self.stats,
+            'tracked_endpoints': len(self._entries),
+            'backed_off_endpoints': sum(
+                1 for entry in self._entries.values() if self.is_backed_off(entry)),
+        }
+
+    def _load_from_disk(self):
+        """بارگذاری فهرست از دیسک"""
+        if not self.index_file or not os.path.exists(self.index_file):
+            return
+
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            # ورودی‌هایی که مدت‌ها شکست نخورده‌اند دیگر اعتباری ندارند
+            cutoff = time.time() - 2 * self.max_delay
+            for key, entry_data in data.items():
+                entry = DeadEndpointEntry(**entry_data)
+                if entry.last_failure > cutoff:
+                    self._entries[key] = entry
+
+            logger.info(f"Loaded {len(self._entries)} dead endpoints from disk")
+
+        except Exception as e:
+            logger.error(f"Error loading dead endpoint index from disk: {e}")
+
+    def save_to_disk(self):
+        """ذخیره فهرست روی دیسک"""
+        if not self.index_file:
+            return
+
+        try:
+            directory = os.path.dirname(self.index_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            data = {key: asdict(entry) for key, entry in self._entries.items()}
+
+            with open(self.index_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+
+            logger.info(f"Saved {len(data)} dead endpoints to disk")
+
+        except Exception as e:
+            logger.error(f"Error saving dead endpoint index to disk: {e}")
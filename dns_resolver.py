@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async DNS Resolver
+resolver غیرهمزمان مشترک با کش TTL برای تست اتصال و GeoIP
+"""
+
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import time
+import logging
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_host(address: str) -> str:
+    """نرمال‌سازی hostname یا IP (حذف براکت IPv6، نقطه انتهایی و حروف بزرگ)"""
+    return address.strip().strip('[]').rstrip('.').lower()
+
+
+def is_ip_address(address: str) -> bool:
+    """بررسی IP بودن آدرس (IPv4 یا IPv6)"""
+    try:
+        ipaddress.ip_address(address)
+        return True
+    except ValueError:
+        return False
+
+
+@dataclass
+class DNSCacheEntry:
+    """ورودی کش DNS (لیست خالی یعنی نتیجه منفی)"""
+    addresses: List[str] = field(default_factory=list)
+    expires_at: float = 0.0
+
+
+class AsyncDNSResolver:
+    """
+    resolver غیرهمزمان با کش مثبت/منفی، ادغام درخواست‌های همزمان و سقف همزمانی
+
+    درخواست‌های همزمان برای یک hostname به یک lookup واحد متصل می‌شوند و
+    کش بین سیکل‌ها روی دیسک ذخیره می‌شود.
+    """
+
+    def __init__(self, cache_file: str = "cache/dns_cache.json",
+                 positive_ttl: int = 1800, negative_ttl: int = 300,
+                 max_concurrency: int = 200, timeout: float = 5.0):
+        self.cache_file = cache_file
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._cache: Dict[str, DNSCacheEntry] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {
+            'hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'lookups': 0,
+            'failures': 0,
+            'lookup_time_ms': 0.0,
+        }
+
+        self._load_cache_from_disk()
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """semaphore متعلق به event loop جاری"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+            self._inflight.clear()
+        return self._semaphore
+
+    def get_cached(self, host: str) -> Optional[str]:
+        """دریافت همزمان (sync) آدرس از کش بدون lookup شبکه"""
+        host = normalize_host(host)
+        if is_ip_address(host):
+            return host
+
+        entry = self._cache.get(host)
+        if entry and entry.addresses and entry.expires_at > time.time():
+            return entry.addresses[0]
+        return None
+
+    async def _lookup(self, host: str) -> Optional[str]:
+        """lookup واقعی با getaddrinfo و ثبت در کش"""
+        loop = asyncio.get_running_loop()
+
+        async with self.semaphore:
+            start_time = time.perf_counter()
+            addresses: List[str] = []
+            try:
+                infos = await asyncio.wait_for(
+                    loop.getaddrinfo(host, None, type=socket.SOCK_STREAM),
+                    timeout=self.timeout)
+                # اولویت با IPv4 برای سازگاری با connection pool
+                for family, _, _, _, sockaddr in sorted(
+                        infos, key=lambda info: info[0] != socket.AF_INET):
+                    if sockaddr[0] not in addresses:
+                        addresses.append(sockaddr[0])
+            except (OSError, UnicodeError, asyncio.TimeoutError) as e:
+                logger.debug(f"DNS lookup failed for {host}: {e}")
+
+            self.stats['lookups'] += 1
+            self.stats['lookup_time_ms'] += (time.perf_counter() - start_time) * 1000
+
+        ttl = self.positive_ttl if addresses else self.negative_ttl
+        if not addresses:
+            self.stats['failures'] += 1
+        self._cache[host] = DNSCacheEntry(addresses, time.time() + ttl)
+        return addresses[0] if addresses else None
+
+    async def resolve(self, host: str) -> Optional[str]:
+        """resolve یک hostname (IP ها بدون تغییر برگردانده می‌شوند)"""
+        host = normalize_host(host)
+        if is_ip_address(host):
+            return host
+
+        entry = self._cache.get(host)
+        if entry and entry.expires_at > time.time():
+            if entry.addresses:
+                self.stats['hits'] += 1
+                return entry.addresses[0]
+            self.stats['negative_hits'] += 1
+            return None
+
+        # ادغام با lookup در حال انجام (دسترسی به semaphore، inflight را با loop جاری همگام می‌کند)
+        _ = self.semaphore
+        task = self._inflight.get(host)
+        if task is not None:
+            self.stats['coalesced'] += 1
+        else:
+            self.stats['misses'] += 1
+            task = asyncio.ensure_future(self._lookup(host))
+            self._inflight[host] = task
+            task.add_done_callback(lambda _, h=host: self._inflight.pop(h, None))
+
+        # shield تا cancel شدن یک فراخواننده lookup مشترک را لغو نکند
+        return await asyncio.shield(task)
+
+    async def resolve_timed(self, host: str) -> Tuple[Optional[str], float]:
+        """resolve همراه با زمان صرف شده (میلی‌ثانیه)"""
+        start_time = time.perf_counter()
+        address = await self.resolve(host)
+        return address, (time.perf_counter() - start_time) * 1000
+
+    async def resolve_many(self, hosts: Iterable[str]) -> Dict[str, Tuple[Optional[str], float]]:
+        """resolve دسته‌ای hostname های یکتا"""
+        unique_hosts = list({normalize_host(host) for host in hosts})
+        results = await asyncio.gather(
+            *(self.resolve_timed(host) for host in unique_hosts))
+        return dict(zip(unique_hosts, results))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """دریافت آمار resolver"""
+        requests = self.stats['hits'] + self.stats['negative_hits'] + \
+            self.stats['misses'] + self.stats['coalesced']
+        hit_rate = (self.stats['hits'] + self.stats['negative_hits']) / \
+            requests * 100 if requests else 0
+
+        return {
+            **self.stats,
+            'lookup_time_ms': round(self.stats['lookup_time_ms'], 1),
+            'cache_size': len(self._cache),
+            'hit_rate': f"{hit_rate:.2f}%",
+        }
+
+    def _load_cache_from_disk(self):
+        """بارگذاری کش DNS از دیسک"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            now = time.time()
+            for host, entry_data in data.items():
+                entry = DNSCacheEntry(**entry_data)
+                if entry.expires_at > now:
+                    self._cache[host] = entry
+
+            logger.info(f"Loaded {len(self._cache)} DNS cache entries from disk")
+
+        except Exception as e:
+            logger.error(f"Error loading DNS cache from disk: {e}")
+
+    def save_cache_to_disk(self):
+        """ذخیره کش DNS (فقط ورودی‌های معتبر) روی دیسک"""
+        if not self.cache_file:
+            return
+
+        try:
+            directory = os.path.dirname(self.cache_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            now = time.time()
+            cache_data = {host: asdict(entry) for host, entry in self._cache.items()
+                          if entry.expires_at > now}
+
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(cache_data, f, ensure_ascii=False)
+
+            logger.info(f"Saved {len(cache_data)} DNS cache entries to disk")
+
+        except Exception as e:
+            logger.error(f"Error saving DNS cache to disk: {e}")
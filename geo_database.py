@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Geo Database
+پایگاه داده آفلاین IP به کشور (MaxMind MMDB روی mmap یا CSV رنج‌ها) با بارگذاری مجدد خودکار
+"""
+
+import ipaddress
+import logging
+import mmap
+import os
+import socket
+import struct
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ip_range_index import DEFAULT_RANGES_FILE, IPRangeIndex, ip_to_int
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+METADATA_MARKER = b'\xab\xcd\xefMaxMind.com'
+# جداکننده 16 بایتی بین درخت جستجو و بخش داده
+DATA_SECTION_SEPARATOR = 16
+_UINT32 = struct.Struct('>I')
+_DOUBLE = struct.Struct('>d')
+_FLOAT = struct.Struct('>f')
+
+
+class MMDBFormatError(ValueError):
+    """فایل MMDB نامعتبر یا پشتیبانی نشده"""
+
+
+class MMDBReader:
+    """
+    خواننده فایل MaxMind DB (GeoLite2/GeoIP2 Country یا City) روی mmap
+
+    درخت جستجو مستقیم از صفحات mmap خوانده می‌شود و هیچ بخشی از فایل در
+    حافظه کپی نمی‌شود. رکورد داده هر کشور فقط یک بار decode و با offset آن
+    کش می‌شود، پس lookup های بعدی فقط پیمایش درخت هستند.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise MMDBFormatError(f'empty database file: {path}')
+
+        marker = self._map.rfind(METADATA_MARKER, max(0, len(self._map) - 128 * 1024))
+        if marker < 0:
+            self.close()
+            raise MMDBFormatError(f'MaxMind metadata marker not found: {path}')
+        metadata_start = marker + len(METADATA_MARKER)
+        self.metadata, _ = self._decode(metadata_start, metadata_start)
+
+        self.node_count = self.metadata['node_count']
+        self.record_size = self.metadata['record_size']
+        self.ip_version = self.metadata['ip_version']
+        self.database_type = self.metadata.get('database_type', '')
+        if self.record_size not in (24, 28, 32):
+            self.close()
+            raise MMDBFormatError(f'unsupported record size: {self.record_size}')
+        self.node_bytes = self.record_size // 4
+        self.data_start = self.node_count * self.node_bytes + DATA_SECTION_SEPARATOR
+
+        # offset داده -> کد کشور (تعداد رکوردهای متمایز کم است)
+        self._countries: Dict[int, Optional[str]] = {}
+        self._node_arrays = None
+        self.ipv4_start = 0
+        if self.ip_version == 6:
+            node = 0
+            for _ in range(96):
+                if node >= self.node_count:
+                    break
+                node = self._read_node(node, 0)
+            self.ipv4_start = node
+
+    # ---- data section ----
+
+    def _decode(self, offset: int, base: int) -> Tuple[Any, int]:
+        """decode یک مقدار از بخش داده (base مبدأ pointer ها)"""
+        data = self._map
+        control = data[offset]
+        offset += 1
+        data_type = control >> 5
+
+        if data_type == 1:
+            # pointer: اندازه از بیت‌های 3-4 و مقدار از 3 بیت پایین
+            size = (control >> 3) & 0x3
+            value = control & 0x7
+            if size == 0:
+                pointer = (value << 8) | data[offset]
+            elif size == 1:
+                pointer = ((value << 16) | int.from_bytes(data[offset:offset + 2], 'big')) + 2048
+            elif size == 2:
+                pointer = ((value << 24) | int.from_bytes(data[offset:offset + 3], 'big')) + 526336
+            else:
+                pointer = _UINT32.unpack_from(data, offset)[0]
+            decoded, _ = self._decode(base + pointer, base)
+            return decoded, offset + size + 1
+
+        if data_type == 0:
+            data_type = 7 + data[offset]
+            offset += 1
+
+        size = control & 0x1f
+        if size >= 29:
+            extra = size - 28
+            size_bytes = int.from_bytes(data[offset:offset + extra], 'big')
+            offset += extra
+            size = (29, 285, 65821)[extra - 1] + size_bytes
+
+        if data_type == 2:
+            return data[offset:offset + size].decode('utf-8'), offset + size
+        if data_type == 7:
+            result = {}
+            for _ in range(size):
+                key, offset = self._decode(offset, base)
+                result[key], offset = self._decode(offset, base)
+            return result, offset
+        if data_type in (5, 6, 9, 10):
+            return int.from_bytes(data[offset:offset + size], 'big'), offset + size
+        if data_type == 8:
+            return int.from_bytes(data[offset:offset + size], 'big', signed=size == 4), offset + size
+        if data_type == 11:
+            result = []
+            for _ in range(size):
+                item, offset = self._decode(offset, base)
+                result.append(item)
+            return result, offset
+        if data_type == 3:
+            return _DOUBLE.unpack_from(data, offset)[0], offset + 8
+        if data_type == 15:
+            return _FLOAT.unpack_from(data, offset)[0], offset + 4
+        if data_type == 4:
+            return bytes(data[offset:offset + size]), offset + size
+        if data_type == 14:
+            return bool(size), offset
+        raise MMDBFormatError(f'unsupported data type {data_type} at offset {offset - 1}')
+
+    def _country_at(self, record: int) -> Optional[str]:
+        data_offset = record - self.node_count - DATA_SECTION_SEPARATOR
+        if data_offset in self._countries:
+            return self._countries[data_offset]
+        value, _ = self._decode(self.data_start + data_offset, self.data_start)
+        country = None
+        if isinstance(value, dict):
+            for field in ('country', 'registered_country'):
+                section = value.get(field)
+                if isinstance(section, dict) and section.get('iso_code'):
+                    country = section['iso_code']
+                    break
+        self._countries[data_offset] = country
+        return country
+
+    # ---- search tree ----
+
+    def _read_node(self, node: int, bit: int) -> int:
+        data = self._map
+        offset = node * self.node_bytes
+        if self.record_size == 24:
+            offset += 3 * bit
+            return (data[offset] << 16) | (data[offset + 1] << 8) | data[offset + 2]
+        if self.record_size == 28:
+            if bit:
+                return ((data[offset + 3] & 0x0f) << 24) | (data[offset + 4] << 16) | \
+                    (data[offset + 5] << 8) | data[offset + 6]
+            return ((data[offset + 3] & 0xf0) << 20) | (data[offset] << 16) | \
+                (data[offset + 1] << 8) | data[offset + 2]
+        return _UINT32.unpack_from(data, offset + 4 * bit)[0]
+
+    def _record_for(self, version: int, value: int) -> int:
+        if version == 4:
+            node, bits = self.ipv4_start, 32
+        elif self.ip_version == 6:
+            node, bits = 0, 128
+        else:
+            return self.node_count
+        node_count = self.node_count
+        if self.record_size == 24:
+            # مسیر رایج (GeoLite2 Country) بدون فراخوانی تابع در هر بیت
+            data = self._map
+            for shift in range(bits - 1, -1, -1):
+                if node >= node_count:
+                    break
+                offset = node * 6 + 3 * ((value >> shift) & 1)
+                node = (data[offset] << 16) | (data[offset + 1] << 8) | data[offset + 2]
+            return node
+        read_node = self._read_node
+        for shift in range(bits - 1, -1, -1):
+            if node >= node_count:
+                break
+            node = read_node(node, (value >> shift) & 1)
+        return node
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """کد کشور یک IP یا None"""
+        try:
+            version, value = ip_to_int(ip)
+        except ValueError:
+            return None
+        record = self._record_for(version, value)
+        if record <= self.node_count:
+            return None
+        return self._country_at(record)
+
+    def _nodes(self):
+        """آرایه‌های numpy رکورد چپ و راست همه گره‌ها (یک بار، برای جستجوی دسته‌ای)"""
+        if self._node_arrays is None:
+            raw = np.frombuffer(self._map, dtype=np.uint8, count=self.node_count * self.node_bytes)
+            raw = raw.reshape(self.node_count, self.node_bytes).astype(np.uint32)
+            if self.record_size == 24:
+                left = (raw[:, 0] << 16) | (raw[:, 1] << 8) | raw[:, 2]
+                right = (raw[:, 3] << 16) | (raw[:, 4] << 8) | raw[:, 5]
+            elif self.record_size == 28:
+                left = ((raw[:, 3] & 0xf0) << 20) | (raw[:, 0] << 16) | (raw[:, 1] << 8) | raw[:, 2]
+                right = ((raw[:, 3] & 0x0f) << 24) | (raw[:, 4] << 16) | (raw[:, 5] << 8) | raw[:, 6]
+            else:
+                left = (raw[:, 0] << 24) | (raw[:, 1] << 16) | (raw[:, 2] << 8) | raw[:, 3]
+                right = (raw[:, 4] << 24) | (raw[:, 5] << 16) | (raw[:, 6] << 8) | raw[:, 7]
+            # ردیف آخر: گره مجازی برای رکوردهای پایانی (خودش را نگه می‌دارد)
+            self._node_arrays = np.stack([np.append(left, 0), np.append(right, 0)])
+        return self._node_arrays
+
+    def lookup_many(self, ips: Sequence[str]) -> List[Optional[str]]:
+        """کشور لیستی از IP ها (IPv4 ها با پیمایش برداری درخت)"""
+        if np is None:
+            return [self.lookup(ip) for ip in ips]
+
+        results: List[Optional[str]] = [None] * len(ips)
+        v4_positions = []
+        packed = []
+        for position, ip in enumerate(ips):
+            try:
+                packed.append(socket.inet_pton(socket.AF_INET, ip))
+                v4_positions.append(position)
+            except (OSError, TypeError):
+                results[position] = self.lookup(ip)
+        if not packed:
+            return results
+
+        values = np.frombuffer(b''.join(packed), dtype='>u4').astype(np.uint32)
+        nodes_table = self._nodes()
+        terminal = self.node_count
+        node = np.full(len(values), self.ipv4_start, dtype=np.int64)
+        if self.ipv4_start < terminal:
+            for shift in range(31, -1, -1):
+                active = node < terminal
+                if not active.any():
+                    break
+                bits = ((values >> np.uint32(shift)) & np.uint32(1)).astype(np.intp)
+                # رکوردهای پایانی به گره مجازی آخر اشاره نمی‌کنند؛ فقط گره‌های فعال جلو می‌روند
+                index = np.where(active, node, terminal)
+                node = np.where(active, nodes_table[bits, index], node)
+
+        for position, record in zip(v4_positions, node.tolist()):
+            if record > terminal:
+                results[position] = self._country_at(record)
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'backend': 'mmdb',
+            'database_type': self.database_type,
+            'node_count': self.node_count,
+            'record_size': self.record_size,
+            'ip_version': self.ip_version,
+            'cached_records': len(self._countries),
+        }
+
+    def close(self):
+        if self._map is not None:
+            self._node_arrays = None
+            try:
+                self._map.close()
+            except BufferError:
+                # آرایه numpy هنوز به صفحات mmap ارجاع دارد؛ با GC بسته می‌شود
+                pass
+            self._file.close()
+            self._map = None
+
+
+def _encode_control(data_type: int, size: int) -> bytes:
+    if data_type > 7:
+        prefix, extended = 0, bytes([data_type - 7])
+    else:
+        prefix, extended = data_type, b''
+    if size < 29:
+        return bytes([(prefix << 5) | size]) + extended
+    if size < 285:
+        return bytes([(prefix << 5) | 29]) + extended + bytes([size - 29])
+    return bytes([(prefix << 5) | 30]) + extended + (size - 285).to_bytes(2, 'big')
+
+
+def _encode_uint(value: int, data_type: int) -> bytes:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, 'big') if value else b''
+    return _encode_control(data_type, len(raw)) + raw
+
+
+def _encode(value: Any) -> bytes:
+    """encode مقدار در قالب بخش داده MMDB (زیرمجموعه لازم برای نوشتن)"""
+    if isinstance(value, str):
+        raw = value.encode('utf-8')
+        return _encode_control(2, len(raw)) + raw
+    if isinstance(value, bool):
+        return _encode_control(14, int(value))
+    if isinstance(value, int):
+        return _encode_uint(value, 5 if value < 1 << 16 else 6 if value < 1 << 32 else 9)
+    if isinstance(value, dict):
+        return _encode_control(7, len(value)) + b''.join(
+            _encode(key) + _encode(item) for key, item in value.items())
+    if isinstance(value, list):
+        return _encode_control(11, len(value)) + b''.join(_encode(item) for item in value)
+    raise TypeError(f'cannot encode {type(value).__name__}')
+
+
+def write_country_mmdb(path: str, ranges: Iterable[Tuple[str, str]],
+                       database_type: str = 'Onix-Country', record_size: Optional[int] = None):
+    """
+    ساخت فایل MMDB کشور (IPv6 با IPv4 در ::/96) از (network یا 'start-end'، کد کشور)
+
+    برای تبدیل CSV رنج‌ها به قالب mmap و تولید پایگاه داده آزمایشی بنچمارک.
+    شبکه دقیق‌تر بر شبکه بزرگ‌تر اولویت دارد و record_size خالی یعنی کوچک‌ترین
+    اندازه کافی (24، 28 یا 32 بیت). فایل با rename اتمیک جایگزین
+    می‌شود تا خواننده‌های mmap فعلی آسیب نبینند.
+    """
+    networks = []
+    for network, country in ranges:
+        if '-' in network:
+            start, end = (ipaddress.ip_address(part.strip()) for part in network.split('-', 1))
+            parts = ipaddress.summarize_address_range(start, end)
+        else:
+            parts = [ipaddress.ip_network(network.strip(), strict=False)]
+        for part in parts:
+            if part.version == 4:
+                bits, length = int(part.network_address), part.prefixlen + 96
+            else:
+                bits, length = int(part.network_address), part.prefixlen
+            networks.append((length, bits >> (128 - length) if length else 0, country.upper()))
+    networks.sort(key=lambda item: item[0])
+
+    # گره‌ها: [چپ، راست]؛ مقدار int = اندیس گره، str = کشور، None = خالی
+    nodes: List[list] = [[None, None]]
+    for length, prefix, country in networks:
+        node = 0
+        for depth in range(length):
+            bit = (prefix >> (length - 1 - depth)) & 1
+            if depth == length - 1:
+                nodes[node][bit] = country
+                break
+            child = nodes[node][bit]
+            if not isinstance(child, int):
+                nodes.append([child, child])
+                child = nodes[node][bit] = len(nodes) - 1
+            node = child
+
+    countries = sorted({country for _, _, country in networks})
+    data_section = b''
+    data_offsets = {}
+    for country in countries:
+        data_offsets[country] = len(data_section)
+        data_section += _encode({'country': {'iso_code': country}})
+
+    node_count = len(nodes)
+    max_record = node_count + DATA_SECTION_SEPARATOR + len(data_section)
+    if record_size is None:
+        record_size = 24 if max_record < 1 << 24 else 28 if max_record < 1 << 28 else 32
+
+    def record(value) -> int:
+        if value is None:
+            return node_count
+        if isinstance(value, int):
+            return value
+        return node_count + DATA_SECTION_SEPARATOR + data_offsets[value]
+
+    tree = bytearray()
+    for left, right in nodes:
+        left, right = record(left), record(right)
+        if record_size == 24:
+            tree += left.to_bytes(3, 'big') + right.to_bytes(3, 'big')
+        elif record_size == 28:
+            tree += (left & 0xffffff).to_bytes(3, 'big') + \
+                bytes([((left >> 24) << 4) | (right >> 24)]) + (right & 0xffffff).to_bytes(3, 'big')
+        else:
+            tree += left.to_bytes(4, 'big') + right.to_bytes(4, 'big')
+
+    # نوع عددی فیلدهای metadata در مشخصات MMDB ثابت است
+    metadata = (_encode_control(7, 9) +
+                _encode('binary_format_major_version') + _encode_uint(2, 5) +
+                _encode('binary_format_minor_version') + _encode_uint(0, 5) +
+                _encode('build_epoch') + _encode_uint(int(time.time()), 9) +
+                _encode('database_type') + _encode(database_type) +
+                _encode('description') + _encode({'en': 'Onix V2Ray Collector country ranges'}) +
+                _encode('ip_version') + _encode_uint(6, 5) +
+                _encode('languages') + _encode(['en']) +
+                _encode('node_count') + _encode_uint(node_count, 6) +
+                _encode('record_size') + _encode_uint(record_size, 5))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(bytes(tree))
+        f.write(bytes(DATA_SECTION_SEPARATOR))
+        f.write(data_section)
+        f.write(METADATA_MARKER)
+        f.write(metadata)
+    os.replace(temp_path, path)
+
+
+class GeoDatabase:
+    """
+    backend قابل تعویض IP به کشور با بارگذاری مجدد هنگام جایگزینی فایل
+
+    فایل .mmdb با MMDBReader (mmap) و هر فایل دیگر به عنوان CSV رنج‌ها با
+    IPRangeIndex خوانده می‌شود. هر reload_interval ثانیه یک stat ارزان بررسی
+    می‌کند که فایل جایگزین شده (inode، اندازه یا mtime) یا نه؛ در این صورت
+    پایگاه داده جدید باز و بدون وقفه جایگزین نسخه قبلی می‌شود. فایل باید
+    اتمیک (نوشتن در فایل موقت و rename) جایگزین شود. اگر فایل وجود نداشته
+    باشد lookup ها None برمی‌گردانند تا فایل ایجاد شود.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_RANGES_FILE, reload_interval: float = 30.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.backend = None
+        self._signature = None
+        self._next_check = 0.0
+        self.stats = {'reloads': 0, 'load_time_ms': 0.0}
+        if path:
+            self._load()
+
+    def _file_signature(self):
+        try:
+            info = os.stat(self.path)
+        except OSError:
+            return None
+        return info.st_ino, info.st_size, info.st_mtime_ns
+
+    def _open_backend(self, path: str):
+        if path.lower().endswith('.mmdb'):
+            return MMDBReader(path)
+        return IPRangeIndex(path)
+
+    def _load(self) -> bool:
+        signature = self._file_signature()
+        if signature is None:
+            logger.warning(
+                f"⚠️ پایگاه داده GeoIP پیدا نشد: {self.path} - کشور IP ها نامشخص می‌ماند "
+                f"(geoip_database را به فایل .mmdb یا CSV رنج‌ها تنظیم کنید)")
+            self._signature = None
+            return False
+        start_time = time.perf_counter()
+        try:
+            backend = self._open_backend(self.path)
+        except (OSError, MMDBFormatError, KeyError) as e:
+            logger.error(f"❌ خطا در بارگذاری پایگاه داده GeoIP {self.path}: {e}")
+            self._signature = signature
+            return False
+
+        previous, self.backend = self.backend, backend
+        self._signature = signature
+        self.stats['load_time_ms'] = round((time.perf_counter() - start_time) * 1000, 2)
+        if previous is not None:
+            self.stats['reloads'] += 1
+            if hasattr(previous, 'close'):
+                previous.close()
+            logger.info(f"🔄 پایگاه داده GeoIP بارگذاری مجدد شد ({self.stats['load_time_ms']}ms)")
+        else:
+            logger.info(f"🗺️ پایگاه داده GeoIP: {self.path} ({self.stats['load_time_ms']}ms)")
+        return True
+
+    def check_reload(self, force: bool = False) -> bool:
+        """بارگذاری مجدد اگر فایل جایگزین شده باشد (حداکثر هر reload_interval ثانیه)"""
+        if not self.path:
+            return False
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return False
+        return self._load()
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """کد کشور یک IP یا None"""
+        self.check_reload()
+        if self.backend is None:
+            return None
+        return self.backend.lookup(ip)
+
+    def lookup_many(self, ips: Sequence[str]) -> List[Optional[str]]:
+        """کد کشور لیستی از IP ها به همان ترتیب"""
+        self.check_reload()
+        if self.backend is None:
+            return [None] * len(ips)
+        return self.backend.lookup_many(ips)
+
+    def get_stats(self) -> Dict[str, Any]:
+        backend_stats = self.backend.get_stats() if self.backend is not None else {}
+        return {'path': self.path, **self.stats, **backend_stats}
+
+    def close(self):
+        if self.backend is not None and hasattr(self.backend, 'close'):
+            self.backend.close()
+        self.backend = None
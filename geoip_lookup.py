@@ -8,16 +8,23 @@ GeoIP Lookup Module
 import re
 import socket
 import logging
-from typing import Optional
+from typing import List, Optional, Sequence
 from functools import lru_cache
 
+from geo_database import GeoDatabase
+from ip_range_index import DEFAULT_RANGES_FILE, ip_to_int
+
 logger = logging.getLogger(__name__)
 
 
 class GeoIPLookup:
     """کلاس برای lookup کشور از IP یا دامنه"""
 
-    def __init__(self):
+    def __init__(self, resolver=None, database_file: Optional[str] = DEFAULT_RANGES_FILE,
+                 reload_interval: float = 30.0):
+        # resolver مشترک (AsyncDNSResolver) برای تبدیل دامنه به IP از روی کش
+        self.resolver = resolver
+
         # نقشه دامنه‌های ملی به کد کشور
         self.domain_to_country = {
             '.ir': 'IR',  # ایران
@@ -45,64 +52,8 @@ class GeoIPLookup:
             '.ch': 'CH',  # سوئیس
         }
 
-        # نقشه رنج‌های IP به کشور (ساده‌سازی شده)
-        self.ip_ranges = {
-            # Cloudflare IPs (معمولاً US)
-            '104.': 'US',
-            '172.': 'US',
-            '198.': 'US',
-            '205.': 'US',
-            '216.': 'US',
-            
-            # Digital Ocean (US, NL, SG, DE)
-            '159.': 'NL',
-            '165.': 'SG',
-            '167.': 'US',
-            '178.': 'DE',
-            '154.': 'US',
-            
-            # Hetzner (DE)
-            '78.': 'DE',
-            '88.': 'DE',
-            '95.': 'DE',
-            
-            # OVH (FR, CA)
-            '51.': 'FR',
-            '54.': 'CA',
-            
-            # Linode & US ranges
-            '45.': 'US',
-            '66.': 'US',
-            '192.': 'US',
-            '193.': 'EU',
-            '194.': 'EU',
-            '195.': 'EU',
-            
-            # ایران
-            '2.': 'IR',
-            '5.': 'IR',
-            '31.': 'IR',
-            '37.': 'IR',
-            '46.': 'IR',
-            '79.': 'IR',
-            '80.': 'IR',
-            '81.': 'IR',
-            '82.': 'IR',
-            '83.': 'IR',
-            '84.': 'IR',
-            '85.': 'IR',
-            '86.': 'IR',
-            '87.': 'IR',
-            '89.': 'IR',
-            '91.': 'IR',
-            '92.': 'IR',
-            '93.': 'IR',
-            '94.': 'IR',
-            '95.': 'IR',
-            '151.': 'IR',
-            '176.': 'IR',
-            '185.': 'IR',
-        }
+        # پایگاه داده آفلاین IP به کشور (MMDB روی mmap یا CSV رنج‌ها، با reload خودکار)
+        self.database = GeoDatabase(database_file, reload_interval=reload_interval)
 
     @lru_cache(maxsize=1000)
     def get_country_from_domain(self, domain: str) -> Optional[str]:
@@ -142,37 +93,20 @@ class GeoIPLookup:
 
         return None
 
-    @lru_cache(maxsize=1000)
     def get_country_from_ip(self, ip: str) -> Optional[str]:
-        """استخراج کشور از IP با استفاده از رنج‌های ساده"""
-        try:
-            # بررسی اینکه آیا IP معتبر است
-            if not self._is_valid_ip(ip):
-                return None
+        """استخراج کشور از IP (IPv4 یا IPv6) از پایگاه داده محلی"""
+        return self.database.lookup(ip)
 
-            # بررسی رنج‌های شناخته شده
-            for prefix, country in self.ip_ranges.items():
-                if ip.startswith(prefix):
-                    return country
-
-            # اگر هیچ کدام نبود، Unknown
-            return None
-
-        except Exception as e:
-            logger.debug(f"خطا در استخراج کشور از IP {ip}: {e}")
-            return None
+    def get_countries_from_ips(self, ips: Sequence[str]) -> List[Optional[str]]:
+        """استخراج کشور لیستی از IP ها با یک جستجوی برداری"""
+        return self.database.lookup_many(ips)
 
     def _is_valid_ip(self, ip: str) -> bool:
-        """بررسی اعتبار IP"""
+        """بررسی اعتبار IP (IPv4 یا IPv6)"""
         try:
-            parts = ip.split('.')
-            if len(parts) != 4:
-                return False
-            for part in parts:
-                if not 0 <= int(part) <= 255:
-                    return False
+            ip_to_int(ip)
             return True
-        except:
+        except ValueError:
             return False
 
     def get_country(self, address: str) -> Optional[str]:
@@ -186,12 +120,50 @@ class GeoIPLookup:
                 return self.get_country_from_ip(address)
 
             # اگر دامنه است
-            return self.get_country_from_domain(address)
+            country = self.get_country_from_domain(address)
+            if country:
+                return country
+
+            # استفاده از IP resolve شده (فقط از کش، بدون lookup شبکه)
+            if self.resolver:
+                ip = self.resolver.get_cached(address)
+                if ip:
+                    return self.get_country_from_ip(ip)
+
+            return None
 
         except Exception as e:
             logger.debug(f"خطا در استخراج کشور از {address}: {e}")
             return None
 
+    def get_countries(self, addresses: Sequence[str]) -> List[Optional[str]]:
+        """
+        استخراج کشور لیستی از آدرس‌ها با همان قواعد get_country
+
+        IP ها (مستقیم یا resolve شده از کش) با یک جستجوی دسته‌ای پیدا می‌شوند.
+        """
+        results: List[Optional[str]] = [None] * len(addresses)
+        positions = []
+        ips = []
+        for position, address in enumerate(addresses):
+            if not address:
+                continue
+            if self._is_valid_ip(address):
+                ip = address
+            else:
+                results[position] = self.get_country_from_domain(address)
+                if results[position] or not self.resolver:
+                    continue
+                ip = self.resolver.get_cached(address)
+                if not ip:
+                    continue
+            positions.append(position)
+            ips.append(ip.strip('[]'))
+
+        for position, country in zip(positions, self.get_countries_from_ips(ips)):
+            results[position] = country
+        return results
+
 
 # نمونه استفاده
 if __name__ == '__main__':
@@ -203,6 +175,7 @@ if __name__ == '__main__':
         '89.44.242.222',   # ایران
         '185.143.233.120',  # ایران
         '45.85.118.234',   # US
+        '2001:db8::1',     # IPv6
     ]
 
     print('🧪 تست IP ها:')
@@ -13,6 +13,8 @@ from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 
+from http_client import SharedHTTPClient
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -28,7 +30,9 @@ class HealthStatus:
 class HealthMonitor:
     """نظارت بر سلامت سیستم"""
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[SharedHTTPClient] = None):
+        # session HTTP مشترک با collector (در صورت عدم ارسال، نمونه مستقل)
+        self.http_client = http_client or SharedHTTPClient()
         self.health_checks: Dict[str, callable] = {}
         self.last_health_report: Dict[str, HealthStatus] = {}
         self.health_history: List[HealthStatus] = []
@@ -54,31 +58,30 @@ class HealthMonitor:
         start_time = time.time()
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    "https://api.github.com", 
-                    timeout=10
-                ) as response:
-                    response_time = (time.time() - start_time) * 1000
-                    
-                    if response.status == 200:
-                        return HealthStatus(
-                            component="github_connectivity",
-                            status="healthy",
-                            message="GitHub API accessible",
-                            timestamp=time.time(),
-                            response_time=response_time,
-                            details={"status_code": response.status}
-                        )
-                    else:
-                        return HealthStatus(
-                            component="github_connectivity",
-                            status="warning",
-                            message=f"GitHub API returned {response.status}",
-                            timestamp=time.time(),
-                            response_time=response_time,
-                            details={"status_code": response.status}
-                        )
+            async with self.http_client.get(
+                "https://api.github.com", 
+                timeout=10
+            ) as response:
+                response_time = (time.time() - start_time) * 1000
+                
+                if response.status == 200:
+                    return HealthStatus(
+                        component="github_connectivity",
+                        status="healthy",
+                        message="GitHub API accessible",
+                        timestamp=time.time(),
+                        response_time=response_time,
+                        details={"status_code": response.status}
+                    )
+                else:
+                    return HealthStatus(
+                        component="github_connectivity",
+                        status="warning",
+                        message=f"GitHub API returned {response.status}",
+                        timestamp=time.time(),
+                        response_time=response_time,
+                        details={"status_code": response.status}
+                    )
         
         except asyncio.TimeoutError:
             return HealthStatus(
@@ -106,14 +109,13 @@ class HealthMonitor:
         accessible_sources = 0
         
         try:
-            async with aiohttp.ClientSession() as session:
-                for source_url in collector.config_sources[:5]:  # تست 5 منبع اول
-                    try:
-                        async with session.get(source_url, timeout=5) as response:
-                            if response.status == 200:
-                                accessible_sources += 1
-                    except:
-                        pass
+            for source_url in collector.config_sources[:5]:  # تست 5 منبع اول
+                try:
+                    async with self.http_client.get(source_url, timeout=5) as response:
+                        if response.status == 200:
+                            accessible_sources += 1
+                except:
+                    pass
             
             accessibility_rate = (accessible_sources / min(5, total_sources)) * 100
             
@@ -375,6 +377,8 @@ async def main():
     summary = monitor.get_health_summary()
     print(f"Overall Status: {summary['overall_status'].upper()}")
     print(f"Statistics: {summary['statistics']}")
+    
+    await monitor.http_client.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
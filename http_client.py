@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared HTTP Client
+لایه HTTP مشترک با keep-alive، محدودیت اتصال به ازای هر host و کش DNS
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# فشرده‌سازی brotli فقط در صورت نصب بودن decoder آن درخواست می‌شود
+try:
+    import brotli  # noqa: F401
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+
+ACCEPT_ENCODING = "gzip, deflate, br" if BROTLI_AVAILABLE else "gzip, deflate"
+
+
+class SharedHTTPClient:
+    """
+    یک ClientSession مشترک برای تمام دریافت‌های HTTP یک collector
+
+    اتصال‌ها بین منابع هم‌host (مثل raw.githubusercontent.com) دوباره استفاده
+    می‌شوند. session به event loop جاری وابسته است و در صورت تغییر loop
+    دوباره ساخته می‌شود؛ session و connector قبلی پیش از آن بسته یا جدا می‌شوند.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 8,
+                 dns_cache_ttl: int = 300, keepalive_timeout: float = 30.0,
+                 timeout: float = 30.0, user_agent: str = "V2Ray-Collector"):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {
+            'requests': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0,
+            'stale_sessions_released': 0,
+        }
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """ثبت رویدادهای connector برای آمار pool"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.stats['requests'] += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.stats['connections_created'] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.stats['connections_reused'] += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            self.stats['dns_cache_hits'] += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            self.stats['dns_cache_misses'] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """ClientSession متعلق به event loop جاری"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._release_stale_session()
+            self._connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(
+                connector=self._connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={'Accept-Encoding': ACCEPT_ENCODING,
+                         'User-Agent': self.user_agent},
+                trace_configs=[self._build_trace_config()])
+            self._loop = loop
+        return self._session
+
+    def _release_stale_session(self):
+        """
+        رها کردن session ساخته شده روی loop دیگر
+
+        اگر loop قبلی هنوز (در thread دیگری) اجرا می‌شود، بستن session در همان
+        loop زمان‌بندی می‌شود؛ در غیر این صورت اتصال‌های pool بسته و connector از
+        session جدا می‌شود (بستن async روی loop متوقف شده ممکن نیست). سوکت‌های
+        loop بسته شده فقط با GC آزاد می‌شوند، پس صاحب loop بهتر است close را پیش
+        از پایان آن صدا بزند.
+        """
+        session, connector, loop = self._session, self._connector, self._loop
+        self._session = None
+        self._connector = None
+        self._loop = None
+        if session is None or session.closed:
+            return
+
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        if connector is not None:
+            try:
+                # بستن همزمان transport ها (بدون انتظار برای waiter های loop قبلی)
+                connector._close()
+            except Exception as e:
+                logger.debug(f"Could not close stale HTTP connector: {e}")
+        session.detach()
+        self.stats['stale_sessions_released'] += 1
+
+    def get(self, url: str, **kwargs):
+        """درخواست GET روی session مشترک (استفاده با async with)"""
+        return self.session.get(url, **kwargs)
+
+    def head(self, url: str, **kwargs):
+        """درخواست HEAD روی session مشترک (استفاده با async with)"""
+        return self.session.head(url, **kwargs)
+
+    def open_connections(self) -> int:
+        """تعداد اتصال‌های باز (فعال + idle در pool)"""
+        connector = self._connector
+        if connector is None or connector.closed:
+            return 0
+        idle = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+        return idle + len(getattr(connector, '_acquired', ()))
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """آمار pool اتصال (نسبت استفاده مجدد و اتصال‌های باز)"""
+        connections = self.stats['connections_created'] + self.stats['connections_reused']
+        reuse_ratio = self.stats['connections_reused'] / connections if connections else 0.0
+
+        return {
+            **self.stats,
+            'reuse_ratio': round(reuse_ratio, 3),
+            'open_connections': self.open_connections(),
+            'limit': self.limit,
+            'limit_per_host': self.limit_per_host,
+            'accept_encoding': ACCEPT_ENCODING,
+        }
+
+    async def close(self):
+        """بستن session و تمام اتصال‌های pool"""
+        session = self._session
+        self._session = None
+        self._connector = None
+        self._loop = None
+        if session is not None and not session.closed:
+            try:
+                await session.close()
+            except RuntimeError as e:
+                # session روی loop دیگری ساخته شده بود
+                logger.debug(f"Could not close HTTP session: {e}")
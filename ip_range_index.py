@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IP Range Index
+فهرست رنج‌های IP به کشور با آرایه‌های مرتب عدد صحیح و جستجوی دودویی (IPv4 و IPv6)
+"""
+
+import bisect
+import csv
+import logging
+import os
+import socket
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# مسیر پیش‌فرض CSV رنج‌ها (کنار ماژول، مستقل از working directory). هیچ
+# داده‌ای همراه پروژه منتشر نمی‌شود: بدون این فایل یا geoip_database کشور IP ها
+# نامشخص می‌ماند. CSV کامل DB-IP / IP2Location lite (country) را اینجا قرار دهید.
+DEFAULT_RANGES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                   'data', 'ip_ranges.csv')
+
+Range = Tuple[int, int, str]
+
+
+def ip_to_int(ip: str) -> Tuple[int, int]:
+    """(نسخه IP، مقدار عدد صحیح) - برای رشته نامعتبر ValueError"""
+    ip = ip.strip().strip('[]')
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+    except OSError:
+        pass
+    try:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip.split('%', 1)[0]), 'big')
+    except OSError:
+        raise ValueError(f'invalid IP address: {ip!r}')
+
+
+def _parse_bound(value: str) -> Tuple[int, int]:
+    """مرز رنج به صورت IP یا عدد صحیح (مانند CSV های IP2Location)"""
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return (4 if number < 1 << 32 else 6), number
+    return ip_to_int(value)
+
+
+def _parse_network(network: str) -> Tuple[int, int, int]:
+    """(نسخه، ابتدا، انتها) یک شبکه CIDR بدون ساختن شیء ipaddress"""
+    address, _, prefix = network.strip().partition('/')
+    version, value = ip_to_int(address)
+    bits = 32 if version == 4 else 128
+    prefix_length = int(prefix) if prefix else bits
+    if not 0 <= prefix_length <= bits:
+        raise ValueError(f'invalid prefix length: {network!r}')
+    host_mask = (1 << (bits - prefix_length)) - 1
+    return version, value & ~host_mask, value | host_mask
+
+
+def flatten_ranges(ranges: Iterable[Range]) -> List[Range]:
+    """
+    تبدیل رنج‌های هم‌پوشان به رنج‌های جدا از هم با اولویت رنج دقیق‌تر
+
+    رنج کوچک‌تر داخل رنج بزرگ‌تر برنده است (مانند longest-prefix match) و
+    برای رنج‌های یکسان، آخرین رنج فایل. رنج‌های مجاور هم‌کشور ادغام می‌شوند.
+    """
+    ordered = sorted(enumerate(ranges), key=lambda item: (item[1][0], -item[1][1], item[0]))
+    segments: List[Range] = []
+
+    def emit(start: int, end: int, country: str):
+        if start > end:
+            return
+        if segments and segments[-1][2] == country and segments[-1][1] + 1 == start:
+            segments[-1] = (segments[-1][0], end, country)
+        else:
+            segments.append((start, end, country))
+
+    stack: List[Tuple[int, str]] = []  # (انتهای رنج، کشور) رنج‌های باز
+    position = 0
+    for _, (start, end, country) in ordered:
+        while stack and stack[-1][0] < start:
+            top_end, top_country = stack.pop()
+            emit(position, top_end, top_country)
+            position = max(position, top_end + 1)
+        if stack:
+            emit(position, start - 1, stack[-1][1])
+        position = start
+        stack.append((end, country))
+    while stack:
+        top_end, top_country = stack.pop()
+        emit(position, top_end, top_country)
+        position = max(position, top_end + 1)
+    return segments
+
+
+class _RangeTable:
+    """جدول رنج‌های جدا از هم یک نسخه IP"""
+
+    def __init__(self, segments: Sequence[Range], typecode: Optional[str]):
+        if typecode:
+            # آرایه فشرده که numpy بدون کپی روی آن جستجوی دسته‌ای انجام می‌دهد
+            self.starts = array(typecode, (start for start, _, _ in segments))
+            self.ends = array(typecode, (end for _, end, _ in segments))
+        else:
+            self.starts = [start for start, _, _ in segments]
+            self.ends = [end for _, end, _ in segments]
+        codes: Dict[str, int] = {}
+        self.country_index = array('H', (codes.setdefault(country, len(codes))
+                                         for _, _, country in segments))
+        self.countries = list(codes)
+
+    def lookup(self, value: int) -> Optional[str]:
+        index = bisect.bisect_right(self.starts, value) - 1
+        if index >= 0 and value <= self.ends[index]:
+            return self.countries[self.country_index[index]]
+        return None
+
+
+class IPRangeIndex:
+    """
+    نگاشت IP به کشور با رنج‌های CIDR یا start-end از فایل محلی
+
+    رنج‌ها هنگام بارگذاری مسطح و مرتب می‌شوند؛ هر lookup یک جستجوی دودویی
+    O(log n) است و lookup_many آدرس‌های IPv4 را با numpy.searchsorted یکجا
+    پیدا می‌کند.
+
+    قالب فایل (CSV، خطوط خالی و # نادیده گرفته می‌شوند):
+        network,country            مثل 104.16.0.0/13,US یا 2a01:4f8::/32,DE
+        start,end,country          IP یا عدد صحیح (قالب DB-IP / IP2Location lite)
+    """
+
+    def __init__(self, ranges_file: Optional[str] = DEFAULT_RANGES_FILE):
+        self.ranges_file = ranges_file
+        self._v4 = _RangeTable([], 'L' if array('L').itemsize == 4 else 'I')
+        self._v6 = _RangeTable([], None)
+        self.stats = {'lookups': 0, 'found': 0}
+        if ranges_file:
+            self.load(ranges_file)
+
+    @staticmethod
+    def read_ranges(path: str) -> Tuple[List[Range], List[Range]]:
+        """خواندن رنج‌های IPv4 و IPv6 از فایل CSV"""
+        v4: List[Range] = []
+        v6: List[Range] = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, row in enumerate(csv.reader(f), 1):
+                if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                    continue
+                try:
+                    if len(row) == 2:
+                        version, start, end = _parse_network(row[0])
+                    else:
+                        version, start = _parse_bound(row[0])
+                        _, end = _parse_bound(row[1])
+                    country = row[-1].strip().upper()
+                except ValueError:
+                    logger.debug(f"خط نامعتبر {line_number} در {path}: {row}")
+                    continue
+                if country in ('', '-', 'ZZ'):
+                    continue
+                (v4 if version == 4 else v6).append((start, end, country))
+        return v4, v6
+
+    def load(self, path: str):
+        """بارگذاری (یا جایگزینی) رنج‌ها از فایل"""
+        try:
+            v4, v6 = self.read_ranges(path)
+        except OSError as e:
+            logger.warning(f"⚠️ فایل رنج‌های IP قابل خواندن نیست ({path}): {e}")
+            return
+        self.load_ranges(v4, v6)
+        logger.info(f"🗺️ {self.range_count()} رنج IP از {path} بارگذاری شد")
+
+    def load_ranges(self, v4: Iterable[Range] = (), v6: Iterable[Range] = ()):
+        """بارگذاری رنج‌ها از (start، end، country) های عدد صحیح"""
+        self._v4 = _RangeTable(flatten_ranges(v4), self._v4.starts.typecode)
+        self._v6 = _RangeTable(flatten_ranges(v6), None)
+
+    def range_count(self) -> int:
+        """تعداد رنج‌های جدا از هم پس از مسطح‌سازی"""
+        return len(self._v4.starts) + len(self._v6.starts)
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """کشور یک IP یا None (برای رشته نامعتبر هم None)"""
+        self.stats['lookups'] += 1
+        try:
+            version, value = ip_to_int(ip)
+        except ValueError:
+            return None
+        country = (self._v4 if version == 4 else self._v6).lookup(value)
+        if country:
+            self.stats['found'] += 1
+        return country
+
+    def lookup_ipv4_array(self, values) -> Any:
+        """
+        جستجوی دسته‌ای آرایه عدد صحیح IPv4 (uint32)
+
+        خروجی آرایه object کد کشورها (None برای ناشناخته) هم‌طول ورودی است
+        (بدون numpy یک لیست).
+        """
+        table = self._v4
+        if np is None:
+            return [table.lookup(int(value)) for value in values]
+        values = np.asarray(values, dtype=np.uint32)
+        starts = np.frombuffer(table.starts, dtype=np.uint32)
+        ends = np.frombuffer(table.ends, dtype=np.uint32)
+        codes = np.array(table.countries + [None], dtype=object)
+        if not len(starts):
+            return codes[np.zeros(len(values), dtype=np.intp)]
+
+        positions = np.searchsorted(starts, values, side='right') - 1
+        clipped = np.maximum(positions, 0)
+        found = (positions >= 0) & (values <= ends[clipped])
+        country_index = np.frombuffer(table.country_index, dtype=np.uint16)[clipped].astype(np.intp)
+        country_index[~found] = len(table.countries)
+        self.stats['lookups'] += len(values)
+        self.stats['found'] += int(found.sum())
+        return codes[country_index]
+
+    def lookup_many(self, ips: Sequence[str]) -> List[Optional[str]]:
+        """کشور لیستی از IP ها به همان ترتیب (IPv4 ها با یک جستجوی برداری)"""
+        if np is None:
+            return [self.lookup(ip) for ip in ips]
+
+        results: List[Optional[str]] = [None] * len(ips)
+        v4_positions = []
+        packed = []
+        for position, ip in enumerate(ips):
+            try:
+                packed.append(socket.inet_pton(socket.AF_INET, ip))
+                v4_positions.append(position)
+            except (OSError, TypeError):
+                results[position] = self.lookup(ip)
+
+        if packed:
+            values = np.frombuffer(b''.join(packed), dtype='>u4')
+            for position, country in zip(v4_positions, self.lookup_ipv4_array(values).tolist()):
+                results[position] = country
+        return results
+
+    def reset_stats(self):
+        self.stats = {'lookups': 0, 'found': 0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'ipv4_ranges': len(self._v4.starts),
+            'ipv6_ranges': len(self._v6.starts),
+        }
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Latency Statistics
+خلاصه آماری چند نمونه تأخیر (میانه، p90، jitter و نرخ loss)
+"""
+
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+# فیلدهای آماری V2RayConfig که از نماینده endpoint به اعضای گروه کپی می‌شوند
+LATENCY_STAT_FIELDS = ('latency_p90', 'jitter', 'loss_rate', 'latency_samples',
+                       'tls_handshake_latency')
+
+
+@dataclass
+class LatencyStats:
+    """خلاصه نمونه‌های تأخیر یک endpoint (میلی‌ثانیه)"""
+    median: float = 0.0
+    p90: float = 0.0
+    jitter: float = 0.0
+    loss_rate: float = 0.0
+    samples: int = 0
+
+
+def summarize_samples(samples: Sequence[Optional[float]]) -> LatencyStats:
+    """
+    خلاصه نمونه‌ها به ترتیب شروع (None = اتصال ناموفق)
+
+    jitter میانگین قدر مطلق اختلاف نمونه‌های موفق متوالی است (مانند RFC 3550)
+    و p90 با روش nearest-rank محاسبه می‌شود.
+    """
+    attempted = len(samples)
+    succeeded = [sample for sample in samples if sample is not None]
+    if not succeeded:
+        return LatencyStats(loss_rate=1.0 if attempted else 0.0, samples=attempted)
+
+    ordered = sorted(succeeded)
+    count = len(ordered)
+    middle = count // 2
+    median = ordered[middle] if count % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+    p90 = ordered[min(count - 1, max(0, -(-9 * count // 10) - 1))]
+    jitter = sum(abs(b - a) for a, b in zip(succeeded, succeeded[1:])) / (count - 1) \
+        if count > 1 else 0.0
+
+    return LatencyStats(median, p90, jitter, 1.0 - count / attempted, attempted)
+
+
+def apply_latency_stats(config: Any, stats: LatencyStats):
+    """ثبت خلاصه نمونه‌ها روی کانفیگ (latency = میانه)"""
+    config.latency = stats.median
+    config.latency_p90 = stats.p90
+    config.jitter = stats.jitter
+    config.loss_rate = stats.loss_rate
+    config.latency_samples = stats.samples
+
+
+def copy_latency_stats(source: Any, target: Any):
+    """کپی آمار تأخیر نماینده endpoint به یک کانفیگ دیگر همان endpoint"""
+    for name in LATENCY_STAT_FIELDS:
+        setattr(target, name, getattr(source, name))
+
+
+def latency_sort_key(config: Any) -> float:
+    """
+    کلید مرتب‌سازی مقاوم: میانه تأخیر تقسیم بر نرخ موفقیت اتصال
+
+    یعنی زمان مورد انتظار تا یک اتصال موفق؛ کانفیگ بدون تأخیر آخر قرار می‌گیرد.
+    """
+    if not config.latency:
+        return float('inf')
+    return config.latency / max(0.01, 1.0 - config.loss_rate)
@@ -8,7 +8,7 @@ Performance Monitoring System
 import time
 import logging
 from functools import wraps
-from typing import Callable, Dict, List
+from typing import Any, Callable, Dict, List
 import json
 from datetime import datetime
 from collections import defaultdict
@@ -20,6 +20,7 @@ class PerformanceMonitor:
     
     def __init__(self):
         self.metrics = defaultdict(list)
+        self.pool_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
         self.logger = logging.getLogger(__name__)
     
     def measure_time(self, operation_name: str = None):
@@ -133,9 +134,32 @@ class PerformanceMonitor:
             'success_rate': (successes / len(metrics)) * 100
         }
     
+    def register_pool(self, name: str, stats_provider: Callable[[], Dict[str, Any]]):
+        """
+        ثبت یک connection pool برای نظارت
+
+        Args:
+            name: نام pool
+            stats_provider: تابعی که آمار لحظه‌ای pool را برمی‌گرداند
+        """
+        self.pool_providers[name] = stats_provider
+
+    def get_pool_statistics(self) -> Dict:
+        """دریافت آمار لحظه‌ای connection pool های ثبت شده"""
+        stats = {}
+        for name, provider in self.pool_providers.items():
+            try:
+                stats[name] = provider()
+            except Exception as e:
+                self.logger.debug(f"Pool stats error for {name}: {e}")
+        return stats
+
     def export_metrics(self, filename: str = 'performance_metrics.json'):
         """Export metrics به فایل"""
         stats = self.get_statistics()
+        pool_stats = self.get_pool_statistics()
+        if pool_stats:
+            stats['connection_pools'] = pool_stats
         
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(stats, f, indent=2, ensure_ascii=False)
@@ -158,6 +182,11 @@ class PerformanceMonitor:
             print(f"   Max Duration: {data['max_duration']:.2f}s")
             print(f"   Success Rate: {data['success_rate']:.1f}%")
         
+        for name, data in self.get_pool_statistics().items():
+            print(f"\n🔌 {name} pool:")
+            print(f"   Reuse Ratio: {data.get('reuse_ratio', 0):.1%}")
+            print(f"   Open Connections: {data.get('open_connections', 0)}")
+        
         print("\n" + "="*80)
     
     def clear_metrics(self):
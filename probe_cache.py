@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Probe Result Cache
+کش پایدار نتایج تست endpoint ها بین سیکل‌ها با سیاست تازگی
+"""
+
+import json
+import os
+import time
+import logging
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProbeCacheEntry:
+    """آخرین نتیجه تست یک endpoint"""
+    success: bool
+    latency: float = 0.0
+    checked_at: float = 0.0
+    consecutive_failures: int = 0
+
+
+class ProbeResultCache:
+    """
+    مخزن نتایج تست بر اساس کلید نرمال‌شده endpoint
+
+    سیاست: endpoint سالمی که در fresh_ttl ثانیه اخیر تأیید شده دوباره تست
+    نمی‌شود و نتیجه قبلی آن استفاده می‌شود. نتایج ناموفق هیچ‌وقت از کش
+    برگردانده نمی‌شوند و همیشه دوباره تست می‌شوند.
+    """
+
+    def __init__(self, cache_file: str = "cache/probe_results.json",
+                 fresh_ttl: int = 1800, max_age: int = 86400):
+        self.cache_file = cache_file
+        self.fresh_ttl = fresh_ttl
+        self.max_age = max_age
+        self._entries: Dict[str, ProbeCacheEntry] = {}
+        self.stats = {'served': 0, 'executed': 0}
+
+        self._load_from_disk()
+
+    def get(self, key: str) -> Optional[ProbeCacheEntry]:
+        """دریافت ورودی ذخیره شده یک endpoint"""
+        return self._entries.get(key)
+
+    def lookup(self, key: str) -> Optional[Tuple[bool, float]]:
+        """نتیجه قابل استفاده بدون تست (فقط موفق و تازه) یا None"""
+        entry = self._entries.get(key)
+        if entry and entry.success and time.time() - entry.checked_at < self.fresh_ttl:
+            self.stats['served'] += 1
+            return True, entry.latency
+        return None
+
+    def record(self, key: str, success: bool, latency: float):
+        """ثبت نتیجه یک تست واقعی"""
+        previous = self._entries.get(key)
+        failures = 0 if success else (previous.consecutive_failures + 1 if previous else 1)
+        self._entries[key] = ProbeCacheEntry(success, latency, time.time(), failures)
+        self.stats['executed'] += 1
+
+    def reset_stats(self):
+        """پاک کردن آمار سیکل قبلی"""
+        self.stats = {'served': 0, 'executed': 0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """آمار تست‌های سرو شده از کش در برابر تست‌های اجرا شده"""
+        total = self.stats['served'] + self.stats['executed']
+        return {
+            'served_from_cache': self.stats['served'],
+            'executed': self.stats['executed'],
+            'cache_hit_rate': f"{self.stats['served'] / total * 100:.2f}%" if total else "0.00%",
+            'entries': len(self._entries),
+            'fresh_ttl': self.fresh_ttl,
+        }
+
+    def _load_from_disk(self):
+        """بارگذاری نتایج از دیسک (ورودی‌های قدیمی‌تر از max_age حذف می‌شوند)"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            cutoff = time.time() - self.max_age
+            for key, entry_data in data.items():
+                entry = ProbeCacheEntry(**entry_data)
+                if entry.checked_at > cutoff:
+                    self._entries[key] = entry
+
+            logger.info(f"Loaded {len(self._entries)} probe results from disk")
+
+        except Exception as e:
+            logger.error(f"Error loading probe results from disk: {e}")
+
+    def save_to_disk(self):
+        """ذخیره نتایج روی دیسک"""
+        if not self.cache_file:
+            return
+
+        try:
+            directory = os.path.dirname(self.cache_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            cutoff = time.time() - self.max_age
+            data = {key: asdict(entry) for key, entry in self._entries.items()
+                    if entry.checked_at > cutoff}
+
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+
+            logger.info(f"Saved {len(data)} probe results to disk")
+
+        except Exception as e:
+            logger.error(f"Error saving probe results to disk: {e}")
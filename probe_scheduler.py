@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Probe Priority Scheduler
+مرتب‌سازی تست‌ها بر اساس احتمال موفقیت (سابقه endpoint، اعتبار منبع و پروتکل)
+"""
+
+import json
+import os
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from probe_cache import ProbeCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class ProbePriorityScheduler:
+    """
+    زمان‌بند اولویت‌دار تست اتصال
+
+    احتمال موفقیت هر کانفیگ از ترکیب سه سیگنال تخمین زده می‌شود:
+    آخرین نتیجه endpoint (با وزن رو به کاهش بر اساس قدمت)، نرخ موفقیت
+    منبعی که کانفیگ از آن آمده و نرخ موفقیت پروتکل. نرخ‌ها با prior
+    Beta(1, 1) هموار می‌شوند تا منبع یا پروتکل جدید 0.5 در نظر گرفته شود.
+    """
+
+    def __init__(self, stats_file: str = "cache/probe_priority.json",
+                 history_weight: float = 0.6, source_weight: float = 0.25,
+                 protocol_weight: float = 0.15, history_half_life: int = 21600,
+                 decay: float = 0.5):
+        self.stats_file = stats_file
+        self.history_weight = history_weight
+        self.source_weight = source_weight
+        self.protocol_weight = protocol_weight
+        self.history_half_life = history_half_life
+        self.decay = decay
+        # [موفق، تست شده] برای هر منبع و هر پروتکل
+        self._sources: Dict[str, List[float]] = {}
+        self._protocols: Dict[str, List[float]] = {}
+
+        self._load_from_disk()
+
+    @staticmethod
+    def _rate(table: Dict[str, List[float]], key: str) -> float:
+        working, tested = table.get(key, (0.0, 0.0))
+        return (working + 1.0) / (tested + 2.0)
+
+    def source_reliability(self, source: str) -> float:
+        """نرخ موفقیت هموار شده یک منبع"""
+        return self._rate(self._sources, source)
+
+    def predict(self, config: Any, source: str = '',
+                history: Optional[ProbeCacheEntry] = None,
+                now: Optional[float] = None) -> float:
+        """احتمال تخمینی موفقیت تست یک کانفیگ"""
+        prior_weight = self.source_weight + self.protocol_weight
+        prior = (self.source_weight * self._rate(self._sources, source) +
+                 self.protocol_weight * self._rate(self._protocols, config.protocol)) / prior_weight
+        if history is None:
+            return prior
+
+        if history.success:
+            observed = 1.0
+        else:
+            # هر شکست متوالی احتمال موفقیت را کمتر می‌کند
+            observed = 1.0 / (2.0 + history.consecutive_failures)
+        age = max(0.0, (now or time.time()) - history.checked_at)
+        confidence = 0.5 ** (age / self.history_half_life)
+        history_score = confidence * observed + (1.0 - confidence) * prior
+        return self.history_weight * history_score + (1.0 - self.history_weight) * prior
+
+    def rank(self, configs: Sequence[Any],
+             history: Callable[[Any], Optional[ProbeCacheEntry]],
+             source_of: Callable[[Any], str]) -> List[Any]:
+        """مرتب‌سازی کانفیگ‌ها از بیشترین به کمترین احتمال موفقیت (پایدار)"""
+        now = time.time()
+        scored = [(self.predict(config, source_of(config), history(config), now), index)
+                  for index, config in enumerate(configs)]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [configs[index] for _, index in scored]
+
+    def record(self, source: str, protocol: str, success: bool):
+        """ثبت نتیجه تست یک کانفیگ برای به‌روزرسانی نرخ منبع و پروتکل"""
+        for table, key in ((self._sources, source), (self._protocols, protocol)):
+            counts = table.get(key)
+            if counts is None:
+                counts = table[key] = [0.0, 0.0]
+            if success:
+                counts[0] += 1.0
+            counts[1] += 1.0
+
+    def start_cycle(self):
+        """کاهش وزن آمار سیکل‌های قبلی تا نرخ‌ها تغییرات اخیر را دنبال کنند"""
+        for table in (self._sources, self._protocols):
+            for counts in table.values():
+                counts[0] *= self.decay
+                counts[1] *= self.decay
+
+    def get_stats(self) -> Dict[str, Any]:
+        """نرخ موفقیت فعلی منابع و پروتکل‌ها"""
+        return {
+            'sources': {source: round(self._rate(self._sources, source), 3)
+                        for source in self._sources},
+            'protocols': {protocol: round(self._rate(self._protocols, protocol), 3)
+                          for protocol in self._protocols},
+        }
+
+    def _load_from_disk(self):
+        """بارگذاری آمار از دیسک"""
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return
+
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            self._sources = {key: list(counts) for key, counts in data.get('sources', {}).items()}
+            self._protocols = {key: list(counts) for key, counts in data.get('protocols', {}).items()}
+
+            logger.info(
+                f"Loaded priority stats for {len(self._sources)} sources from disk")
+
+        except Exception as e:
+            logger.error(f"Error loading probe priority stats from disk: {e}")
+
+    def save_to_disk(self):
+        """ذخیره آمار روی دیسک"""
+        if not self.stats_file:
+            return
+
+        try:
+            directory = os.path.dirname(self.stats_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            data = {'sources': self._sources, 'protocols': self._protocols}
+
+            with open(self.stats_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+
+            logger.info(f"Saved priority stats for {len(self._sources)} sources to disk")
+
+        except Exception as e:
+            logger.error(f"Error saving probe priority stats to disk: {e}")
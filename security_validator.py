@@ -9,7 +9,6 @@ import re
 import logging
 from typing import Optional
 from urllib.parse import urlparse
-import hashlib
 
 logger = logging.getLogger(__name__)
 
@@ -148,10 +147,6 @@ class SecurityValidator:
         
         return tag.strip()
     
-    def generate_config_hash(self, config: str) -> str:
-        """ایجاد hash برای کانفیگ (برای deduplication)"""
-        return hashlib.sha256(config.encode()).hexdigest()
-    
     def is_rate_limited(self, identifier: str, max_requests: int = 100, window: int = 3600) -> bool:
         """
         بررسی Rate Limiting (placeholder)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Seen Config Index
+فهرست پایدار کانفیگ‌های دیده شده (Bloom filter روی فایل mmap) برای تشخیص کانفیگ‌های جدید
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+import logging
+from typing import Any, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b'ONIXBLM1'
+# magic، تعداد hash، نسل فعلی، تعداد بیت هر نسل، ظرفیت، تعداد ورودی دو نسل
+_HEADER = struct.Struct('<8sIIQQQQ')
+_MASK64 = (1 << 64) - 1
+
+
+def bloom_parameters(capacity: int, error_rate: float) -> Tuple[int, int]:
+    """(تعداد بیت، تعداد hash) بهینه برای ظرفیت و نرخ خطای داده شده"""
+    num_bits = max(64, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+    num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+    return num_bits, num_hashes
+
+
+def _hash_pair(key: str) -> Tuple[int, int]:
+    """دو hash مستقل 64 بیتی از کلید (کلید هویت 16 رقمی hex مستقیم استفاده می‌شود)"""
+    if len(key) == 16:
+        try:
+            value = int(key, 16)
+        except ValueError:
+            value = None
+    else:
+        value = None
+    if value is None:
+        value = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value, ((value * 0x9E3779B97F4A7C15) & _MASK64) | 1
+
+
+class SeenConfigIndex:
+    """
+    Bloom filter دو نسلی روی فایل memory-mapped
+
+    هر نسل capacity کلید با نرخ خطای error_rate نگه می‌دارد. وقتی نسل فعلی پر
+    شود، نسل قبلی پاک و جای نسل فعلی را می‌گیرد؛ پس حافظه و فایل اندازه ثابت
+    دارند و حداقل capacity کلید اخیر (و کلیدهایی که در این مدت دوباره دیده
+    شده‌اند) به خاطر سپرده می‌شوند. عضویت و افزودن O(تعداد hash) است.
+    خطای مثبت کاذب یعنی یک کانفیگ جدید به ندرت «دیده شده» حساب می‌شود.
+    """
+
+    def __init__(self, index_file: str = 'cache/seen_configs.bloom',
+                 capacity: int = 2_000_000, error_rate: float = 0.001):
+        self.index_file = index_file
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.num_bits, self.num_hashes = bloom_parameters(self.capacity, error_rate)
+        self.generation_bytes = (self.num_bits + 7) // 8
+        self._file = None
+        self._map = None
+        self.stats = {'new': 0, 'seen': 0, 'rotations': 0}
+
+        self._open()
+
+    def _open(self):
+        directory = os.path.dirname(self.index_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        size = _HEADER.size + 2 * self.generation_bytes
+
+        fresh = True
+        if os.path.exists(self.index_file) and os.path.getsize(self.index_file) == size:
+            with open(self.index_file, 'rb') as f:
+                header = _HEADER.unpack(f.read(_HEADER.size))
+            if header[0] == _MAGIC and header[1] == self.num_hashes and \
+                    header[3] == self.num_bits and header[4] == self.capacity:
+                fresh = False
+            else:
+                logger.warning("⚠️ پارامترهای فهرست کانفیگ‌های دیده شده تغییر کرده - فهرست از نو ساخته می‌شود")
+
+        if fresh:
+            with open(self.index_file, 'wb') as f:
+                f.truncate(size)
+
+        self._file = open(self.index_file, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), size)
+        if fresh:
+            self._write_header(0, 0, 0)
+        logger.info(f"📚 فهرست کانفیگ‌های دیده شده: {self.entry_count()} کلید، {size / 1024 / 1024:.1f}MB")
+
+    def _header(self):
+        return _HEADER.unpack_from(self._map, 0)
+
+    def _write_header(self, current: int, current_count: int, previous_count: int):
+        counts = (current_count, previous_count) if current == 0 else (previous_count, current_count)
+        _HEADER.pack_into(self._map, 0, _MAGIC, self.num_hashes, current,
+                          self.num_bits, self.capacity, *counts)
+
+    def _generation_state(self) -> Tuple[int, int, int]:
+        """(اندیس نسل فعلی، تعداد ورودی نسل فعلی، تعداد ورودی نسل قبلی)"""
+        _, _, current, _, _, count_0, count_1 = self._header()
+        if current == 0:
+            return current, count_0, count_1
+        return current, count_1, count_0
+
+    def _positions(self, key: str):
+        h1, h2 = _hash_pair(key)
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def _contains(self, generation: int, positions) -> bool:
+        data = self._map
+        offset = _HEADER.size + generation * self.generation_bytes
+        for position in positions:
+            if not data[offset + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def _set(self, generation: int, positions):
+        data = self._map
+        offset = _HEADER.size + generation * self.generation_bytes
+        for position in positions:
+            index = offset + (position >> 3)
+            data[index] = data[index] | (1 << (position & 7))
+
+    def _rotate(self, current: int, current_count: int) -> int:
+        """پاک کردن نسل قبلی و تبدیل آن به نسل فعلی"""
+        previous = 1 - current
+        offset = _HEADER.size + previous * self.generation_bytes
+        self._map[offset:offset + self.generation_bytes] = bytes(self.generation_bytes)
+        self._write_header(previous, 0, current_count)
+        self.stats['rotations'] += 1
+        logger.info(f"🔄 چرخش نسل فهرست کانفیگ‌های دیده شده ({current_count} کلید)")
+        return previous
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions(key)
+        return self._contains(0, positions) or self._contains(1, positions)
+
+    def entry_count(self) -> int:
+        """تعداد کلیدهای ثبت شده در دو نسل"""
+        _, current_count, previous_count = self._generation_state()
+        return current_count + previous_count
+
+    def add(self, key: str) -> bool:
+        """
+        ثبت کلید و برگرداندن True اگر قبلاً دیده نشده باشد
+
+        کلیدی که فقط در نسل قبلی است به نسل فعلی هم اضافه می‌شود تا
+        کانفیگ‌های پایدار با چرخش نسل فراموش نشوند.
+        """
+        positions = self._positions(key)
+        current, current_count, previous_count = self._generation_state()
+        if self._contains(current, positions):
+            self.stats['seen'] += 1
+            return False
+
+        is_new = not self._contains(1 - current, positions)
+        if current_count >= self.capacity:
+            current = self._rotate(current, current_count)
+            current_count, previous_count = 0, current_count
+        self._set(current, positions)
+        self._write_header(current, current_count + 1, previous_count)
+        self.stats['new' if is_new else 'seen'] += 1
+        return is_new
+
+    def reset_stats(self):
+        """پاک کردن آمار سیکل قبلی"""
+        self.stats = {'new': 0, 'seen': 0, 'rotations': 0}
+
+    def estimated_false_positive_rate(self) -> float:
+        """نرخ مثبت کاذب تخمینی با پر شدن فعلی دو نسل"""
+        _, current_count, previous_count = self._generation_state()
+
+        def rate(count):
+            return (1 - math.exp(-self.num_hashes * count / self.num_bits)) ** self.num_hashes
+
+        current_rate, previous_rate = rate(current_count), rate(previous_count)
+        return 1 - (1 - current_rate) * (1 - previous_rate)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """آمار سیکل جاری و وضعیت فهرست"""
+        return {
+            **self.stats,
+            'entries': self.entry_count(),
+            'capacity_per_generation': self.capacity,
+            'size_mb': round((_HEADER.size + 2 * self.generation_bytes) / 1024 / 1024, 2),
+            'estimated_false_positive_rate': round(self.estimated_false_positive_rate(), 6),
+        }
+
+    def save_to_disk(self):
+        """flush صفحات تغییر کرده روی دیسک"""
+        if self._map is not None:
+            self._map.flush()
+
+    def close(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+            self._map = None
+            self._file = None
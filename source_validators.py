@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Source Validator Store
+ذخیره validator های HTTP (ETag، Last-Modified، hash محتوا) برای دریافت شرطی منابع
+"""
+
+import hashlib
+import json
+import os
+import time
+import logging
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def content_hasher():
+    """hasher تدریجی برای بدنه‌هایی که به صورت chunk خوانده می‌شوند"""
+    return hashlib.sha256()
+
+
+def content_hash(content: bytes) -> str:
+    """hash محتوای دریافتی برای تشخیص فایل بدون تغییر"""
+    hasher = content_hasher()
+    hasher.update(content)
+    return hasher.hexdigest()
+
+
+def source_file_name(source_url: str) -> str:
+    """نام فایل لیست کانفیگ یک منبع در پوشه configs_dir"""
+    return hashlib.sha256(source_url.encode('utf-8')).hexdigest()[:32] + '.txt'
+
+
+@dataclass
+class SourceValidator:
+    """validator های آخرین دریافت موفق یک منبع (لیست کانفیگ‌ها جدا ذخیره می‌شود)"""
+    etag: str = ""
+    last_modified: str = ""
+    content_hash: str = ""
+    content_length: int = 0
+    config_count: int = 0
+    fetched_at: float = 0.0
+
+
+class SourceValidatorStore:
+    """
+    مخزن پایدار validator های هر منبع
+
+    درخواست‌ها با If-None-Match / If-Modified-Since ارسال می‌شوند و در صورت
+    پاسخ 304، لیست کانفیگ قبلی بدون دریافت و decode دوباره استفاده می‌شود.
+    hash محتوا منابعی را که validator ارسال نمی‌کنند به عنوان unchanged ثبت
+    می‌کند؛ در این حالت بدنه پیش از decode با hash قبلی مقایسه می‌شود.
+
+    فایل JSON فقط validator ها را نگه می‌دارد. لیست کانفیگ هر منبع در یک
+    فایل متنی جدا در configs_dir (یک کانفیگ در هر خط) نوشته و فقط هنگام
+    استفاده دوباره خوانده می‌شود؛ پس نه فایل JSON با تعداد کانفیگ‌ها بزرگ
+    می‌شود و نه لیست‌ها بین سیکل‌ها در حافظه می‌مانند. بدون store_file
+    لیست‌ها در حافظه نگه داشته می‌شوند.
+    """
+
+    def __init__(self, store_file: str = "cache/source_validators.json",
+                 configs_dir: Optional[str] = None):
+        self.store_file = store_file
+        if configs_dir is None and store_file:
+            configs_dir = os.path.join(os.path.dirname(store_file), 'source_configs')
+        self.configs_dir = configs_dir
+        self._validators: Dict[str, SourceValidator] = {}
+        self._memory_configs: Dict[str, List[str]] = {}
+        self.cycle_stats: Dict[str, Dict[str, Any]] = {}
+
+        self._load_from_disk()
+
+    def get(self, source_url: str) -> Optional[SourceValidator]:
+        """
+        دریافت validator ذخیره شده یک منبع
+
+        validator منبعی که لیست کانفیگ آن دیگر موجود نیست برگردانده نمی‌شود
+        تا منبع به صورت کامل دوباره دریافت شود.
+        """
+        validator = self._validators.get(source_url)
+        if validator and not self._has_configs(source_url):
+            return None
+        return validator
+
+    def load_configs(self, source_url: str) -> List[str]:
+        """لیست کانفیگ‌های آخرین دریافت موفق یک منبع"""
+        if not self.configs_dir:
+            return list(self._memory_configs.get(source_url, ()))
+
+        try:
+            with open(self._configs_path(source_url), 'r', encoding='utf-8') as f:
+                return [line.rstrip('\n') for line in f if line.strip()]
+        except OSError as e:
+            logger.error(f"Error loading configs of {source_url}: {e}")
+            return []
+
+    def conditional_headers(self, source_url: str) -> Dict[str, str]:
+        """هدرهای درخواست شرطی برای یک منبع"""
+        validator = self.get(source_url)
+        if not validator:
+            return {}
+
+        headers = {}
+        if validator.etag:
+            headers['If-None-Match'] = validator.etag
+        if validator.last_modified:
+            headers['If-Modified-Since'] = validator.last_modified
+        return headers
+
+    def update(self, source_url: str, etag: str, last_modified: str,
+               digest: str, content_length: int, configs: List[str]):
+        """ثبت validator های دریافت جدید و نوشتن لیست کانفیگ منبع"""
+        if not self._store_configs(source_url, configs):
+            self._validators.pop(source_url, None)
+            return
+        self._validators[source_url] = SourceValidator(
+            etag=etag or "",
+            last_modified=last_modified or "",
+            content_hash=digest,
+            content_length=content_length,
+            config_count=len(configs),
+            fetched_at=time.time())
+
+    def touch(self, source_url: str, etag: str = "", last_modified: str = ""):
+        """به‌روزرسانی validator ها بدون تغییر محتوا (پاسخ 304 یا hash یکسان)"""
+        validator = self._validators.get(source_url)
+        if not validator:
+            return
+        if etag:
+            validator.etag = etag
+        if last_modified:
+            validator.last_modified = last_modified
+        validator.fetched_at = time.time()
+
+    def record(self, source_url: str, status: str, downloaded: int, saved: int):
+        """
+        ثبت آمار انتقال یک منبع در سیکل جاری
+
+        status یکی از changed / not_modified / unchanged / error است. saved
+        برای not_modified بایت‌های دریافت نشده و برای unchanged بایت‌های
+        decode نشده (بدنه با hash یکسان) است.
+        """
+        self.cycle_stats[source_url] = {
+            'status': status,
+            'bytes_downloaded': downloaded,
+            'bytes_saved': saved,
+        }
+
+    def reset_cycle_stats(self):
+        """پاک کردن آمار سیکل قبلی"""
+        self.cycle_stats = {}
+
+    def get_cycle_report(self) -> Dict[str, Any]:
+        """گزارش بایت‌های دریافتی و صرفه‌جویی شده به تفکیک منبع"""
+        totals = {'bytes_downloaded': 0, 'bytes_saved': 0}
+        statuses: Dict[str, int] = {}
+        for stats in self.cycle_stats.values():
+            totals['bytes_downloaded'] += stats['bytes_downloaded']
+            totals['bytes_saved'] += stats['bytes_saved']
+            statuses[stats['status']] = statuses.get(stats['status'], 0) + 1
+
+        return {
+            **totals,
+            'statuses': statuses,
+            'sources': dict(self.cycle_stats),
+        }
+
+    def _configs_path(self, source_url: str) -> str:
+        return os.path.join(self.configs_dir, source_file_name(source_url))
+
+    def _has_configs(self, source_url: str) -> bool:
+        if not self.configs_dir:
+            return source_url in self._memory_configs
+        return os.path.exists(self._configs_path(source_url))
+
+    def _store_configs(self, source_url: str, configs: List[str]) -> bool:
+        """نوشتن اتمی لیست کانفیگ یک منبع (False در صورت خطا)"""
+        if not self.configs_dir:
+            self._memory_configs[source_url] = list(configs)
+            return True
+
+        path = self._configs_path(source_url)
+        temp_path = f"{path}.tmp"
+        try:
+            os.makedirs(self.configs_dir, exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for config in configs:
+                    f.write(config.replace('\n', ''))
+                    f.write('\n')
+            os.replace(temp_path, path)
+            return True
+        except OSError as e:
+            logger.error(f"Error saving configs of {source_url}: {e}")
+            return False
+
+    def _load_from_disk(self):
+        """بارگذاری validator ها از دیسک"""
+        if not self.store_file or not os.path.exists(self.store_file):
+            return
+
+        try:
+            with open(self.store_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            for source_url, validator_data in data.items():
+                # قالب قدیمی: لیست کانفیگ داخل همین فایل JSON بود
+                configs = validator_data.pop('configs', None)
+                if configs is not None:
+                    validator_data['config_count'] = len(configs)
+                    if not self._store_configs(source_url, configs):
+                        continue
+                self._validators[source_url] = SourceValidator(**validator_data)
+
+            logger.info(
+                f"Loaded validators for {len(self._validators)} sources from disk")
+
+        except Exception as e:
+            logger.error(f"Error loading source validators from disk: {e}")
+
+    def save_to_disk(self):
+        """ذخیره validator ها روی دیسک"""
+        if not self.store_file:
+            return
+
+        try:
+            directory = os.path.dirname(self.store_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            data = {source_url: asdict(validator)
+                    for source_url, validator in self._validators.items()}
+
+            with open(self.store_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+
+            logger.info(f"Saved validators for {len(data)} sources to disk")
+
+        except Exception as e:
+            logger.error(f"Error saving source validators to disk: {e}")
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming Collection Pipeline
+pipeline مرحله‌ای fetch → parse → dedup → filter → test → score با صف‌های محدود
+"""
+
+import asyncio
+import itertools
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from async_probe_engine import endpoint_key
+from dns_resolver import normalize_host
+from latency_stats import apply_latency_stats, copy_latency_stats
+from config_identity import config_identity
+from tls_probe import requires_tls
+from udp_probe_engine import is_udp_config
+
+logger = logging.getLogger(__name__)
+
+# نشانگر پایان جریان در صف‌ها
+_DONE = object()
+
+
+@dataclass
+class StageMetrics:
+    """آمار یک مرحله pipeline (برای fetch، items_in تعداد منابع تمام شده است)"""
+    name: str
+    workers: int = 1
+    items_in: int = 0
+    items_out: int = 0
+    first_item_at: Optional[float] = None
+    last_item_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def mark(self, now: float):
+        if self.first_item_at is None:
+            self.first_item_at = now
+        self.last_item_at = now
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        active = (self.last_item_at - self.first_item_at) \
+            if self.first_item_at is not None else 0.0
+        return {
+            'workers': self.workers,
+            'items_in': self.items_in,
+            'items_out': self.items_out,
+            'first_item_at': round(self.first_item_at - origin, 3)
+            if self.first_item_at is not None else None,
+            'finished_at': round(self.finished_at - origin, 3)
+            if self.finished_at is not None else None,
+            'items_per_second': round(self.items_in / active, 1) if active > 0 else None,
+        }
+
+
+class BoundedStageQueue:
+    """صف محدود بین دو مرحله با ثبت عمق بیشینه و تعداد put های مسدود شده"""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.peak_depth = 0
+        self.blocked_puts = 0
+
+    async def put(self, item):
+        if self.queue.full():
+            # backpressure: مرحله پایین‌دستی عقب است
+            self.blocked_puts += 1
+        await self.queue.put(item)
+        depth = self.queue.qsize()
+        if depth > self.peak_depth:
+            self.peak_depth = depth
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def close(self, consumers: int = 1):
+        """ارسال نشانگر پایان برای هر consumer (در آمار صف حساب نمی‌شود)"""
+        for _ in range(consumers):
+            await self.queue.put(_DONE)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'maxsize': self.queue.maxsize,
+            'peak_depth': self.peak_depth,
+            'blocked_puts': self.blocked_puts,
+        }
+
+
+class PriorityStageQueue(BoundedStageQueue):
+    """
+    صف محدود با تحویل بیشترین اولویت اول (برای اولویت برابر، ترتیب ورود)
+
+    همان backpressure صف معمولی را دارد؛ فقط موارد حاضر در صف مرتب می‌شوند.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        super().__init__(name, maxsize)
+        self.queue = asyncio.PriorityQueue(maxsize=maxsize)
+        self._sequence = itertools.count()
+
+    async def put(self, item, priority: float = 0.0):
+        await super().put((-priority, next(self._sequence), item))
+
+    async def get(self):
+        _, _, item = await self.queue.get()
+        return item
+
+    async def close(self, consumers: int = 1):
+        """نشانگر پایان بعد از تمام موارد باقیمانده تحویل داده می‌شود"""
+        for _ in range(consumers):
+            await self.queue.put((float('inf'), next(self._sequence), _DONE))
+
+
+class StreamingCollectionPipeline:
+    """
+    اجرای همپوشان دریافت و تست کانفیگ‌ها
+
+    تست اتصال به محض رسیدن اولین کانفیگ از اولین منبع شروع می‌شود. هر
+    endpoint فقط یک بار تست می‌شود و نتیجه به تمام کانفیگ‌های هم‌endpoint
+    (حتی آن‌هایی که بعد از تست می‌رسند) داده می‌شود.
+
+    با زمان‌بند اولویت‌دار، صف تست endpoint های حاضر در صف را به ترتیب
+    احتمال موفقیت تحویل می‌دهد و با probe_time_budget، پس از گذشت بودجه از
+    اولین تست، endpoint های باقیمانده تست نمی‌شوند.
+    """
+
+    STAGES = ('fetch', 'parse', 'dedup', 'filter', 'test', 'score')
+
+    def __init__(self, collector, queue_size: int = 1000, filter_workers: int = 64,
+                 test_workers: Optional[int] = None, mode: str = 'pool'):
+        self.collector = collector
+        self.queue_size = queue_size
+        self.filter_workers = max(1, filter_workers)
+        self.mode = mode
+        if test_workers:
+            self.test_workers = test_workers
+        elif mode == 'async':
+            self.test_workers = collector.async_engine.max_concurrency
+        else:
+            self.test_workers = collector.connection_pool.max_workers
+
+        self.metrics = {name: StageMetrics(name) for name in self.STAGES}
+        self.metrics['filter'].workers = self.filter_workers
+        self.metrics['test'].workers = self.test_workers
+
+        # وضعیت گروه‌بندی endpoint ها
+        self.address_map: Dict[str, str] = {}
+        self.endpoint_groups: Dict[str, List[Any]] = {}
+        self.endpoint_results: Dict[str, Tuple[bool, float]] = {}
+        self.unresolved = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.last_run_stats: Dict[str, Any] = {}
+
+        # زمان‌بندی تست: بودجه زمانی از اولین تست و نتایج به ترتیب تست
+        self.time_budget = collector.collection_config.get('probe_time_budget', 0)
+        self.budget_deadline: Optional[float] = None
+        self.deferred = 0
+        self.probe_outcomes: List[bool] = []
+
+    async def run(self) -> Dict[str, Any]:
+        """اجرای کامل pipeline و برگرداندن آمار آن"""
+        self._origin = time.perf_counter()
+        queues = {name: BoundedStageQueue(name, self.queue_size)
+                  for name in ('raw', 'parsed', 'unique', 'test', 'score')}
+        if self.collector.probe_scheduler:
+            queues['test'] = PriorityStageQueue('test', self.queue_size)
+
+        tasks = [
+            asyncio.ensure_future(self._fetch_stage(queues['raw'])),
+            asyncio.ensure_future(self._parse_stage(queues['raw'], queues['parsed'])),
+            asyncio.ensure_future(self._dedup_stage(queues['parsed'], queues['unique'])),
+            asyncio.ensure_future(self._filter_stage(queues['unique'], queues['test'], queues['score'])),
+            asyncio.ensure_future(self._test_stage(queues['test'], queues['score'])),
+            asyncio.ensure_future(self._score_stage(queues['score'])),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        total_time = time.perf_counter() - self._origin
+        fetch_time = self.metrics['fetch'].finished_at - self._origin
+        test_metrics = self.metrics['test']
+        test_time = (test_metrics.last_item_at - test_metrics.first_item_at) \
+            if test_metrics.first_item_at is not None else 0.0
+
+        self.last_run_stats = {
+            'total_time': round(total_time, 2),
+            'fetch_time': round(fetch_time, 2),
+            'test_time': round(test_time, 2),
+            # زمان صرفه‌جویی شده نسبت به اجرای ترتیبی fetch + test
+            'overlap_time': round(max(0.0, fetch_time + test_time - total_time), 2),
+            'stages': {name: metrics.to_dict(self._origin)
+                       for name, metrics in self.metrics.items()},
+            'queues': {name: queue.to_dict() for name, queue in queues.items()},
+            'duplicates': self.duplicates,
+            'rejected_by_filter': self.rejected,
+            'unresolved': self.unresolved,
+            'unique_endpoints': len(self.endpoint_results),
+            'deferred': self.deferred,
+        }
+        return self.last_run_stats
+
+    def _now(self) -> float:
+        return time.perf_counter()
+
+    async def _fetch_stage(self, out_queue: BoundedStageQueue):
+        """دریافت همزمان تمام منابع و ارسال رشته‌ها به محض decode شدن"""
+        collector = self.collector
+        metrics = self.metrics['fetch']
+
+        async def fetch_source(source_url: str):
+            async for config_str in collector.stream_configs_from_source(source_url):
+                metrics.mark(self._now())
+                metrics.items_out += 1
+                collector.record_config_origins(source_url, (config_str,))
+                await out_queue.put(config_str)
+            metrics.items_in += 1
+
+        async def fetch_telegram():
+            try:
+                logger.info("📱 شروع جمع‌آوری از تلگرام...")
+                telegram_configs = await collector.telegram_collector.collect_all_sources()
+                logger.info(f"📱 {len(telegram_configs)} کانفیگ از تلگرام جمع‌آوری شد")
+            except Exception as e:
+                logger.error(f"خطا در جمع‌آوری از تلگرام: {e}")
+                return
+            collector.record_config_origins('telegram', telegram_configs)
+            for config_str in telegram_configs:
+                metrics.mark(self._now())
+                metrics.items_out += 1
+                await out_queue.put(config_str)
+            metrics.items_in += 1
+
+        producers = [fetch_source(source) for source in collector.config_sources]
+        if collector.telegram_collector:
+            producers.append(fetch_telegram())
+        metrics.workers = len(producers)
+
+        results = await asyncio.gather(*producers, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"خطا در جمع‌آوری: {result}")
+
+        metrics.finished_at = self._now()
+        collector.finish_fetch_stage()
+        logger.info(
+            f"📥 دریافت کامل شد: {metrics.items_out} کانفیگ در {metrics.finished_at - self._origin:.1f}s")
+        await out_queue.close()
+
+    async def _parse_stage(self, in_queue: BoundedStageQueue, out_queue: BoundedStageQueue):
+        """تجزیه یکباره هر رشته یکتا"""
+        collector = self.collector
+        metrics = self.metrics['parse']
+        seen_raw = set()
+
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                break
+            metrics.items_in += 1
+            metrics.mark(self._now())
+
+            config_str = item.strip() if item else ''
+            if not config_str or config_str in seen_raw:
+                continue
+            seen_raw.add(config_str)
+            collector.distinct_raw_count += 1
+
+            config = collector.parse_config(config_str)
+            if config:
+                metrics.items_out += 1
+                await out_queue.put(config)
+
+        metrics.finished_at = self._now()
+        await out_queue.close()
+
+    async def _dedup_stage(self, in_queue: BoundedStageQueue, out_queue: BoundedStageQueue):
+        """حذف کانفیگ‌های تکراری بر اساس کلید هویت کانونی"""
+        metrics = self.metrics['dedup']
+        seen_identities = set()
+
+        while True:
+            config = await in_queue.get()
+            if config is _DONE:
+                break
+            metrics.items_in += 1
+            metrics.mark(self._now())
+
+            key = config_identity(config)
+            if key in seen_identities:
+                self.duplicates += 1
+                continue
+            seen_identities.add(key)
+            if self.collector.seen_index and not self.collector.mark_seen(key):
+                # حالت new_configs_only: کانفیگ در سیکل‌های قبل دیده شده است
+                continue
+            metrics.items_out += 1
+            await out_queue.put(config)
+
+        metrics.finished_at = self._now()
+        await out_queue.close()
+
+    async def _filter_stage(self, in_queue: BoundedStageQueue, test_queue: BoundedStageQueue,
+                            score_queue: BoundedStageQueue):
+        """فیلتر هوشمند، resolve و گروه‌بندی endpoint"""
+        collector = self.collector
+        metrics = self.metrics['filter']
+
+        async def worker():
+            while True:
+                config = await in_queue.get()
+                if config is _DONE:
+                    # اطلاع به worker های دیگر
+                    await in_queue.close()
+                    return
+                metrics.items_in += 1
+                metrics.mark(self._now())
+
+                if not collector.smart_filter.is_valid_config(config):
+                    self.rejected += 1
+                    continue
+
+                address, resolve_latency = await collector.resolver.resolve_timed(config.address)
+                config.resolve_latency = resolve_latency
+                if address is None:
+                    # hostname قابل resolve نیست - بدون تست ناموفق است
+                    config.is_working = False
+                    collector.failed_configs.append(config)
+                    self.unresolved += 1
+                    continue
+                self.address_map[normalize_host(config.address)] = address
+
+                # تکمیل کشور با IP resolve شده
+                if collector.geoip and config.country in ('Unknown', 'unknown'):
+                    config.country = collector.geoip.get_country(config.address) or config.country
+
+                metrics.items_out += 1
+                key = endpoint_key(config, self.address_map)
+                if key not in self.endpoint_results and key not in self.endpoint_groups \
+                        and collector.probe_cache:
+                    # endpoint سالمی که در سیکل‌های اخیر تأیید شده است
+                    cached = collector.probe_cache.lookup(key)
+                    if cached:
+                        self.endpoint_results[key] = cached
+                if key in self.endpoint_results:
+                    # endpoint قبلاً تست شده است
+                    is_working, latency = self.endpoint_results[key]
+                    if is_working and collector.tls_probe_enabled and requires_tls(config):
+                        # فقط handshake TLS با SNI همین کانفیگ باقی مانده است
+                        await self._enqueue_test(test_queue, config, key)
+                    else:
+                        await score_queue.put((config, is_working, latency))
+                elif key in self.endpoint_groups:
+                    # تست endpoint در جریان است
+                    self.endpoint_groups[key].append(config)
+                else:
+                    self.endpoint_groups[key] = [config]
+                    await self._enqueue_test(test_queue, config, key)
+
+        await asyncio.gather(*(worker() for _ in range(self.filter_workers)))
+        metrics.finished_at = self._now()
+        await test_queue.close(self.test_workers)
+
+    async def _enqueue_test(self, test_queue: BoundedStageQueue, config, key: str):
+        """ارسال endpoint به صف تست (با احتمال موفقیت تخمینی به عنوان اولویت)"""
+        scheduler = self.collector.probe_scheduler
+        if not scheduler:
+            await test_queue.put(config)
+            return
+        probe_cache = self.collector.probe_cache
+        history = probe_cache.get(key) if probe_cache else None
+        await test_queue.put(config, scheduler.predict(
+            config, self.collector.config_source(config), history))
+
+    def _budget_exhausted(self) -> bool:
+        """آیا بودجه زمانی تست (از اولین تست سیکل) تمام شده است؟"""
+        if not self.time_budget:
+            return False
+        now = time.time()
+        if self.budget_deadline is None:
+            self.budget_deadline = now + self.time_budget
+        return now >= self.budget_deadline
+
+    async def _probe(self, config) -> Tuple[bool, float]:
+        """تست یک endpoint با موتور انتخاب شده"""
+        collector = self.collector
+        address = self.address_map.get(normalize_host(config.address), config.address)
+        if collector.udp_engine and is_udp_config(config):
+            # Hysteria/TUIC/WireGuard روی UDP؛ semaphore جدا از موتور TCP
+            result = await collector.udp_engine.probe(config, address)
+            return result.success, result.latency
+
+        controller = collector.timeout_controller
+        engine = collector.async_engine if self.mode == 'async' else collector.connection_pool
+        timeout = controller.timeout_for(config.country, config.protocol, engine.timeout) \
+            if controller else engine.timeout
+
+        if self.mode == 'async':
+            result = await engine.probe(address, config.port, timeout)
+            if controller and result.error in ("timeout", "loss") and \
+                    controller.needs_static_retry(timeout, engine.timeout):
+                # deadline تطبیقی تمام شد - یک تلاش دیگر با timeout ثابت
+                result = await engine.probe(address, config.port)
+                controller.record_static_retry(config.country, config.protocol, result.success)
+            is_working, latency = result.success, result.latency
+            if result.stats is not None:
+                apply_latency_stats(config, result.stats)
+        else:
+            try:
+                is_working, latency = await engine.measure_adaptive(config, address, timeout)
+            except Exception:
+                is_working, latency = False, 0.0
+
+        if controller:
+            controller.observe(config.country, config.protocol, is_working, latency)
+
+        if is_working and collector.handshake_verifier:
+            # تأیید handshake پروتکل (پیکربندی‌های پشتیبانی نشده بدون تغییر)
+            outcome = await collector.handshake_verifier.verify_handshake(config, address)
+            if outcome.supported and not outcome.success:
+                return False, 0.0
+        return is_working, latency
+
+    async def _verify_tls(self, config, is_working: bool, latency: float) -> Tuple[bool, float]:
+        """
+        مرحله دوم: handshake TLS با SNI خود کانفیگ روی endpoint پاسخ‌گو
+
+        handshake یک بار برای هر (IP، پورت، SNI) انجام و بین کانفیگ‌ها مشترک می‌شود.
+        """
+        collector = self.collector
+        if not (is_working and collector.tls_probe_enabled and requires_tls(config)):
+            return is_working, latency
+        outcome = await collector.tls_prober.verify_config(config, self.address_map)
+        if not outcome.success:
+            return False, 0.0
+        return is_working, latency
+
+    async def _test_stage(self, in_queue: BoundedStageQueue, score_queue: BoundedStageQueue):
+        """تست endpoint ها و پخش نتیجه به کانفیگ‌های گروه"""
+        metrics = self.metrics['test']
+
+        async def worker():
+            while True:
+                config = await in_queue.get()
+                if config is _DONE:
+                    return
+                metrics.items_in += 1
+                metrics.mark(self._now())
+
+                key = endpoint_key(config, self.address_map)
+                if self._budget_exhausted():
+                    # بودجه زمانی تمام شده - endpoint های محتمل‌تر قبلاً تست شده‌اند
+                    self.endpoint_groups.pop(key, None)
+                    self.deferred += 1
+                    continue
+                if key in self.endpoint_results:
+                    # endpoint قبلاً تست شده؛ فقط handshake TLS این کانفیگ
+                    is_working, latency = self.endpoint_results[key]
+                    members = [config]
+                else:
+                    is_working, latency = await self._probe(config)
+                    self.endpoint_results[key] = (is_working, latency)
+                    self.probe_outcomes.append(is_working)
+                    if self.collector.probe_cache:
+                        self.collector.probe_cache.record(key, is_working, latency)
+                    members = self.endpoint_groups.pop(key, [config])
+                    self.collector.record_dead_endpoints(members, is_working)
+
+                for member in members:
+                    if member is not config:
+                        copy_latency_stats(config, member)
+                    member_working, member_latency = await self._verify_tls(
+                        member, is_working, latency)
+                    metrics.items_out += 1
+                    await score_queue.put((member, member_working, member_latency))
+                metrics.mark(self._now())
+
+        await asyncio.gather(*(worker() for _ in range(self.test_workers)))
+        metrics.finished_at = self._now()
+        await score_queue.close()
+
+    async def _score_stage(self, in_queue: BoundedStageQueue):
+        """امتیازدهی AI و ثبت نتیجه نهایی"""
+        collector = self.collector
+        metrics = self.metrics['score']
+
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                break
+            config, is_working, latency = item
+            metrics.items_in += 1
+            metrics.mark(self._now())
+
+            config.is_working = is_working
+            config.latency = latency
+            if collector.probe_scheduler:
+                collector.probe_scheduler.record(
+                    collector.config_source(config), config.protocol, is_working)
+            config = collector.apply_ai_quality_scoring(config)
+            metrics.items_out += 1
+
+            if is_working:
+                collector.working_configs.append(config)
+                if collector.early_publisher:
+                    collector.early_publisher.config_verified(config)
+            else:
+                collector.failed_configs.append(config)
+
+        metrics.finished_at = self._now()
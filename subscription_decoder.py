@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Subscription Stream Decoder
+decoder تدریجی بدنه subscription ها (خط به خط یا Base64 کامل) بر اساس chunk
+"""
+
+import base64
+import binascii
+import codecs
+import re
+from typing import AsyncIterator, Iterable, List, Optional
+
+PROTOCOL_PREFIXES = ('vmess://', 'vless://', 'trojan://', 'ss://', 'ssr://',
+                     'hysteria://', 'hysteria2://', 'hy2://', 'tuic://', 'wireguard://')
+
+_BASE64_BYTES = re.compile(rb'[A-Za-z0-9+/=_\-\r]*')
+_URLSAFE_TO_STD = bytes.maketrans(b'-_', b'+/')
+
+
+def _has_protocol(text: str) -> bool:
+    return any(proto in text for proto in PROTOCOL_PREFIXES)
+
+
+def extract_line_configs(line: str) -> List[str]:
+    """
+    قوانین استخراج کانفیگ از یک خط
+
+    خط دارای پروتکل مستقیم برگردانده می‌شود، خط بلند بدون فاصله به عنوان
+    Base64 decode می‌شود و در غیر این صورت خود خط برگردانده می‌شود.
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return []
+
+    if _has_protocol(line):
+        return [line]
+
+    if len(line) > 50 and ' ' not in line:
+        try:
+            decoded = base64.b64decode(line).decode('utf-8')
+        except Exception:
+            # اگر decode نشد، شاید خود لینک باشد
+            return [line]
+
+        if '\n' in decoded:
+            return [subline.strip() for subline in decoded.split('\n')
+                    if subline.strip() and _has_protocol(subline)]
+        if _has_protocol(decoded):
+            return [decoded]
+        return []
+
+    return [line]
+
+
+class SubscriptionStreamDecoder:
+    """
+    decoder تدریجی بدنه subscription
+
+    بایت‌ها chunk به chunk با feed داده می‌شوند و کانفیگ‌های کامل شده
+    بلافاصله برگردانده می‌شوند. خطی که از stream_threshold بلندتر شود و فقط
+    حروف Base64 داشته باشد (بدنه Base64 کامل) به صورت گروه‌های 4 کاراکتری
+    decode می‌شود، پس حافظه مصرفی متناسب با اندازه chunk است نه اندازه بدنه.
+    """
+
+    def __init__(self, stream_threshold: int = 8192):
+        self.stream_threshold = stream_threshold
+        self._pending = bytearray()
+        # خط اول تا مشخص شدن تک‌خطی بودن بدنه نگه داشته می‌شود
+        self._held_line: Optional[str] = None
+        self._lines_seen = 0
+        # وضعیت decode تدریجی Base64
+        self._b64_active = False
+        self._b64_carry = bytearray()
+        self._text_decoder = None
+        self._text = ''
+        self.bytes_in = 0
+        self.configs_out = 0
+        self.peak_buffer = 0
+
+    def feed(self, chunk: bytes) -> List[str]:
+        """پردازش یک chunk و برگرداندن کانفیگ‌های کامل شده"""
+        out: List[str] = []
+        self.bytes_in += len(chunk)
+
+        start = 0
+        while True:
+            newline = chunk.find(b'\n', start)
+            piece = chunk[start:] if newline < 0 else chunk[start:newline]
+            if piece:
+                self._append(piece, out)
+            if newline < 0:
+                break
+            self._end_line(out)
+            start = newline + 1
+
+        self.configs_out += len(out)
+        return out
+
+    def finish(self) -> List[str]:
+        """پایان بدنه و برگرداندن کانفیگ‌های باقیمانده"""
+        out: List[str] = []
+        self._end_line(out)
+
+        # بدنه تک‌خطی بلند: احتمالاً Base64 کامل است
+        if self._held_line is not None:
+            line = self._held_line.strip()
+            self._held_line = None
+            decoded_lines = None
+            if self._lines_seen == 1 and len(line) > 100:
+                try:
+                    decoded_lines = base64.b64decode(line).decode('utf-8').strip().split('\n')
+                except Exception:
+                    decoded_lines = None
+
+            for decoded_line in decoded_lines if decoded_lines is not None else [line]:
+                out.extend(extract_line_configs(decoded_line))
+
+        self.configs_out += len(out)
+        return out
+
+    def _track_buffer(self):
+        size = len(self._pending) + len(self._b64_carry) + len(self._text)
+        if size > self.peak_buffer:
+            self.peak_buffer = size
+
+    def _append(self, piece: bytes, out: List[str]):
+        if self._b64_active:
+            self._feed_base64(piece, out)
+            return
+
+        self._pending += piece
+        self._track_buffer()
+        if len(self._pending) > self.stream_threshold and \
+                _BASE64_BYTES.fullmatch(self._pending) and b'://' not in self._pending:
+            # بدنه Base64 کامل - از اینجا به بعد به صورت تدریجی decode می‌شود
+            self._b64_active = True
+            self._text_decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            pending = bytes(self._pending)
+            self._pending.clear()
+            self._feed_base64(pending, out)
+
+    def _feed_base64(self, piece: bytes, out: List[str]):
+        self._b64_carry += piece.translate(_URLSAFE_TO_STD, b'\r\t ')
+        usable = len(self._b64_carry) // 4 * 4
+        if usable:
+            self._emit_base64(bytes(self._b64_carry[:usable]), out, final=False)
+            del self._b64_carry[:usable]
+        self._track_buffer()
+
+    def _emit_base64(self, data: bytes, out: List[str], final: bool):
+        try:
+            raw = base64.b64decode(data)
+        except (binascii.Error, ValueError):
+            raw = b''
+        self._text += self._text_decoder.decode(raw, final=final)
+        self._track_buffer()
+
+        *complete, self._text = self._text.split('\n')
+        for line in complete:
+            out.extend(extract_line_configs(line))
+
+    def _end_line(self, out: List[str]):
+        if self._b64_active:
+            carry = bytes(self._b64_carry)
+            self._b64_carry.clear()
+            if carry:
+                carry += b'=' * (-len(carry) % 4)
+            self._emit_base64(carry, out, final=True)
+            out.extend(extract_line_configs(self._text))
+            self._text = ''
+            self._b64_active = False
+            self._text_decoder = None
+            self._lines_seen += 1
+            return
+
+        if not self._pending:
+            return
+        line = self._pending.decode('utf-8', errors='replace')
+        self._pending.clear()
+        if not line.strip():
+            return
+
+        self._lines_seen += 1
+        if self._lines_seen == 1:
+            self._held_line = line
+            return
+
+        if self._held_line is not None:
+            out.extend(extract_line_configs(self._held_line))
+            self._held_line = None
+        out.extend(extract_line_configs(line))
+
+
+async def iter_subscription_configs(chunks: AsyncIterator[bytes],
+                                    decoder: Optional[SubscriptionStreamDecoder] = None
+                                    ) -> AsyncIterator[str]:
+    """تبدیل stream بایت‌ها به async generator رشته‌های کانفیگ"""
+    decoder = decoder or SubscriptionStreamDecoder()
+    async for chunk in chunks:
+        for config in decoder.feed(chunk):
+            yield config
+    for config in decoder.finish():
+        yield config
+
+
+def decode_subscription(chunks: Iterable[bytes]) -> List[str]:
+    """نسخه همزمان برای محتوای موجود در حافظه"""
+    decoder = SubscriptionStreamDecoder()
+    configs: List[str] = []
+    for chunk in chunks:
+        configs.extend(decoder.feed(chunk))
+    configs.extend(decoder.finish())
+    return configs
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental Subscription Publisher
+انتشار تدریجی فایل‌های اشتراک در طول سیکل و نهایی‌سازی در deadline
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def write_file_atomic(filename: str, content: str):
+    """
+    نوشتن فایل از طریق فایل موقت تا خواننده‌ها هیچ‌وقت فایل نیمه‌کاره نبینند
+
+    فایل موقت نام یکتا در همان پوشه دارد، پس دو نویسنده همزمان (انتشار
+    زودهنگام و نهایی) فایل موقت یکدیگر را بازنویسی نمی‌کنند.
+    """
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory or '.',
+                                     prefix=f".{os.path.basename(filename)}.",
+                                     suffix='.tmp', delete=False) as f:
+        temp_filename = f.name
+        try:
+            f.write(content)
+        except BaseException:
+            f.close()
+            os.unlink(temp_filename)
+            raise
+    os.replace(temp_filename, filename)
+
+
+class IncrementalSubscriptionPublisher:
+    """
+    انتشار تدریجی کانفیگ‌های تأیید شده
+
+    هر بار که پروتکلی per_protocol کانفیگ تأیید شده جدید پیدا کند (و حداقل
+    min_interval ثانیه از انتشار قبلی گذشته باشد) فایل‌های اشتراک دوباره
+    نوشته می‌شوند. در انتشارهای زودهنگام فقط فایل‌های پروتکل‌هایی که حداقل
+    per_protocol کانفیگ دارند نوشته می‌شوند؛ فایل ترکیبی و فایل‌های کشور سیکل
+    قبلی تا انتشار نهایی با لیست ناقص جایگزین نمی‌شوند.
+    publish(min_per_protocol) تعداد کانفیگ‌های منتشر شده را برمی‌گرداند.
+
+    داخل event loop، انتشار زودهنگام در thread pool اجرا می‌شود تا نوشتن
+    فایل‌ها حلقه تست را متوقف نکند؛ در هر لحظه حداکثر یک انتشار در جریان است
+    و wait_pending پیش از انتشار نهایی منتظر آن می‌ماند.
+    """
+
+    def __init__(self, publish: Callable[[int], int], per_protocol: int = 50,
+                 min_interval: float = 15.0):
+        self.publish = publish
+        self.per_protocol = max(1, per_protocol)
+        self.min_interval = min_interval
+        self._verified: Dict[str, int] = {}
+        self._since_flush: Dict[str, int] = {}
+        self._cycle_start = time.time()
+        self._last_flush: Optional[float] = None
+        self._pending: Optional[asyncio.Future] = None
+        self.stats: Dict[str, Any] = {}
+        self.start_cycle()
+
+    def start_cycle(self):
+        """شروع سیکل جدید"""
+        self._verified = {}
+        self._since_flush = {}
+        self._cycle_start = time.time()
+        self._last_flush = None
+        self.stats = {
+            'early_flushes': 0,
+            'published_before_deadline': 0,
+            'first_publish_after': None,
+        }
+
+    def config_verified(self, config: Any):
+        """ثبت یک کانفیگ تأیید شده و انتشار در صورت رسیدن به آستانه"""
+        protocol = config.protocol.lower()
+        self._verified[protocol] = self._verified.get(protocol, 0) + 1
+        self._since_flush[protocol] = self._since_flush.get(protocol, 0) + 1
+
+        if self._since_flush[protocol] < self.per_protocol:
+            return
+        if self._pending is not None and not self._pending.done():
+            return
+        if self._last_flush is not None and time.time() - self._last_flush < self.min_interval:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        # شمارنده‌ها در thread حلقه صفر می‌شوند؛ فقط نوشتن فایل‌ها به thread pool می‌رود
+        self._since_flush = {}
+        self._last_flush = time.time()
+        self._pending = loop.run_in_executor(None, self._publish)
+
+    async def wait_pending(self):
+        """انتظار برای پایان انتشار زودهنگام در جریان"""
+        if self._pending is not None:
+            await asyncio.gather(self._pending, return_exceptions=True)
+            self._pending = None
+
+    def flush(self):
+        """انتشار زودهنگام کانفیگ‌های تأیید شده تا این لحظه"""
+        self._since_flush = {}
+        self._last_flush = time.time()
+        self._publish()
+
+    def _publish(self):
+        try:
+            published = self.publish(self.per_protocol)
+        except Exception as e:
+            logger.error(f"Error publishing early subscriptions: {e}")
+            return
+
+        now = time.time()
+        self._last_flush = now
+        self.stats['early_flushes'] += 1
+        self.stats['published_before_deadline'] = published
+        if self.stats['first_publish_after'] is None:
+            self.stats['first_publish_after'] = round(now - self._cycle_start, 2)
+        logger.info(
+            f"📤 انتشار زودهنگام: {published} کانفیگ پس از {now - self._cycle_start:.1f}s")
+
+    def finalize(self, published: int, deadline_hit: bool) -> Dict[str, Any]:
+        """ثبت انتشار نهایی و برگرداندن گزارش سیکل"""
+        early = self.stats['published_before_deadline']
+        self.stats.update({
+            'deadline_hit': deadline_hit,
+            'published_at_deadline': published,
+            'added_at_deadline': max(0, published - early),
+            'elapsed': round(time.time() - self._cycle_start, 2),
+            'verified_by_protocol': dict(self._verified),
+        })
+        return dict(self.stats)
@@ -13,6 +13,8 @@ from dataclasses import dataclass
 import json
 import time
 
+from http_client import SharedHTTPClient
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,12 +43,16 @@ class TelegramSource:
 class TelegramCollector:
     """جمع‌آورنده کانفیگ‌ها از تلگرام"""
 
-    def __init__(self, bot_token: Optional[str] = None):
+    def __init__(self, bot_token: Optional[str] = None,
+                 http_client: Optional[SharedHTTPClient] = None,
+                 geoip=None):
         """
         Initialize Telegram Collector
 
         Args:
             bot_token: Telegram Bot Token (از env یا parameter)
+            http_client: session HTTP مشترک (در صورت عدم ارسال، نمونه مستقل ساخته می‌شود)
+            geoip: GeoIPLookup مشترک (در صورت عدم ارسال، نمونه مستقل با پایگاه داده محلی)
         """
         import os
         self.bot_token = bot_token or os.getenv('TELEGRAM_BOT_TOKEN')
@@ -62,6 +68,14 @@ class TelegramCollector:
             logger.info("✅ Telegram Collector initialized with Bot Token")
             logger.info(f"🔗 API URL: {self.api_url}")
 
+        self.http_client = http_client or SharedHTTPClient()
+        if geoip is None:
+            try:
+                from geoip_lookup import GeoIPLookup
+                geoip = GeoIPLookup()
+            except ImportError:
+                geoip = None
+        self.geoip = geoip
         self.sources = []
         self.collected_configs = []
 
@@ -91,31 +105,28 @@ class TelegramCollector:
             # URL کانال در t.me
             url = f"https://t.me/s/{channel_username}"
 
-            # ایجاد connector بدون SSL verification
-            connector = aiohttp.TCPConnector(ssl=False)
-
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        html = await response.text()
-
-                        # استخراج کانفیگ‌ها از HTML
-                        configs = self._extract_configs_from_html(html)
-
-                        # تبدیل به فرمت پیام
-                        messages = []
-                        for i, config in enumerate(configs[:limit]):
-                            messages.append({
-                                'message_id': i + 1,
-                                'text': config,
-                                'date': int(time.time())
-                            })
-
-                        return messages
-                    else:
-                        logger.warning(
-                            f"HTTP {response.status} for {channel_id}")
-                        return []
+            # درخواست بدون SSL verification روی session مشترک
+            async with self.http_client.get(url, ssl=False) as response:
+                if response.status == 200:
+                    html = await response.text()
+
+                    # استخراج کانفیگ‌ها از HTML
+                    configs = self._extract_configs_from_html(html)
+
+                    # تبدیل به فرمت پیام
+                    messages = []
+                    for i, config in enumerate(configs[:limit]):
+                        messages.append({
+                            'message_id': i + 1,
+                            'text': config,
+                            'date': int(time.time())
+                        })
+
+                    return messages
+                else:
+                    logger.warning(
+                        f"HTTP {response.status} for {channel_id}")
+                    return []
 
         except Exception as e:
             logger.debug(f"خطا در scraping {channel_id}: {e}")
@@ -182,19 +193,18 @@ class TelegramCollector:
                 'limit': limit
             }
 
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        messages = data.get('result', [])
+            async with self.http_client.get(url, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    messages = data.get('result', [])
 
-                        # فیلتر کردن پیام‌های کانال
-                        channel_messages = []
-                        for update in messages:
-                            if 'channel_post' in update:
-                                channel_messages.append(update['channel_post'])
+                    # فیلتر کردن پیام‌های کانال
+                    channel_messages = []
+                    for update in messages:
+                        if 'channel_post' in update:
+                            channel_messages.append(update['channel_post'])
 
-                        return channel_messages
+                    return channel_messages
 
         except Exception as e:
             logger.error(f"خطا در دریافت تاریخچه کانال: {e}")
@@ -440,8 +450,13 @@ class TelegramCollector:
         try:
             country_configs = {}
 
-            for config in configs:
-                country = await self._detect_country_from_config(config)
+            # یک جستجوی دسته‌ای در پایگاه داده GeoIP محلی برای همه آدرس‌ها
+            addresses = [self._extract_server_address(config) for config in configs]
+            countries = self.geoip.get_countries(addresses) if self.geoip else [None] * len(configs)
+
+            for config, address, country in zip(configs, addresses, countries):
+                if not country:
+                    country = await self._get_country_from_address(address) if address else "UNKNOWN"
 
                 if country not in country_configs:
                     country_configs[country] = []
@@ -454,24 +469,6 @@ class TelegramCollector:
             logger.error(f"خطا در دسته‌بندی بر اساس کشور: {e}")
             return {"UNKNOWN": configs}
 
-    async def _detect_country_from_config(self, config: str) -> str:
-        """تشخیص کشور از کانفیگ"""
-        try:
-            # استخراج آدرس سرور از کانفیگ
-            server_address = self._extract_server_address(config)
-
-            if not server_address:
-                return "UNKNOWN"
-
-            # تشخیص کشور بر اساس آدرس IP یا دامنه
-            country = await self._get_country_from_address(server_address)
-
-            return country
-
-        except Exception as e:
-            logger.debug(f"خطا در تشخیص کشور: {e}")
-            return "UNKNOWN"
-
     def _extract_server_address(self, config: str) -> str:
         """استخراج آدرس سرور از کانفیگ"""
         try:
@@ -649,17 +646,10 @@ class TelegramCollector:
             return False
 
     async def _get_country_from_ip(self, ip: str) -> str:
-        """تشخیص کشور از IP (ساده‌سازی شده)"""
+        """تشخیص کشور از IP با پایگاه داده GeoIP محلی (بدون درخواست شبکه)"""
         try:
-            # برای سادگی، از یک سرویس عمومی استفاده می‌کنیم
-            # در تولید واقعی، از یک کتابخانه GeoIP استفاده کنید
-            import aiohttp
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"http://ip-api.com/json/{ip}") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get('countryCode', 'UNKNOWN')
+            if self.geoip:
+                return self.geoip.get_country_from_ip(ip) or "UNKNOWN"
 
             return "UNKNOWN"
 
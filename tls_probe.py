@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TLS Handshake Probe
+مرحله دوم تست: handshake TLS غیرمسدودکننده با SSLContext مشترک و SNI کانفیگ
+"""
+
+import asyncio
+import ipaddress
+import ssl
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from async_probe_engine import endpoint_key
+from dns_resolver import normalize_host
+
+logger = logging.getLogger(__name__)
+
+_shared_context: Optional[ssl.SSLContext] = None
+
+
+def shared_tls_context() -> ssl.SSLContext:
+    """
+    SSLContext یکتای تست‌ها (یک بار ساخته و بین تمام handshake ها استفاده می‌شود)
+
+    گواهی بررسی نمی‌شود چون سرورهای پروکسی اغلب گواهی self-signed یا
+    مربوط به دامنه دیگری دارند؛ هدف فقط تأیید پاسخ‌گو بودن لایه TLS است.
+    """
+    global _shared_context
+    if _shared_context is None:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        context.minimum_version = ssl.TLSVersion.TLSv1_2
+        context.set_alpn_protocols(['h2', 'http/1.1'])
+        _shared_context = context
+    return _shared_context
+
+
+def requires_tls(config: Any) -> bool:
+    """آیا کانفیگ روی TLS کار می‌کند؟ (Trojan همیشه)"""
+    return bool(config.tls) or config.protocol == 'trojan'
+
+
+def server_name(config: Any) -> Optional[str]:
+    """SNI کانفیگ یا hostname آدرس (برای آدرس IP بدون SNI، None)"""
+    sni = getattr(config, 'sni', '') or ''
+    if sni:
+        return sni
+    host = normalize_host(config.address)
+    try:
+        ipaddress.ip_address(host)
+        return None
+    except ValueError:
+        return host
+
+
+@dataclass
+class TLSProbeResult:
+    """نتیجه handshake (زمان اتصال TCP و handshake جدا، میلی‌ثانیه)"""
+    success: bool
+    connect_latency: float = 0.0
+    handshake_latency: float = 0.0
+    error: str = ""
+
+
+class TLSHandshakeProber:
+    """
+    تست handshake TLS روی endpoint هایی که در تست TCP پاسخ داده‌اند
+
+    از semaphore موتور async استفاده می‌کند تا مجموع اتصال‌های همزمان
+    TCP و TLS از یک سقف عبور نکند. نتیجه handshake با کلید (IP، پورت، SNI)
+    در طول سیکل نگه داشته می‌شود؛ کانفیگ‌های یک endpoint با SNI متفاوت هر
+    کدام handshake خود را دارند و SNI تکراری دوباره handshake نمی‌شود.
+    """
+
+    def __init__(self, engine, timeout: float = 5.0,
+                 context: Optional[ssl.SSLContext] = None):
+        self.engine = engine
+        self.timeout = timeout
+        self.context = context or shared_tls_context()
+        self._outcomes: Dict[Tuple[str, int, Optional[str]], asyncio.Future] = {}
+        self.reset_stats()
+
+    @staticmethod
+    def tls_key(config: Any, address_map: Optional[Dict[str, str]] = None
+                ) -> Tuple[str, int, Optional[str]]:
+        """کلید handshake یک کانفیگ: (IP resolve شده، پورت، SNI)"""
+        address = normalize_host(config.address)
+        if address_map:
+            address = address_map.get(address, address)
+        return address, config.port, server_name(config)
+
+    async def _handshake_once(self, address: str, port: int, sni: Optional[str],
+                              timeout: float) -> TLSProbeResult:
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(address, port), timeout=timeout)
+        connected_at = time.perf_counter()
+        transport = writer.transport
+        try:
+            remaining = max(0.1, timeout - (connected_at - start_time))
+            transport = await asyncio.wait_for(loop.start_tls(
+                transport, transport.get_protocol(), self.context,
+                server_hostname=sni, ssl_handshake_timeout=remaining), timeout=remaining)
+            finished_at = time.perf_counter()
+        finally:
+            # بستن فوری بدون انتظار برای close_notify
+            if transport is not None:
+                transport.abort()
+
+        return TLSProbeResult(True, (connected_at - start_time) * 1000,
+                              (finished_at - connected_at) * 1000)
+
+    async def handshake(self, address: str, port: int, sni: Optional[str],
+                        timeout: Optional[float] = None) -> TLSProbeResult:
+        """اتصال TCP و handshake TLS با SNI داده شده"""
+        timeout = timeout or self.timeout
+        async with self.engine.semaphore:
+            try:
+                result = await self._handshake_once(address, port, sni, timeout)
+            except asyncio.TimeoutError:
+                result = TLSProbeResult(False, error="timeout")
+            except (ssl.SSLError, OSError, ValueError) as e:
+                result = TLSProbeResult(False, error=type(e).__name__)
+
+        self.stats['handshakes'] += 1
+        if result.success:
+            self.stats['succeeded'] += 1
+            self.stats['handshake_ms_total'] += result.handshake_latency
+        else:
+            self.stats['failed'] += 1
+        return result
+
+    async def probe_config(self, config: Any, address_map: Optional[Dict[str, str]] = None,
+                           timeout: Optional[float] = None) -> TLSProbeResult:
+        """handshake برای یک کانفیگ (آدرس resolve شده از address_map)"""
+        address = config.address
+        if address_map:
+            address = address_map.get(normalize_host(address), address)
+        result = await self.handshake(address, config.port, server_name(config), timeout)
+        if result.success:
+            config.tls_handshake_latency = result.handshake_latency
+        return result
+
+    async def verify_config(self, config: Any,
+                            address_map: Optional[Dict[str, str]] = None) -> TLSProbeResult:
+        """
+        handshake کانفیگ با SNI خودش، یک بار برای هر (IP، پورت، SNI) در سیکل
+
+        فراخوانی‌های همزمان با کلید یکسان منتظر همان handshake می‌مانند.
+        """
+        key = self.tls_key(config, address_map)
+        task = self._outcomes.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.handshake(*key))
+            self._outcomes[key] = task
+        else:
+            self.stats['reused'] += 1
+        # shield تا cancel شدن یک فراخواننده handshake مشترک را لغو نکند
+        result = await asyncio.shield(task)
+        if result.success:
+            config.tls_handshake_latency = result.handshake_latency
+        return result
+
+    def handshake_passed(self, config: Any, address_map: Optional[Dict[str, str]] = None) -> bool:
+        """
+        نتیجه handshake کانفیگ با SNI خودش در این سیکل
+
+        برای کانفیگی که handshake نشده (غیر TLS یا خارج از verify) True است؛
+        latency handshake همان SNI روی کانفیگ نوشته می‌شود.
+        """
+        task = self._outcomes.get(self.tls_key(config, address_map))
+        if task is None or not task.done() or task.cancelled():
+            return True
+        result = task.result()
+        if result.success:
+            config.tls_handshake_latency = result.handshake_latency
+        return result.success
+
+    async def verify(self, results: Sequence[Tuple[Any, bool, float]],
+                     address_map: Optional[Dict[str, str]] = None,
+                     groups: Optional[Dict[str, Sequence[Any]]] = None
+                     ) -> List[Tuple[Any, bool, float]]:
+        """
+        مرحله دوم روی نتایج تست TCP
+
+        فقط کانفیگ‌های TLS که اتصال TCP آن‌ها موفق بوده handshake می‌شوند و
+        latency همان زمان TCP می‌ماند. با groups (endpoint_key → کانفیگ‌های
+        هم‌endpoint) هر SNI متمایز گروه جدا handshake می‌شود؛ endpoint فقط وقتی
+        ناموفق می‌شود که هیچ عضوی سالم نماند و نتیجه هر عضو با handshake_passed
+        خوانده می‌شود.
+        """
+        verified = list(results)
+        pending: Dict[int, Tuple[List[Any], bool]] = {}
+        for index, (config, is_working, _) in enumerate(verified):
+            if not is_working:
+                continue
+            members = groups.get(endpoint_key(config, address_map), [config]) if groups else [config]
+            tls_members = {self.tls_key(member, address_map): member
+                           for member in members if requires_tls(member)}
+            if tls_members:
+                pending[index] = (list(tls_members.values()),
+                                  all(requires_tls(member) for member in members))
+        if not pending:
+            return verified
+
+        outcomes = await asyncio.gather(*(
+            self.verify_config(member, address_map)
+            for members, _ in pending.values() for member in members))
+        position = 0
+        for index, (members, all_tls) in pending.items():
+            passed = any(outcome.success for outcome in outcomes[position:position + len(members)])
+            position += len(members)
+            if all_tls and not passed:
+                config, _, _ = verified[index]
+                verified[index] = (config, False, 0.0)
+        return verified
+
+    def reset_stats(self):
+        """پاک کردن آمار و نتایج handshake سیکل قبلی"""
+        self._outcomes = {}
+        self.stats = {'handshakes': 0, 'succeeded': 0, 'failed': 0, 'reused': 0,
+                      'handshake_ms_total': 0.0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """آمار handshake های سیکل جاری"""
+        succeeded = self.stats['succeeded']
+        return {
+            'handshakes': self.stats['handshakes'],
+            'succeeded': succeeded,
+            'failed': self.stats['failed'],
+            'reused': self.stats['reused'],
+            'avg_handshake_ms': round(self.stats['handshake_ms_total'] / succeeded, 1)
+            if succeeded else 0.0,
+        }
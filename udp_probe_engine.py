@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Async UDP Probe Engine
+تست دسترسی UDP برای Hysteria، Hysteria2، TUIC (QUIC) و WireGuard
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import unquote
+
+from async_probe_engine import ProbeResult
+from dns_resolver import normalize_host
+
+try:
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+    from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+    WIREGUARD_HANDSHAKE_AVAILABLE = True
+except ImportError:
+    WIREGUARD_HANDSHAKE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+QUIC_PROTOCOLS = frozenset({'hysteria', 'hysteria2', 'hy2', 'tuic'})
+UDP_PROTOCOLS = QUIC_PROTOCOLS | {'wireguard'}
+
+# نسخه رزرو شده (الگوی 0x?a?a?a?a در RFC 9000) که هیچ سروری پشتیبانی نمی‌کند
+QUIC_PROBE_VERSION = 0x1a2a3a4a
+# سرورها بسته Initial کوچک‌تر از 1200 بایت را نادیده می‌گیرند
+QUIC_MIN_INITIAL_SIZE = 1200
+
+_WG_CONSTRUCTION = b"Noise_IKpsk2_25519_ChaChaPoly_BLAKE2s"
+_WG_IDENTIFIER = b"WireGuard v1 zx2c4 Jason@zx2c4.com"
+_WG_LABEL_MAC1 = b"mac1----"
+WG_HANDSHAKE_INITIATION = 1
+WG_HANDSHAKE_RESPONSE = 2
+WG_COOKIE_REPLY = 3
+
+
+def is_udp_config(config: Any) -> bool:
+    """آیا کانفیگ روی UDP/QUIC کار می‌کند؟"""
+    return config.protocol in UDP_PROTOCOLS
+
+
+def is_obfuscated_quic(raw_config: str) -> bool:
+    """آیا لینک Hysteria/Hysteria2 مبهم‌سازی (obfs، مثلاً salamander) دارد؟"""
+    query = raw_config.split('#', 1)[0].partition('?')[2]
+    for part in query.split('&'):
+        name, _, value = part.partition('=')
+        name = name.lower()
+        if name in ('obfs-password', 'obfsparam') and value:
+            return True
+        if name == 'obfs' and value and unquote(value).lower() not in ('none', 'plain'):
+            return True
+    return False
+
+
+def build_quic_probe() -> Tuple[bytes, bytes]:
+    """
+    بسته Initial با نسخه ناشناخته برای دریافت Version Negotiation
+
+    سرور QUIC بدون نیاز به رمزنگاری با لیست نسخه‌های پشتیبانی شده پاسخ می‌دهد.
+    خروجی: (بسته، source connection id برای بررسی پاسخ)
+    """
+    dcid = os.urandom(8)
+    scid = os.urandom(8)
+    header = bytes([0xc0 | (os.urandom(1)[0] & 0x0f)]) + struct.pack('!I', QUIC_PROBE_VERSION)
+    header += bytes([len(dcid)]) + dcid + bytes([len(scid)]) + scid
+    return header + b'\x00' * (QUIC_MIN_INITIAL_SIZE - len(header)), scid
+
+
+def is_quic_version_negotiation(data: bytes, scid: bytes) -> bool:
+    """بررسی پاسخ Version Negotiation (نسخه 0 و DCID برابر SCID ما)"""
+    if len(data) < 7 or not data[0] & 0x80 or data[1:5] != b'\x00\x00\x00\x00':
+        return False
+    dcid_length = data[5]
+    return data[6:6 + dcid_length] == scid
+
+
+def wireguard_keys(raw_config: str) -> Tuple[Optional[str], Optional[str]]:
+    """کلید خصوصی کلاینت و کلید عمومی سرور از لینک wireguard://"""
+    try:
+        main_part = raw_config.split('://', 1)[1].split('#', 1)[0]
+        server_info, _, params = main_part.partition('?')
+        private_key = unquote(server_info.rsplit('@', 1)[0]) if '@' in server_info else None
+        # parse_qs نویسه '+' کلید base64 را به فاصله تبدیل می‌کند
+        query = dict(part.partition('=')[::2] for part in params.split('&') if part)
+        public_key = query.get('publickey') or query.get('peer_public_key')
+        return private_key, unquote(public_key) if public_key else None
+    except (IndexError, ValueError):
+        return None, None
+
+
+def _hash(data: bytes) -> bytes:
+    return hashlib.blake2s(data).digest()
+
+
+def _hmac(key: bytes, data: bytes) -> bytes:
+    return hmac.new(key, data, hashlib.blake2s).digest()
+
+
+def _kdf(key: bytes, data: bytes, count: int) -> List[bytes]:
+    prk = _hmac(key, data)
+    outputs = []
+    previous = b''
+    for index in range(1, count + 1):
+        previous = _hmac(prk, previous + bytes([index]))
+        outputs.append(previous)
+    return outputs
+
+
+def _tai64n() -> bytes:
+    now = time.time()
+    seconds = int(now)
+    return struct.pack('>QI', 0x400000000000000a + seconds, int((now - seconds) * 1e9))
+
+
+def build_wireguard_initiation(private_key_b64: str, server_public_b64: str) -> Optional[bytes]:
+    """
+    پیام handshake initiation واقعی WireGuard (Noise IKpsk2، 148 بایت)
+
+    سرور WireGuard به بسته نامعتبر پاسخ نمی‌دهد، پس فقط initiation معتبر با
+    کلید خصوصی داخل لینک باعث پاسخ (handshake response یا cookie reply) می‌شود.
+    بدون کتابخانه cryptography یا کلیدها None برمی‌گردد.
+    """
+    if not WIREGUARD_HANDSHAKE_AVAILABLE or not private_key_b64 or not server_public_b64:
+        return None
+    try:
+        static_private = X25519PrivateKey.from_private_bytes(base64.b64decode(private_key_b64))
+        server_public_bytes = base64.b64decode(server_public_b64)
+        server_public = X25519PublicKey.from_public_bytes(server_public_bytes)
+    except (ValueError, TypeError):
+        return None
+
+    raw = (Encoding.Raw, PublicFormat.Raw)
+    ephemeral_private = X25519PrivateKey.generate()
+    ephemeral_public = ephemeral_private.public_key().public_bytes(*raw)
+    static_public = static_private.public_key().public_bytes(*raw)
+    nonce = b'\x00' * 12
+
+    chaining_key = _hash(_WG_CONSTRUCTION)
+    handshake_hash = _hash(_hash(chaining_key + _WG_IDENTIFIER) + server_public_bytes)
+    chaining_key = _kdf(chaining_key, ephemeral_public, 1)[0]
+    handshake_hash = _hash(handshake_hash + ephemeral_public)
+
+    chaining_key, key = _kdf(chaining_key, ephemeral_private.exchange(server_public), 2)
+    encrypted_static = ChaCha20Poly1305(key).encrypt(nonce, static_public, handshake_hash)
+    handshake_hash = _hash(handshake_hash + encrypted_static)
+
+    chaining_key, key = _kdf(chaining_key, static_private.exchange(server_public), 2)
+    encrypted_timestamp = ChaCha20Poly1305(key).encrypt(nonce, _tai64n(), handshake_hash)
+
+    message = struct.pack('<I', WG_HANDSHAKE_INITIATION) + os.urandom(4)
+    message += ephemeral_public + encrypted_static + encrypted_timestamp
+    mac1_key = _hash(_WG_LABEL_MAC1 + server_public_bytes)
+    message += hashlib.blake2s(message, digest_size=16, key=mac1_key).digest()
+    return message + b'\x00' * 16
+
+
+def is_wireguard_reply(data: bytes) -> bool:
+    """پاسخ handshake (92 بایت) یا cookie reply (64 بایت)"""
+    return (len(data) == 92 and data[0] == WG_HANDSHAKE_RESPONSE) or \
+        (len(data) == 64 and data[0] == WG_COOKIE_REPLY)
+
+
+class _DatagramProbeProtocol(asyncio.DatagramProtocol):
+    """دریافت اولین پاسخ یا خطای ICMP برای یک تست"""
+
+    def __init__(self, validate: Callable[[bytes], bool]):
+        self.validate = validate
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data: bytes, addr):
+        if not self.future.done() and self.validate(data):
+            self.future.set_result(time.perf_counter())
+
+    def error_received(self, exc: Exception):
+        # ICMP port unreachable: سرویسی روی این پورت نیست
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+    def connection_lost(self, exc: Optional[Exception]):
+        if not self.future.done():
+            self.future.cancel()
+
+
+class AsyncUDPProbeEngine:
+    """
+    موتور تست UDP بر پایه loop.create_datagram_endpoint
+
+    برای پروتکل‌های QUIC یک Initial با نسخه ناشناخته ارسال و پاسخ Version
+    Negotiation منتظر می‌ماند؛ برای WireGuard یک handshake initiation واقعی
+    با کلیدهای لینک. latency زمان بین ارسال و دریافت پاسخ معتبر است. semaphore
+    جدا از موتور TCP دارد تا دو موتور همزمان اجرا شوند.
+
+    silent_is_reachable: اگر True باشد، نبود پاسخ (بدون خطای ICMP) موفق حساب
+    می‌شود؛ برای WireGuard بدون کلید یا QUIC مبهم‌سازی شده (مثلاً salamander).
+
+    سکوت چنین سرورهایی مبهم است (سرور سالم هم به بسته ما پاسخ نمی‌دهد)؛ پس
+    این endpoint ها (address، port خود کانفیگ) در inconclusive ثبت می‌شوند تا
+    در فهرست endpoint های مرده شکست حساب نشوند. فقط خطای ICMP قطعی است.
+    """
+
+    def __init__(self, max_concurrency: int = 500, timeout: float = 2.0,
+                 attempts: int = 1, silent_is_reachable: bool = False):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.attempts = max(1, attempts)
+        self.silent_is_reachable = silent_is_reachable
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.inconclusive: Set[Tuple[str, int]] = set()
+        self.reset_stats()
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """semaphore متعلق به event loop جاری"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    @staticmethod
+    def silence_is_conclusive(config: Any, packet: Optional[bytes]) -> bool:
+        """آیا نبود پاسخ به این بسته یعنی endpoint واقعاً از دسترس خارج است؟"""
+        if config.protocol == 'wireguard':
+            # بدون initiation معتبر سرور سالم هم پاسخی نمی‌دهد
+            return packet is not None
+        return not is_obfuscated_quic(config.raw_config)
+
+    def build_probe(self, config: Any) -> Tuple[Optional[bytes], Callable[[bytes], bool]]:
+        """بسته تست و تابع اعتبارسنجی پاسخ برای پروتکل کانفیگ"""
+        if config.protocol == 'wireguard':
+            packet = build_wireguard_initiation(*wireguard_keys(config.raw_config))
+            return packet, is_wireguard_reply
+
+        packet, scid = build_quic_probe()
+        return packet, lambda data: is_quic_version_negotiation(data, scid)
+
+    async def _send_once(self, address: str, port: int, packet: bytes,
+                         validate: Callable[[bytes], bool], timeout: float) -> float:
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: _DatagramProbeProtocol(validate), remote_addr=(address, port))
+        try:
+            start_time = time.perf_counter()
+            transport.sendto(packet)
+            received_at = await asyncio.wait_for(protocol.future, timeout=timeout)
+            return (received_at - start_time) * 1000
+        finally:
+            transport.close()
+
+    async def probe(self, config: Any, address: Optional[str] = None,
+                    timeout: Optional[float] = None) -> ProbeResult:
+        """تست UDP یک کانفیگ (address: IP resolve شده)"""
+        timeout = timeout or self.timeout
+        address = address or config.address
+        packet, validate = self.build_probe(config)
+        conclusive = self.silence_is_conclusive(config, packet)
+        if packet is None:
+            # WireGuard بدون کلید قابل استفاده: فقط خطای ICMP قابل تشخیص است
+            packet, validate = os.urandom(148), lambda data: False
+
+        result = ProbeResult(False, 0.0, "no_response", self.attempts)
+        async with self.semaphore:
+            for attempt in range(1, self.attempts + 1):
+                try:
+                    latency = await self._send_once(address, config.port, packet,
+                                                    validate, timeout)
+                    result = ProbeResult(True, latency, attempts=attempt)
+                    break
+                except asyncio.TimeoutError:
+                    continue
+                except (OSError, ValueError) as e:
+                    # خطای ICMP قطعی است؛ تلاش مجدد فایده‌ای ندارد
+                    result = ProbeResult(False, 0.0, type(e).__name__, attempt)
+                    break
+
+        self.stats['probes'] += 1
+        if result.success:
+            self.stats['succeeded'] += 1
+            self.stats['latency_ms_total'] += result.latency
+        elif result.error == "no_response":
+            self.stats['no_response'] += 1
+            if self.silent_is_reachable:
+                return ProbeResult(True, 0.0, result.error, result.attempts)
+            if not conclusive:
+                self.stats['inconclusive'] += 1
+                self.inconclusive.add((config.address, config.port))
+                result.error = "inconclusive"
+        else:
+            self.stats['unreachable'] += 1
+        return result
+
+    async def probe_many(self, configs: Sequence[Any], deadline: Optional[float] = None,
+                         address_map: Optional[Dict[str, str]] = None) -> List[Tuple[Any, bool, float]]:
+        """
+        تست موازی کانفیگ‌های UDP با تعداد ثابت worker (مانند AsyncProbeEngine)
+
+        deadline بر حسب loop.time است و کانفیگ‌های تست نشده در خروجی نمی‌آیند.
+        """
+        if not configs:
+            return []
+
+        loop = asyncio.get_running_loop()
+        results: List[Optional[Tuple[Any, bool, float]]] = [None] * len(configs)
+        pending = iter(enumerate(configs))
+
+        async def worker():
+            for index, config in pending:
+                if deadline is not None and loop.time() >= deadline:
+                    return
+                address = config.address
+                if address_map:
+                    address = address_map.get(normalize_host(address), address)
+                result = await self.probe(config, address)
+                results[index] = (config, result.success, result.latency)
+
+        workers = [asyncio.ensure_future(worker())
+                   for _ in range(min(self.max_concurrency, len(configs)))]
+        try:
+            if deadline is not None:
+                remaining = max(0.0, deadline - loop.time())
+                _, still_running = await asyncio.wait(workers, timeout=remaining)
+                for task in still_running:
+                    task.cancel()
+                if still_running:
+                    await asyncio.gather(*still_running, return_exceptions=True)
+            else:
+                await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                if not task.done():
+                    task.cancel()
+
+        return [item for item in results if item is not None]
+
+    def reset_stats(self):
+        """پاک کردن آمار و endpoint های مبهم سیکل قبلی"""
+        self.inconclusive = set()
+        self.stats = {'probes': 0, 'succeeded': 0, 'no_response': 0, 'inconclusive': 0,
+                      'unreachable': 0, 'latency_ms_total': 0.0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        آمار تست‌های UDP سیکل جاری
+
+        no_response: بدون پاسخ (inconclusive: بخشی از آن که سکوتش مبهم است)،
+        unreachable: خطای ICMP
+        """
+        succeeded = self.stats['succeeded']
+        return {
+            'probes': self.stats['probes'],
+            'succeeded': succeeded,
+            'no_response': self.stats['no_response'],
+            'inconclusive': self.stats['inconclusive'],
+            'unreachable': self.stats['unreachable'],
+            'avg_latency_ms': round(self.stats['latency_ms_total'] / succeeded, 1)
+            if succeeded else 0.0,
+        }
+
+
+class _StandInProtocol(asyncio.DatagramProtocol):
+    def __init__(self, mode: str, delay: float):
+        self.mode = mode
+        self.delay = delay
+        self.transport = None
+        self.received = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        self.received += 1
+        reply = self._reply(data)
+        if reply is None:
+            return
+        if self.delay:
+            asyncio.get_running_loop().call_later(self.delay, self.transport.sendto, reply, addr)
+        else:
+            self.transport.sendto(reply, addr)
+
+    def _reply(self, data: bytes) -> Optional[bytes]:
+        if self.mode == 'echo':
+            return data
+        if self.mode == 'quic':
+            # Version Negotiation: DCID و SCID جابجا و لیست نسخه‌ها (QUIC v1)
+            if len(data) < QUIC_MIN_INITIAL_SIZE or not data[0] & 0x80:
+                return None
+            dcid_length = data[5]
+            dcid = data[6:6 + dcid_length]
+            scid_length = data[6 + dcid_length]
+            scid = data[7 + dcid_length:7 + dcid_length + scid_length]
+            return bytes([0x80]) + b'\x00\x00\x00\x00' + bytes([len(scid)]) + scid + \
+                bytes([len(dcid)]) + dcid + struct.pack('!I', 0x00000001)
+        if self.mode == 'wireguard':
+            # فقط شکل پیام بررسی می‌شود، نه رمزنگاری آن
+            if len(data) != 148 or data[0] != WG_HANDSHAKE_INITIATION:
+                return None
+            return bytes([WG_HANDSHAKE_RESPONSE, 0, 0, 0]) + os.urandom(4) + data[4:8] + os.urandom(80)
+        return None
+
+
+class UDPStandInServer:
+    """
+    سرور UDP محلی برای تست آفلاین موتور UDP
+
+    mode: echo (بازگرداندن همان بسته)، quic (پاسخ Version Negotiation)،
+    wireguard (پاسخ هم‌شکل handshake response) یا drop (بدون پاسخ). delay
+    تأخیر پاسخ (ثانیه) است.
+    """
+
+    def __init__(self, mode: str = 'echo', host: str = '127.0.0.1', port: int = 0,
+                 delay: float = 0.0):
+        self.mode = mode
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.transport = None
+        self.protocol: Optional[_StandInProtocol] = None
+
+    async def start(self) -> int:
+        """شروع سرور و برگرداندن پورت"""
+        loop = asyncio.get_running_loop()
+        self.transport, self.protocol = await loop.create_datagram_endpoint(
+            lambda: _StandInProtocol(self.mode, self.delay), local_addr=(self.host, self.port))
+        self.port = self.transport.get_extra_info('sockname')[1]
+        return self.port
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()